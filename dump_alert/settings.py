@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # =============================================================================
 # CHEMINS
@@ -77,6 +78,7 @@ INSTALLED_APPS = [
 # Couches de traitement qui s'exécutent à chaque requête/réponse
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",  # Sécurité HTTP
+    "reports.metrics.MetricsMiddleware",  # Mesures SQL / latence (échantillon)
     "django.contrib.sessions.middleware.SessionMiddleware",  # Gestion sessions
     "django.middleware.common.CommonMiddleware",  # Traitements communs
     "django.middleware.csrf.CsrfViewMiddleware",  # Protection CSRF
@@ -117,6 +119,22 @@ WSGI_APPLICATION = "dump_alert.wsgi.application"
 # =============================================================================
 # PostgreSQL + PostGIS local via Docker
 # Commande : docker run -d --name dump-alert-db -e POSTGRES_USER=postgres -e POSTGRES_PASSWORD=postgres -e POSTGRES_DB=dump_alert -p 5432:5432 postgis/postgis:16-3.4
+
+# Pool de connexions psycopg 3 partagé par les threads du processus (voir
+# reports/dbpool.py) ; à préférer sous ASGI aux connexions persistantes.
+# Nécessite psycopg 3 : pip install -e ".[pool]"
+DATABASE_POOL = config("DATABASE_POOL", default=False, cast=bool)
+if DATABASE_POOL:
+    # Sans psycopg 3, Django retomberait sur psycopg2 et l'option "pool"
+    # échouerait seulement à la première connexion
+    try:
+        import psycopg  # noqa: F401
+        import psycopg_pool  # noqa: F401
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            'DATABASE_POOL=True nécessite psycopg 3 : pip install -e ".[pool]"'
+        ) from e
+
 DATABASES = {
     "default": {
         "ENGINE": "django.contrib.gis.db.backends.postgis",
@@ -125,6 +143,23 @@ DATABASES = {
         "PASSWORD": config("DATABASE_PASSWORD"),
         "HOST": config("POSTGRES_HOST", default="127.0.0.1"),
         "PORT": config("POSTGRES_PORT", default="5433"),
+        # Connexion conservée par thread (secondes, 0 : une par requête),
+        # vérifiée avant d'être réutilisée ; sans effet en mode pool ni
+        # avec ASYNC_VIEWS (voir plus bas)
+        "CONN_MAX_AGE": 0
+        if DATABASE_POOL
+        else config("DATABASE_CONN_MAX_AGE", default=0, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pool": {
+                "min_size": config("DATABASE_POOL_MIN_SIZE", default=2, cast=int),
+                "max_size": config("DATABASE_POOL_MAX_SIZE", default=10, cast=int),
+                # Attente maximale d'une connexion libre (secondes)
+                "timeout": config("DATABASE_POOL_TIMEOUT", default=10, cast=float),
+            }
+        }
+        if DATABASE_POOL
+        else {},
     }
 }
 
@@ -161,10 +196,129 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"  # URL publique
 MEDIA_ROOT = BASE_DIR / "media"  # Dossier physique sur le disque
 
+# Normalisation des photos à l'upload (ReportForm) : rotation EXIF appliquée,
+# EXIF supprimé, plus grand côté plafonné, ré-encodage JPEG (PNG si transparence)
+REPORT_IMAGE_NORMALIZE = config("REPORT_IMAGE_NORMALIZE", default=True, cast=bool)
+REPORT_IMAGE_MAX_DIMENSION = config(
+    "REPORT_IMAGE_MAX_DIMENSION", default=2048, cast=int
+)
+REPORT_IMAGE_QUALITY = config("REPORT_IMAGE_QUALITY", default=85, cast=int)
+# Poids maximal d'une photo après normalisation (octets)
+REPORT_IMAGE_MAX_BYTES = config(
+    "REPORT_IMAGE_MAX_BYTES", default=2 * 1024 * 1024, cast=int
+)
+# Poids maximal accepté à l'upload, avant tout décodage (octets)
+REPORT_IMAGE_MAX_UPLOAD_BYTES = config(
+    "REPORT_IMAGE_MAX_UPLOAD_BYTES", default=25 * 1024 * 1024, cast=int
+)
+
+# Images dérivées (miniatures/aperçus) générées à côté des originaux
+# Format : "WEBP" (repli automatique sur "JPEG" si Pillow n'a pas libwebp)
+REPORT_IMAGE_DERIVATIVE_FORMAT = config(
+    "REPORT_IMAGE_DERIVATIVE_FORMAT", default="WEBP"
+)
+REPORT_IMAGE_DERIVATIVE_QUALITY = 80
+# Génération juste après l'upload (sinon : au premier affichage)
+REPORT_IMAGE_DERIVATIVES_ON_UPLOAD = True
+
+# Vues asynchrones (reports/async_views.py) pour la liste et le formulaire,
+# à servir par un serveur ASGI (dump_alert.asgi) : normalisation des photos,
+# écriture dans le stockage et miniatures dans un pool de threads borné
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+REPORT_IMAGE_WORKERS = config("REPORT_IMAGE_WORKERS", default=4, cast=int)
+# Sous ASGI, sync_to_async peut changer de thread d'une requête à l'autre :
+# des connexions persistantes par thread s'accumuleraient sans jamais être
+# refermées. Sans pool, une connexion par requête.
+if ASYNC_VIEWS and not DATABASE_POOL:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
 # Type de clé primaire par défaut pour les modèles
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# =============================================================================
+# CLUSTERING DES SIGNALEMENTS
+# =============================================================================
+# "sync"     : clustering dans la requête de création (comportement historique)
+# "deferred" : la requête crée une tâche, traitée par
+#              `python manage.py process_clustering_jobs`
+CLUSTERING_MODE = config("CLUSTERING_MODE", default="sync")
+
+# Nombre de tentatives avant qu'une tâche de clustering passe en échec définitif
+CLUSTERING_JOB_MAX_ATTEMPTS = config("CLUSTERING_JOB_MAX_ATTEMPTS", default=5, cast=int)
+
+# Suppression en masse (admin, services.delete_reports) : re-découper les
+# clusters dont les membres restants ne sont plus reliés (rejoue la règle de
+# clustering sur leurs membres, coût proportionnel à leur taille)
+CLUSTER_RESPLIT_ON_DELETE = config(
+    "CLUSTER_RESPLIT_ON_DELETE", default=False, cast=bool
+)
+
+# Géométrie des tests de distance du clustering :
+# "geography" : colonnes geography (sphéroïde WGS84, comportement historique)
+# "l93"       : colonnes projetées Lambert-93 (calcul plan, plus rapide)
+CLUSTERING_GEOMETRY = config("CLUSTERING_GEOMETRY", default="geography")
+
+# Verrous consultatifs par cellule de grille autour de chaque signalement
+# (services.lock_cells) et par catégorie pour les chemins en masse
+# (services.lock_categories) : un seul cluster pour des signalements ou des
+# lots simultanés d'un même dépôt. False : comportement historique, pour comparer
+# (`stress_clustering --no-cell-locks`)
+CLUSTER_CELL_LOCKS = config("CLUSTER_CELL_LOCKS", default=True, cast=bool)
+
+# Index en mémoire des centroïdes (reports/centroid_index.py) : fichier
+# d'instantané écrit par `python manage.py refresh_centroid_index --loop`
+# (vide : désactivé, recherche des clusters proches en base uniquement)
+CENTROID_INDEX_PATH = config("CENTROID_INDEX_PATH", default="")
+# Âge maximal (secondes) au-delà duquel l'instantané n'est plus utilisé
+CENTROID_INDEX_MAX_AGE = config("CENTROID_INDEX_MAX_AGE", default=60, cast=int)
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+# "default" : compteurs de la liste des signalements, etc.
+# "tiles"   : réponses de l'API cartographique (tuiles MVT, GeoJSON), invalidées
+#             tuile par tuile quand un centroïde bouge (reports/tilecache.py).
+#             LocMemCache = LRU borné à MAX_ENTRIES, sans service externe.
+#             Pour partager le cache entre processus : TILE_CACHE_BACKEND=
+#             django.core.cache.backends.filebased.FileBasedCache et
+#             TILE_CACHE_LOCATION=/chemin/du/dossier (éviction non LRU).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "tiles": {
+        "BACKEND": config(
+            "TILE_CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("TILE_CACHE_LOCATION", default="dump-alert-tiles"),
+        "TIMEOUT": config("TILE_CACHE_TIMEOUT", default=3600, cast=int),
+        "OPTIONS": {
+            "MAX_ENTRIES": config("TILE_CACHE_MAX_ENTRIES", default=5000, cast=int),
+            # Cache plein : évincer les 10 % les moins récemment utilisés
+            "CULL_FREQUENCY": 10,
+        },
+    },
+}
+
+
+# =============================================================================
+# INSTRUMENTATION (reports/metrics.py)
+# =============================================================================
+# Pourcentage des requêtes mesurées (nombre de requêtes SQL, temps base,
+# temps total) : 0 désactive la mesure, 100 mesure tout (développement)
+METRICS_SAMPLE_PERCENT = config("METRICS_SAMPLE_PERCENT", default=10, cast=float)
+
+# En-tête Server-Timing sur les réponses mesurées (visible par les clients)
+METRICS_SERVER_TIMING = config("METRICS_SERVER_TIMING", default=DEBUG, cast=bool)
+
+# Jeton du collecteur Prometheus (Authorization: Bearer <jeton>) pour
+# /reports/metrics ; vide : réservé au staff connecté
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+
 # =============================================================================
 # CONFIGURATION LEAFLET (CARTES)
 # =============================================================================
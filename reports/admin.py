@@ -12,9 +12,25 @@ Pour accéder à l'admin : http://localhost:8000/admin/
 
 from django.contrib import admin
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.html import format_html
 from leaflet.admin import LeafletGeoAdmin  # Admin avec carte interactive
 
-from .models import Report, ReportCluster
+from .images import derivative_url
+from .models import ClusteringJob, Report, ReportCluster
+from .services import delete_reports, recompute_clusters
+
+
+def _image_tag(image, kind, size):
+    """Balise <img> vers une version réduite de la photo (jamais l'original)."""
+    if not image:
+        return "—"
+    return format_html(
+        '<img src="{}" style="max-width:{}px;max-height:{}px" loading="lazy">',
+        derivative_url(image, kind),
+        size,
+        size,
+    )
 
 
 # =============================================================================
@@ -49,18 +65,25 @@ class ReportInline(admin.TabularInline):
 
     model = Report
     extra = 0
-    readonly_fields = ["id", "description", "type", "status", "created_at"]
-    fields = ["id", "description", "type", "status", "created_at"]
+    readonly_fields = ["id", "miniature", "description", "type", "status", "created_at"]
+    fields = ["id", "miniature", "description", "type", "status", "created_at"]
     can_delete = False
     show_change_link = True
 
+    @admin.display(description="Photo")
+    def miniature(self, obj):
+        return _image_tag(obj.image, "thumb", 60)
+
 
 @admin.action(description="Recalculer les clusters sélectionnés")
 def recalculer_clusters(modeladmin, request, queryset):
-    """Recalcule centroïde et métadonnées des clusters sélectionnés."""
-    for cluster in queryset:
-        cluster.recalculate()
-    messages.success(request, f"{queryset.count()} cluster(s) recalculé(s).")
+    """Recalcule centroïde et métadonnées des clusters sélectionnés (ensembliste)."""
+    stats = recompute_clusters(queryset)
+    messages.success(
+        request,
+        f"{stats['updated']} cluster(s) recalculé(s), {stats['deleted']} vide(s) "
+        f"supprimé(s) en {stats['seconds'] * 1000:.0f} ms.",
+    )
 
 
 @admin.register(ReportCluster)
@@ -74,6 +97,43 @@ class ReportClusterAdmin(LeafletGeoAdmin):
     actions = [recalculer_clusters]
 
 
+# =============================================================================
+# ADMIN FILE DE CLUSTERING DIFFÉRÉ
+# =============================================================================
+@admin.action(description="Relancer les tâches sélectionnées")
+def relancer_taches(modeladmin, request, queryset):
+    """Remet les tâches en attente, exécutables immédiatement."""
+    count = queryset.update(
+        status=ClusteringJob.Status.PENDING,
+        attempts=0,
+        run_after=timezone.now(),
+        locked_until=None,
+    )
+    messages.success(request, f"{count} tâche(s) relancée(s).")
+
+
+@admin.register(ClusteringJob)
+class ClusteringJobAdmin(admin.ModelAdmin):
+    """File des tâches de clustering (mode différé) : suivi et relance."""
+
+    list_display = ["id", "report", "status", "attempts", "run_after", "created_at"]
+    list_filter = ["status"]
+    list_select_related = ["report"]
+    readonly_fields = [
+        "report",
+        "status",
+        "attempts",
+        "last_error",
+        "run_after",
+        "locked_until",
+        "created_at",
+    ]
+    actions = [relancer_taches]
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Report)  # Enregistre le modèle dans l'admin
 class ReportAdmin(LeafletGeoAdmin):
     """
@@ -102,10 +162,11 @@ class ReportAdmin(LeafletGeoAdmin):
     # Colonnes affichées dans la liste des signalements
     list_display = [
         "id",
+        "miniature",  # Miniature de la photo (jamais l'original)
         "description_courte",  # Méthode personnalisée (voir plus bas)
         "type",
         "status",
-        "cluster_display",  # Méthode sécurisée (gère les références orphelines)
+        "cluster_display",  # Lecture seule, signale les références orphelines
         "created_at",
     ]
 
@@ -132,11 +193,11 @@ class ReportAdmin(LeafletGeoAdmin):
     # FORMULAIRE D'ÉDITION
     # =========================================================================
     # Champs en lecture seule (non modifiables)
-    readonly_fields = ["created_at", "updated_at", "cluster"]
+    readonly_fields = ["apercu", "created_at", "updated_at", "cluster"]
 
     # Organisation des champs dans le formulaire
     fieldsets = [
-        ("Signalement", {"fields": ["image", "description", "type"]}),
+        ("Signalement", {"fields": ["apercu", "image", "description", "type"]}),
         (
             "Localisation",
             {
@@ -158,6 +219,20 @@ class ReportAdmin(LeafletGeoAdmin):
     # =========================================================================
     # MÉTHODES PERSONNALISÉES
     # =========================================================================
+    def delete_queryset(self, request, queryset):
+        """Suppression en masse : clusters mis à jour une fois chacun."""
+        delete_reports(queryset)
+
+    @admin.display(description="Photo")
+    def miniature(self, obj):
+        """Miniature de la photo (quelques Ko au lieu de l'original)."""
+        return _image_tag(obj.image, "thumb", 60)
+
+    @admin.display(description="Aperçu")
+    def apercu(self, obj):
+        """Aperçu réduit de la photo dans le formulaire d'édition."""
+        return _image_tag(obj.image, "medium", 480)
+
     @admin.display(description="Description")
     def description_courte(self, obj):
         """Affiche les 50 premiers caractères de la description."""
@@ -167,12 +242,16 @@ class ReportAdmin(LeafletGeoAdmin):
 
     @admin.display(description="Cluster")
     def cluster_display(self, obj):
-        """Affiche le cluster en gérant les références orphelines."""
+        """
+        Affiche le cluster, en signalant les références orphelines sans les
+        modifier : la liste reste en lecture seule (réparation :
+        `python manage.py sweep_integrity`).
+        """
+        if obj.cluster_id is None:
+            return "—"
         try:
-            if obj.cluster_id is None:
-                return "—"
-            return obj.cluster  # peut lever DoesNotExist si orphelin
+            # Avec list_select_related, un orphelin donne None (LEFT JOIN)
+            cluster = obj.cluster
         except ReportCluster.DoesNotExist:
-            # Référence corrompue : on la nettoie silencieusement
-            Report.objects.filter(pk=obj.pk).update(cluster=None)
-            return "⚠ nettoyé"
+            cluster = None
+        return cluster or f"⚠ orphelin (#{obj.cluster_id})"
@@ -0,0 +1,362 @@
+"""
+API cartographique en lecture seule sur les clusters.
+
+- /reports/api/clusters.geojson?bbox=lon_min,lat_min,lon_max,lat_max&zoom=z
+  GeoJSON des centroïdes (report_count, waste_type). En dessous de
+  DETAIL_ZOOM, les clusters proches sont agrégés par cellule de grille
+  (ST_SnapToGrid) pour garder des réponses légères.
+- /reports/tiles/<z>/<x>/<y>.mvt
+  Tuile vectorielle Mapbox (ST_AsMVT), couche "clusters".
+
+Filtre optionnel : waste_type=<catégorie>.
+
+- /reports/api/heatmap.json?zoom=z[&waste_type=…]
+  Carte de chaleur : grille de densité de la zone couverte, précalculée
+  par zoom et rafraîchie au fil des nouveaux signalements (heatmap.py).
+
+- /reports/export/<reports|clusters>.<geojsonseq|csv|fgb> (staff)
+  Export complet en flux (voir export.py), filtres status, type, since,
+  until, min_id, max_id.
+
+Chaque réponse porte un ETag dérivé de ReportCluster.updated_at et du
+nombre de clusters dans l'emprise : un client qui revalide reçoit un 304
+sans que les données soient recalculées. Pas de Last-Modified : MAX(updated_at)
+ne bouge pas quand un cluster est supprimé ou fusionné, un client qui
+n'enverrait que If-Modified-Since recevrait un 304 périmé.
+
+Côté serveur, les réponses sont gardées dans le cache "tiles" (voir
+tilecache.py) et invalidées tuile par tuile quand un centroïde bouge ;
+une réponse en cache n'est servie que si son ETag correspond à l'état
+courant en base (le cache peut être propre à chaque processus).
+En-tête X-Cache : HIT / MISS. Compteurs : /reports/api/cache-stats (staff).
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from . import export, heatmap, tilecache
+from .geo import MAX_ZOOM, tile_bounds
+from .models import Report
+
+# Zoom à partir duquel chaque cluster est renvoyé individuellement
+DETAIL_ZOOM = 16
+# Nombre maximal d'entités dans une réponse GeoJSON
+MAX_FEATURES = 5000
+
+# Nom de couche dans les tuiles vectorielles
+TILE_LAYER = "clusters"
+
+_ENVELOPE_SQL = "centroid::geometry && ST_MakeEnvelope(%s, %s, %s, %s, 4326)"
+
+
+# =============================================================================
+# PARAMÈTRES
+# =============================================================================
+def parse_bbox(value):
+    """
+    Convertit "lon_min,lat_min,lon_max,lat_max" en tuple de floats.
+    Sans valeur : emprise de Beauvais (LEAFLET_CONFIG["MAX_EXTENT"]).
+    Lève ValueError si la chaîne est invalide.
+    """
+    if not value:
+        return tuple(settings.LEAFLET_CONFIG["MAX_EXTENT"])
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox attend 4 valeurs : lon_min,lat_min,lon_max,lat_max")
+    lon_min, lat_min, lon_max, lat_max = parts
+    if not (-180 <= lon_min < lon_max <= 180 and -90 <= lat_min < lat_max <= 90):
+        raise ValueError("bbox invalide")
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def _waste_type(request):
+    """Filtre de catégorie (None si absent) ; ValueError si inconnu."""
+    value = request.GET.get("waste_type")
+    if value and value not in Report.WasteType.values:
+        raise ValueError("waste_type inconnu")
+    return value or None
+
+
+def _where(bbox, waste_type):
+    """Clause WHERE (emprise + catégorie) et ses paramètres."""
+    sql, params = _ENVELOPE_SQL, list(bbox)
+    if waste_type:
+        sql += " AND waste_type = %s"
+        params.append(waste_type)
+    return sql, params
+
+
+def _grid_size(zoom):
+    """Pas de la grille d'agrégation en degrés : ~1/4 de tuile au zoom donné."""
+    return 360 / 2**zoom / 4
+
+
+# =============================================================================
+# CACHE ET VALIDATEUR HTTP (ETag)
+# =============================================================================
+def cluster_state_sql(bbox, waste_type):
+    """Requête (sql, params) de cluster_state — auditée par `audit_cluster_queries`."""
+    where, params = _where(bbox, waste_type)
+    sql = f"SELECT MAX(updated_at), COUNT(*) FROM reports_reportcluster WHERE {where}"
+    return sql, params
+
+
+def cluster_state(bbox, waste_type):
+    """(dernière modification, nombre de clusters) dans l'emprise — une requête."""
+    with connection.cursor() as cursor:
+        cursor.execute(*cluster_state_sql(bbox, waste_type))
+        return cursor.fetchone()
+
+
+def _entry(request, kind, bbox, waste_type, tiles, *parts):
+    """
+    Réponse de la requête : lue dans le cache (tilecache) si elle correspond
+    encore à l'état courant des clusters, sinon cet état (etag) sans
+    corps.
+
+    L'ETag est toujours calculé en base (cluster_state, une requête sur
+    l'index) : le cache "tiles" peut être propre au processus (LocMemCache)
+    et ne pas voir les invalidations faites par les autres workers, le
+    worker de clustering différé ou les commandes de maintenance.
+
+    Calculée une seule fois par requête : etag_func de @condition et la vue
+    partagent la même consultation.
+    """
+    if not hasattr(request, "_map_entry"):
+        key = tilecache.entry_key(kind, waste_type, *parts)
+        last_modified, count = cluster_state(bbox, waste_type)
+        etag = hashlib.md5(f"{key}|{last_modified}|{count}".encode()).hexdigest()
+        entry, current = tilecache.lookup(key, tiles, etag)
+        if entry is None:
+            entry = {"etag": etag, "body": None}
+        request._map_entry = (key, current, entry)
+    return request._map_entry[2]
+
+
+def _geojson_params(request):
+    """(bbox, zoom, waste_type) de la requête ; ValueError si invalides."""
+    bbox = parse_bbox(request.GET.get("bbox"))
+    zoom = int(request.GET.get("zoom", DETAIL_ZOOM))
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"zoom attendu entre 0 et {MAX_ZOOM}")
+    return bbox, zoom, _waste_type(request)
+
+
+def _geojson_entry(request):
+    try:
+        bbox, zoom, waste_type = _geojson_params(request)
+    except ValueError:
+        return {}  # la vue renverra 400
+    tiles = tilecache.bbox_tiles(bbox)
+    return _entry(request, "geojson", bbox, waste_type, tiles, bbox, zoom)
+
+
+def _check_tile(z, x, y):
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z):
+        raise Http404("Tuile inexistante")
+
+
+def _tile_entry(request, z, x, y):
+    _check_tile(z, x, y)
+    try:
+        waste_type = _waste_type(request)
+    except ValueError:
+        return {}
+    return _entry(
+        request, "mvt", tile_bounds(z, x, y), waste_type, [(z, x, y)], z, x, y
+    )
+
+
+def _respond(request, build, content_type):
+    """Sert le corps en cache, ou le construit avec build() et le met en cache."""
+    key, current, entry = request._map_entry
+    hit = entry["body"] is not None
+    if not hit:
+        entry["body"] = build()
+        tilecache.store(key, current, entry)
+    response = HttpResponse(entry["body"], content_type=content_type)
+    response["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
+
+# =============================================================================
+# REQUÊTES
+# =============================================================================
+def cluster_features(bbox, zoom, waste_type=None):
+    """
+    Entités GeoJSON des clusters dans l'emprise.
+
+    Au zoom ≥ DETAIL_ZOOM : un point par cluster.
+    En dessous : un point par (cellule de grille, catégorie), placé au
+    centre des centroïdes agrégés, avec la somme des report_count.
+    """
+    where, params = _where(bbox, waste_type)
+
+    if zoom >= DETAIL_ZOOM:
+        sql = f"""
+            SELECT ST_X(centroid::geometry), ST_Y(centroid::geometry),
+                   report_count, waste_type, 1, id
+            FROM reports_reportcluster
+            WHERE {where}
+            ORDER BY report_count DESC
+            LIMIT %s
+        """
+    else:
+        sql = f"""
+            SELECT ST_X(center), ST_Y(center), report_count, waste_type,
+                   cluster_count, NULL
+            FROM (
+                SELECT ST_Centroid(ST_Collect(centroid::geometry)) AS center,
+                       SUM(report_count) AS report_count,
+                       COUNT(*) AS cluster_count,
+                       waste_type
+                FROM reports_reportcluster
+                WHERE {where}
+                GROUP BY ST_SnapToGrid(centroid::geometry, %s), waste_type
+            ) AS cells
+            ORDER BY report_count DESC
+            LIMIT %s
+        """
+        params.append(_grid_size(zoom))
+    params.append(MAX_FEATURES)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    features = []
+    for lon, lat, report_count, waste, cluster_count, pk in rows:
+        properties = {
+            "report_count": int(report_count),
+            "waste_type": waste,
+            "cluster_count": cluster_count,
+        }
+        if pk is not None:
+            properties["id"] = pk
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": properties,
+            }
+        )
+    return features
+
+
+def cluster_tile_bytes(z, x, y, waste_type=None):
+    """Tuile vectorielle (protobuf MVT) de la couche "clusters"."""
+    filter_sql, params = "", [z, x, y]
+    if waste_type:
+        filter_sql = "AND c.waste_type = %s"
+        params.append(waste_type)
+    sql = f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%s, %s, %s) AS geom
+        ),
+        features AS (
+            SELECT ST_AsMVTGeom(ST_Transform(c.centroid::geometry, 3857), bounds.geom)
+                       AS geom,
+                   c.id, c.report_count, c.waste_type
+            FROM reports_reportcluster AS c, bounds
+            WHERE c.centroid::geometry && ST_Transform(bounds.geom, 4326)
+            {filter_sql}
+        )
+        SELECT ST_AsMVT(features.*, %s) FROM features
+    """
+    params.append(TILE_LAYER)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+    return bytes(tile or b"")
+
+
+# =============================================================================
+# VUES
+# =============================================================================
+@require_safe
+@cache_control(public=True, no_cache=True)  # toujours revalider (ETag)
+@condition(etag_func=lambda request: _geojson_entry(request).get("etag"))
+def clusters_geojson(request):
+    """GeoJSON des clusters pour une emprise et un niveau de zoom."""
+    try:
+        bbox, zoom, waste_type = _geojson_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    def build():
+        features = cluster_features(bbox, zoom, waste_type)
+        return json.dumps({"type": "FeatureCollection", "features": features})
+
+    _geojson_entry(request)
+    return _respond(request, build, "application/geo+json")
+
+
+@require_safe
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=lambda request, **kw: _tile_entry(request, **kw).get("etag"))
+def cluster_tile(request, z, x, y):
+    """Tuile vectorielle MVT des clusters."""
+    _check_tile(z, x, y)
+    try:
+        waste_type = _waste_type(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    _tile_entry(request, z, x, y)
+    return _respond(
+        request,
+        lambda: cluster_tile_bytes(z, x, y, waste_type),
+        "application/vnd.mapbox-vector-tile",
+    )
+
+
+@require_safe
+@cache_control(public=True, max_age=60)
+def heatmap_grid(request):
+    """Grille de densité des signalements (cellules [lat, lon, nombre])."""
+    try:
+        zoom = int(request.GET.get("zoom", heatmap.HEATMAP_MIN_ZOOM))
+        waste_type = _waste_type(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    zoom, grid, state = heatmap.get_grid(zoom, waste_type)
+    response = JsonResponse(heatmap.grid_payload(zoom, grid))
+    response["X-Cache"] = state
+    return response
+
+
+@staff_member_required
+@require_safe
+def cache_stats(request):
+    """Compteurs du cache cartographique du processus (staff uniquement)."""
+    return JsonResponse(tilecache.stats())
+
+
+@staff_member_required
+@require_safe
+def export_layer(request, layer, fmt):
+    """
+    Export en flux d'une couche (signalements ou clusters), sans charger
+    les lignes en mémoire. Staff uniquement : les descriptions des
+    signalements sont des saisies libres.
+    """
+    if layer not in export.LAYERS or fmt not in export.FORMATS:
+        raise Http404("Export inexistant")
+    try:
+        queryset = export.export_queryset(layer, **export.parse_filters(request.GET))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = StreamingHttpResponse(
+        export.stream(layer, fmt, queryset), content_type=export.CONTENT_TYPES[fmt]
+    )
+    filename = f"{layer}.{export.EXTENSIONS[fmt]}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
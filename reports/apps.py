@@ -7,3 +7,4 @@ class ReportsConfig(AppConfig):
 
     def ready(self):
         import reports.signals  # noqa: F401 — enregistre les signaux
+        import reports.dbpool  # noqa: F401 — compte les connexions établies
@@ -0,0 +1,120 @@
+"""
+Vues asynchrones de l'application Reports (serveur ASGI).
+
+Variantes de views.create_report et views.report_list : mêmes URL, même
+formulaire, mêmes templates. urls.py les sert à la place des vues
+synchrones quand ASYNC_VIEWS est actif ; l'application est alors lancée
+par un serveur ASGI (dump_alert.asgi), par exemple :
+
+    uvicorn dump_alert.asgi:application --workers 4
+
+Un worker traite alors de nombreuses requêtes à la fois sans qu'aucune
+n'immobilise un thread pendant ses attentes :
+
+- le corps de la requête (photo) est reçu par le serveur ASGI sans bloquer
+  la boucle d'événements, et mis en tampon sur disque au-delà de
+  FILE_UPLOAD_MAX_MEMORY_SIZE ;
+- validation du formulaire (normalisation Pillow de la photo) et écriture
+  de la photo dans le stockage, par blocs, dans le pool borné
+  images.pool() (REPORT_IMAGE_WORKERS threads) ;
+- insertion et clustering restent synchrones (transaction, signaux) :
+  sync_to_async, dans le thread de la requête ; les miniatures sont
+  générées dans le pool après le commit, sans retarder la réponse ;
+- page de la liste lue par l'ORM asynchrone (async for).
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.contrib.gis.geos import Point
+from django.db import transaction
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_http_methods
+
+from . import images
+from .forms import ReportForm
+from .views import _list_context, _list_query, _parse_coords
+
+# render() dans le thread de la requête : les context processors et le
+# template peuvent interroger la base (utilisateur, miniatures)
+_render = sync_to_async(render)
+
+
+async def _in_pool(func, *args):
+    """func(*args) dans images.pool(), sans bloquer la boucle d'événements."""
+    return await sync_to_async(func, thread_sensitive=False, executor=images.pool())(
+        *args
+    )
+
+
+def _validate(request):
+    """
+    Formulaire lié et validé : analyse du corps multipart, normalisation de
+    la photo. Aucune requête SQL (le modèle n'a pas de champ unique).
+    """
+    form = ReportForm(request.POST, request.FILES)
+    return form, form.is_valid()
+
+
+def _store_image(report):
+    """Écrit la photo dans le stockage (comme FileField.pre_save), par blocs."""
+    image = report.image
+    if image and not image._committed:
+        image.save(image.name, image.file, save=False)
+
+
+def _save_report(report):
+    """Signalement et clustering (ou tâche différée) validés ensemble."""
+    token = images.derivatives_in_pool.set(True)
+    try:
+        with transaction.atomic():
+            report.save()  # déclenche le clustering via signals.py
+    finally:
+        images.derivatives_in_pool.reset(token)
+
+
+@staff_member_required
+async def report_list(request):
+    """Variante asynchrone de views.report_list. URL : /reports/"""
+    reports, state = _list_query(request.GET)
+    page = [report async for report in reports]
+    context = await sync_to_async(_list_context)(page, state)
+    return await _render(request, "reports/report_list.html", context)
+
+
+@require_http_methods(["GET", "POST"])
+@login_required
+async def create_report(request):
+    """
+    Variante asynchrone de views.create_report (même formulaire, mêmes
+    messages d'erreur). URL : /signaler/
+    """
+    form = ReportForm()
+    error = None
+
+    if request.method == "POST":
+        form, valid = await _in_pool(_validate, request)
+        if valid:
+            try:
+                lat_f, lon_f = _parse_coords(
+                    request.POST.get("lat", "").strip(),
+                    request.POST.get("lon", "").strip(),
+                )
+            except ValueError as e:
+                error = str(e)
+            else:
+                report = form.save(commit=False)
+                report.location = Point(lon_f, lat_f, srid=4326)
+                await _in_pool(_store_image, report)
+                try:
+                    await sync_to_async(_save_report)(report)
+                except BaseException:
+                    # Pas de signalement : pas de photo orpheline
+                    if report.image:
+                        await _in_pool(report.image.storage.delete, report.image.name)
+                    raise
+                return redirect("reports:success")
+
+    return await _render(
+        request, "reports/report_form.html", {"form": form, "error": error}
+    )
@@ -0,0 +1,60 @@
+"""
+Outils communs aux insertions en masse sans signal (synthetic.py,
+importer.py) : bulk_create ou COPY, clustering fait ensuite par l'appelant.
+
+- backdate : dates de création voulues, après bulk_create ;
+- images de remplacement : Report.image est obligatoire, mais ces
+  signalements n'ont pas de photo. Chaque origine partage un seul fichier,
+  créé au premier appel, pour des millions de lignes :
+  - synthetic_image : signalements générés (benchmarks, jeux de test) ;
+  - imported_image : signalements historiques importés des fichiers des
+    partenaires, qui ne fournissent pas de photo.
+"""
+
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image
+
+SYNTHETIC_IMAGE_NAME = "reports/placeholder.png"
+IMPORTED_IMAGE_NAME = "reports/imported.png"
+
+
+def backdate(reports, dates):
+    """
+    Applique les dates de création voulues (auto_now_add impose "maintenant"
+    à bulk_create) : une seule requête pour tout le lot.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE reports_report AS r "
+            "SET created_at = v.ts, updated_at = v.ts "
+            "FROM unnest(%s::bigint[], %s::timestamptz[]) AS v(id, ts) "
+            "WHERE r.id = v.id",
+            [[r.pk for r in reports], list(dates)],
+        )
+
+
+def _shared_image(name, color):
+    """Nom de stockage de l'image unie `name`, créée si elle manque."""
+    if default_storage.exists(name):
+        return name
+    buf = BytesIO()
+    Image.new("RGB", (64, 48), color).save(buf, "PNG")
+    return default_storage.save(name, ContentFile(buf.getvalue()))
+
+
+def synthetic_image():
+    """Image neutre (grise) partagée par les signalements synthétiques."""
+    return _shared_image(SYNTHETIC_IMAGE_NAME, (128, 128, 128))
+
+
+def imported_image():
+    """
+    Image « photo non fournie » (beige) partagée par les signalements
+    importés : distincte de celle des données synthétiques, pour qu'un
+    signalement réel ne soit jamais pris pour une donnée de test.
+    """
+    return _shared_image(IMPORTED_IMAGE_NAME, (224, 214, 190))
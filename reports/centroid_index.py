@@ -0,0 +1,311 @@
+"""
+Index en mémoire des centroïdes de clusters (présélection des candidats).
+
+Chaque signalement cherche les clusters de même catégorie à
+≤ CLUSTER_DISTANCE_M (services.nearby_clusters, requête DWithin sur
+l'index GiST). Avec CENTROID_INDEX_PATH, la recherche se fait d'abord dans
+un instantané des centroïdes :
+
+- `refresh_centroid_index` écrit l'instantané : fichier binaire (module
+  array, sans NumPy) trié par cellule de grille (geo.neighbour_cells) et
+  par catégorie, remplacé atomiquement. Les workers d'une même machine le
+  projettent en mémoire (mmap) et partagent donc les mêmes pages ;
+- la recherche lit les 9 cellules voisines (bisect sur les clés) et retient
+  les centroïdes à ≤ distance + _SLACK_M ;
+- une seule requête confirme et verrouille : clusters candidats OU modifiés
+  depuis l'instantané (updated_at, marge _MARGIN_SECONDS pour les
+  transactions en cours), avec le test DWithin exact. Un cluster absent des
+  deux ensembles n'a pas bougé depuis l'instantané, où il est à sa place.
+
+Périmé, l'instantané n'est pas utilisé (chemin BDD habituel) :
+- trop ancien (CENTROID_INDEX_MAX_AGE) ;
+- génération différente : les traitements en masse (reconstruction,
+  recalcul, suppressions, clustering par lots), dont les transactions
+  peuvent dépasser la marge, incrémentent la séquence
+  reports_centroid_generation au début et au commit (invalidate()).
+  Cette génération est lue dans la requête de confirmation elle-même.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .geo import cell_key, distance_m, grid_cell, neighbour_cells
+from .models import (
+    WASTE_TYPE_CODES,
+    WITHIN_L93_SQL,
+    ReportCluster,
+    clustering_uses_l93,
+)
+
+_MAGIC = b"DACI"
+_FORMAT_VERSION = 1
+# magic, version, génération, date de l'instantané (epoch, horloge BDD),
+# pas de la grille (m), nombre de cellules, nombre de centroïdes
+_HEADER = struct.Struct("<4sIqddII")
+
+# Écart toléré entre geo.distance_m et la distance PostGIS (la requête de
+# confirmation reste exacte)
+_SLACK_M = 1.0
+# Durée maximale d'une transaction courte modifiant un cluster (et écart
+# d'horloge application / BDD)
+_MARGIN_SECONDS = 120
+
+_LOCKED_NEARBY_SQL = """
+    SELECT c.*, g.last_value AS index_generation
+    FROM (SELECT last_value FROM reports_centroid_generation) AS g
+    LEFT JOIN LATERAL (
+        SELECT *
+        FROM reports_reportcluster
+        WHERE waste_type = %s
+          AND (id = ANY(%s::bigint[]) OR updated_at >= %s)
+          AND {within}
+        ORDER BY id
+        FOR UPDATE
+    ) AS c ON true
+"""
+
+# Test de distance exact, selon CLUSTERING_GEOMETRY (paramètres lon, lat, distance)
+_WITHIN_GEOGRAPHY_SQL = (
+    "ST_DWithin(centroid, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s)"
+)
+
+_lock = threading.Lock()
+_snapshot = None
+_counters = {"hits": 0, "fallbacks": 0}
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def stats():
+    """Compteurs du processus : recherches servies par l'index / par la BDD."""
+    with _lock:
+        return dict(_counters)
+
+
+def _cell_key(waste_type, row, col):
+    return cell_key(WASTE_TYPE_CODES[waste_type], row, col)
+
+
+def _padded(data):
+    return data + b"\0" * (-len(data) % 8)
+
+
+# =============================================================================
+# ÉCRITURE
+# =============================================================================
+def _bump_generation():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('reports_centroid_generation')")
+
+
+def invalidate():
+    """
+    Rend les instantanés périmés, maintenant et au commit de la transaction
+    courante (les instantanés écrits pendant la transaction ne voient pas
+    ses modifications).
+    """
+    if not settings.CENTROID_INDEX_PATH:
+        return
+    _bump_generation()
+    transaction.on_commit(_bump_generation)
+
+
+def build(distance, path=None):
+    """
+    Écrit l'instantané des centroïdes (grille de pas `distance` mètres) dans
+    `path` (défaut : CENTROID_INDEX_PATH). Retourne des statistiques.
+    """
+    start = time.perf_counter()
+    path = path or settings.CENTROID_INDEX_PATH
+    with connection.cursor() as cursor:
+        # Génération et date lues AVANT les centroïdes
+        cursor.execute(
+            "SELECT last_value, extract(epoch FROM clock_timestamp()) "
+            "FROM reports_centroid_generation"
+        )
+        generation, built_at = cursor.fetchone()
+        cursor.execute(
+            """
+            SELECT id, waste_type, ST_X(centroid::geometry), ST_Y(centroid::geometry)
+            FROM reports_reportcluster
+            WHERE report_count > 0
+            """
+        )
+        rows = cursor.fetchall()
+
+    cell_m = distance + _SLACK_M
+    entries = sorted(
+        (_cell_key(waste_type, *grid_cell(lon, lat, cell_m)), pk, lon, lat)
+        for pk, waste_type, lon, lat in rows
+    )
+    keys = array("q")
+    offsets = array("I")
+    for i, (key, _, _, _) in enumerate(entries):
+        if not keys or keys[-1] != key:
+            keys.append(key)
+            offsets.append(i)
+    offsets.append(len(entries))
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _FORMAT_VERSION,
+        generation,
+        float(built_at),
+        cell_m,
+        len(keys),
+        len(entries),
+    )
+    parts = [
+        header,
+        keys.tobytes(),
+        offsets.tobytes(),
+        array("q", (e[1] for e in entries)).tobytes(),
+        array("d", (e[2] for e in entries)).tobytes(),
+        array("d", (e[3] for e in entries)).tobytes(),
+    ]
+    # Fichier temporaire dans le même dossier, puis remplacement atomique :
+    # les workers gardent l'ancien fichier projeté jusqu'à leur rechargement
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".centroids-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for part in parts:
+                f.write(_padded(part))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {
+        "clusters": len(entries),
+        "cells": len(keys),
+        "generation": generation,
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# =============================================================================
+# LECTURE
+# =============================================================================
+class Snapshot:
+    """Instantané projeté en mémoire (lecture seule)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.stat = os.fstat(f.fileno())
+        magic, version, generation, built_at, cell_m, n_cells, n_entries = (
+            _HEADER.unpack_from(self._mmap)
+        )
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"Instantané de centroïdes invalide : {path}")
+        self.generation = generation
+        self.built_at = built_at
+        self.cell_m = cell_m
+
+        view = memoryview(self._mmap)
+        position = _HEADER.size
+
+        def take(typecode, count):
+            nonlocal position
+            size = array(typecode).itemsize * count
+            data = view[position : position + size].cast(typecode)
+            position += size + (-size % 8)
+            return data
+
+        self.keys = take("q", n_cells)
+        self.offsets = take("I", n_cells + 1)
+        self.pks = take("q", n_entries)
+        self.lons = take("d", n_entries)
+        self.lats = take("d", n_entries)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def age(self):
+        return time.time() - self.built_at
+
+    def candidates(self, lon, lat, waste_type, distance):
+        """pk des clusters de la catégorie à ≤ distance + _SLACK_M du point."""
+        found = []
+        for row, col in neighbour_cells(lon, lat, self.cell_m):
+            key = _cell_key(waste_type, row, col)
+            i = bisect.bisect_left(self.keys, key)
+            if i == len(self.keys) or self.keys[i] != key:
+                continue
+            for j in range(self.offsets[i], self.offsets[i + 1]):
+                if (
+                    distance_m(lon, lat, self.lons[j], self.lats[j])
+                    <= distance + _SLACK_M
+                ):
+                    found.append(self.pks[j])
+        return found
+
+
+def current():
+    """Instantané à jour du fichier CENTROID_INDEX_PATH (None s'il n'existe pas)."""
+    global _snapshot
+    path = settings.CENTROID_INDEX_PATH
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None or (snapshot.stat.st_ino, snapshot.stat.st_mtime_ns) != (
+            stat.st_ino,
+            stat.st_mtime_ns,
+        ):
+            snapshot = _snapshot = Snapshot(path)
+        return snapshot
+
+
+def locked_nearby(location, waste_type, distance):
+    """
+    Clusters de la catégorie à ≤ `distance` mètres du point, verrouillés
+    (SELECT … FOR UPDATE), trouvés via l'instantané.
+
+    None si l'index est désactivé, absent ou périmé : l'appelant passe alors
+    par services.nearby_clusters. À appeler dans une transaction.
+    """
+    snapshot = current()
+    if snapshot is None or snapshot.age() > settings.CENTROID_INDEX_MAX_AGE:
+        _count("fallbacks")
+        return None
+
+    lon, lat = location.x, location.y
+    pks = snapshot.candidates(lon, lat, waste_type, distance)
+    since = datetime.fromtimestamp(snapshot.built_at, tz=dt_timezone.utc) - timedelta(
+        seconds=_MARGIN_SECONDS
+    )
+    rows = list(
+        ReportCluster.objects.raw(
+            _LOCKED_NEARBY_SQL.format(
+                within=WITHIN_L93_SQL
+                if clustering_uses_l93()
+                else _WITHIN_GEOGRAPHY_SQL
+            ),
+            [waste_type, pks, since, lon, lat, distance],
+        )
+    )
+    if rows[0].index_generation != snapshot.generation:
+        _count("fallbacks")
+        return None
+    _count("hits")
+    return [cluster for cluster in rows if cluster.pk is not None]
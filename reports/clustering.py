@@ -0,0 +1,158 @@
+"""
+Moteur de clustering en mémoire.
+
+Rejoue exactement la logique de `services.assign_report_to_cluster`
+(0 cluster proche → création, 1 → ajout, 2+ → fusion dans le plus ancien)
+sans aller-retour avec la base : les centroïdes sont indexés dans une grille
+(`geo.neighbour_cells`) et la distance est calculée en Python.
+
+Utilisé par les chemins "en masse" (reconstruction complète, imports) qui
+écrivent ensuite le résultat avec bulk_create / bulk_update.
+"""
+
+from collections import defaultdict
+from itertools import count
+
+from .geo import distance_m, grid_cell, neighbour_cells
+
+
+class EngineCluster:
+    """Cluster manipulé par le moteur (existant en base ou nouveau)."""
+
+    __slots__ = (
+        "key",
+        "pk",
+        "rank",
+        "waste_type",
+        "sum_lon",
+        "sum_lat",
+        "report_count",
+        "report_ids",
+        "cell",
+    )
+
+    def __init__(self, key, pk, rank, waste_type):
+        self.key = key
+        self.pk = pk  # None tant que le cluster n'est pas écrit en base
+        self.rank = rank  # ordre d'ancienneté : le plus petit est conservé à la fusion
+        self.waste_type = waste_type
+        self.sum_lon = 0.0
+        self.sum_lat = 0.0
+        self.report_count = 0
+        self.report_ids = []  # signalements rattachés par le moteur
+        self.cell = None
+
+    @property
+    def centroid(self):
+        """(lon, lat) : moyenne arithmétique des coordonnées des membres."""
+        return (
+            self.sum_lon / self.report_count,
+            self.sum_lat / self.report_count,
+        )
+
+
+class ClusterEngine:
+    """
+    Assigne des points à des clusters, dans l'ordre où ils sont fournis.
+
+    Exemple :
+        engine = ClusterEngine(distance=10)
+        for pk, lon, lat, waste_type in points:
+            engine.add(pk, lon, lat, waste_type)
+        engine.clusters   # clusters vivants (clé → EngineCluster)
+        engine.merged_into()  # clusters existants absorbés par une fusion
+    """
+
+    def __init__(self, distance):
+        self.distance = distance
+        self.clusters = {}
+        self.merged = {}
+        self._forward = {}  # clé absorbée → clé du cluster qui l'a absorbée
+        self._grid = defaultdict(set)  # (waste_type, ligne, colonne) → clés
+        self._keys = count()
+
+    # -------------------------------------------------------------------------
+    # Index spatial
+    # -------------------------------------------------------------------------
+    def _index(self, cluster):
+        lon, lat = cluster.centroid
+        cell = (cluster.waste_type, *grid_cell(lon, lat, self.distance))
+        if cell != cluster.cell:
+            if cluster.cell is not None:
+                self._grid[cluster.cell].discard(cluster.key)
+            self._grid[cell].add(cluster.key)
+            cluster.cell = cell
+
+    def _unindex(self, cluster):
+        self._grid[cluster.cell].discard(cluster.key)
+        cluster.cell = None
+
+    def nearby(self, lon, lat, waste_type):
+        """Clusters de même catégorie dont le centroïde est à ≤ `distance` mètres."""
+        found = []
+        for row, col in neighbour_cells(lon, lat, self.distance):
+            for key in self._grid.get((waste_type, row, col), ()):
+                cluster = self.clusters[key]
+                c_lon, c_lat = cluster.centroid
+                if distance_m(lon, lat, c_lon, c_lat) <= self.distance:
+                    found.append(cluster)
+        return found
+
+    # -------------------------------------------------------------------------
+    # Alimentation
+    # -------------------------------------------------------------------------
+    def seed(self, pk, rank, waste_type, sum_lon, sum_lat, report_count):
+        """Charge un cluster déjà présent en base."""
+        cluster = EngineCluster(next(self._keys), pk, rank, waste_type)
+        cluster.sum_lon = sum_lon
+        cluster.sum_lat = sum_lat
+        cluster.report_count = report_count
+        self.clusters[cluster.key] = cluster
+        self._index(cluster)
+        return cluster
+
+    def add(self, report_id, lon, lat, waste_type):
+        """Assigne un point et retourne le cluster qui le contient."""
+        nearby = self.nearby(lon, lat, waste_type)
+
+        if len(nearby) == 0:
+            key = next(self._keys)
+            # Les nouveaux clusters sont toujours plus récents que ceux en base
+            cluster = EngineCluster(key, None, (1, key), waste_type)
+            self.clusters[key] = cluster
+        elif len(nearby) == 1:
+            cluster = nearby[0]
+        else:
+            cluster = self._merge(nearby)
+
+        cluster.sum_lon += lon
+        cluster.sum_lat += lat
+        cluster.report_count += 1
+        cluster.report_ids.append(report_id)
+        self._index(cluster)
+        return cluster
+
+    def _merge(self, clusters):
+        ordered = sorted(clusters, key=lambda c: c.rank)
+        main = ordered[0]
+        for other in ordered[1:]:
+            main.sum_lon += other.sum_lon
+            main.sum_lat += other.sum_lat
+            main.report_count += other.report_count
+            main.report_ids.extend(other.report_ids)
+            if other.pk is not None:
+                self.merged[other.pk] = other.key
+            self._forward[other.key] = main.key
+            self._unindex(other)
+            del self.clusters[other.key]
+        return main
+
+    def resolve(self, key):
+        """Cluster vivant qui a (directement ou non) absorbé le cluster `key`."""
+        while key in self._forward:
+            key = self._forward[key]
+        return self.clusters[key]
+
+    def merged_into(self):
+        """{pk absorbé : cluster final} pour les clusters existants fusionnés."""
+        return {pk: self.resolve(key) for pk, key in self.merged.items()}
@@ -0,0 +1,84 @@
+"""
+Connexions PostgreSQL : connexions persistantes, pool et statistiques.
+
+Trois modes, choisis dans settings.py par variables d'environnement :
+- une connexion par requête (DATABASE_CONN_MAX_AGE=0, défaut ; imposé
+  avec ASYNC_VIEWS sans pool) : poignée de main TCP + authentification à
+  chaque requête ;
+- connexions persistantes (DATABASE_CONN_MAX_AGE > 0) : chaque thread
+  garde sa connexion, vérifiée avant réutilisation (CONN_HEALTH_CHECKS) ;
+  autant de connexions que de threads de worker ;
+- pool (DATABASE_POOL) : pool psycopg 3 partagé par les threads du
+  processus, DATABASE_POOL_MIN_SIZE … DATABASE_POOL_MAX_SIZE connexions ;
+  au-delà, une requête attend une connexion libre au plus
+  DATABASE_POOL_TIMEOUT secondes. À préférer sous ASGI, où chaque requête
+  a son propre thread. Nécessite psycopg 3 et psycopg_pool.
+
+Connexions vers PostgreSQL au plus : processus × DATABASE_POOL_MAX_SIZE,
+à garder sous max_connections.
+
+stats() : connexions établies par Django (signal connection_created ; en
+mode pool, une par emprunt) et, en mode pool, occupation et attente du
+pool (get_stats() de psycopg_pool), exposées par /reports/metrics.
+"""
+
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_connects = {}  # alias → connexions établies
+
+
+@receiver(connection_created)
+def _count_connect(sender, connection, **kwargs):
+    with _lock:
+        _connects[connection.alias] = _connects.get(connection.alias, 0) + 1
+
+
+def connects(alias=DEFAULT_DB_ALIAS):
+    """Connexions établies par Django sur l'alias depuis le démarrage du processus."""
+    with _lock:
+        return _connects.get(alias, 0)
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Occupation et attente du pool de l'alias ; {} hors mode pool.
+
+    - in_use / max : connexions empruntées, taille maximale ; saturation :
+      leur rapport (1.0 : les requêtes suivantes attendent) ;
+    - waiting : requêtes en attente d'une connexion en ce moment ;
+    - requests, queued, timeouts : emprunts, emprunts ayant attendu,
+      attentes abandonnées (DATABASE_POOL_TIMEOUT) ;
+    - wait_seconds : temps d'attente cumulé ;
+    - opened : connexions ouvertes vers PostgreSQL par le pool.
+    """
+    pool = connections[alias].pool
+    if pool is None:
+        return {}
+    raw = pool.get_stats()  # compteurs nuls absents
+    in_use = raw["pool_size"] - raw["pool_available"]
+    return {
+        "size": raw["pool_size"],
+        "available": raw["pool_available"],
+        "in_use": in_use,
+        "max": raw["pool_max"],
+        "saturation": in_use / raw["pool_max"],
+        "waiting": raw.get("requests_waiting", 0),
+        "requests": raw.get("requests_num", 0),
+        "queued": raw.get("requests_queued", 0),
+        "timeouts": raw.get("requests_errors", 0),
+        "wait_seconds": raw.get("requests_wait_ms", 0) / 1000,
+        "opened": raw.get("connections_num", 0),
+    }
+
+
+def stats(alias=DEFAULT_DB_ALIAS):
+    """Connexions établies et, en mode pool, statistiques du pool (préfixe pool_)."""
+    return {
+        "connects": connects(alias),
+        **{f"pool_{name}": value for name, value in pool_stats(alias).items()},
+    }
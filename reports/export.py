@@ -0,0 +1,356 @@
+"""
+Export en flux des signalements et des clusters (QGIS, open data).
+
+Formats :
+- geojsonseq : GeoJSON Text Sequences (RFC 8142), une entité par ligne ;
+- csv        : une ligne par entité, colonnes lon / lat en WGS84 ;
+- fgb        : FlatGeobuf sans index spatial (lisible par QGIS / GDAL).
+
+Les lignes sont lues par un curseur côté serveur (iterator(chunk_size=…))
+et écrites au fil de l'eau : la mémoire reste constante quelle que soit la
+taille de l'export. Tri par id : un export interrompu reprend avec
+min_id = dernier id reçu + 1.
+
+Utilisé par la vue api.export_layer (StreamingHttpResponse) et par la commande
+`export_reports`.
+"""
+
+import csv
+import io
+import json
+import struct
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Latitude, Longitude, Report, ReportCluster
+
+LAYERS = ("reports", "clusters")
+FORMATS = ("geojsonseq", "csv", "fgb")
+
+CONTENT_TYPES = {
+    "geojsonseq": "application/geo+json-seq",
+    "csv": "text/csv; charset=utf-8",
+    "fgb": "application/octet-stream",
+}
+EXTENSIONS = {"geojsonseq": "geojsons", "csv": "csv", "fgb": "fgb"}
+
+# Lignes lues par aller-retour du curseur serveur
+CHUNK_SIZE = 2000
+# Taille des morceaux envoyés au client
+_BUFFER_BYTES = 64 * 1024
+
+# Colonnes exportées : (nom, type) ; la géométrie s'y ajoute
+_COLUMNS = {
+    "reports": [
+        ("id", "long"),
+        ("type", "string"),
+        ("status", "string"),
+        ("description", "string"),
+        ("cluster_id", "long"),
+        ("created_at", "datetime"),
+        ("updated_at", "datetime"),
+    ],
+    "clusters": [
+        ("id", "long"),
+        ("waste_type", "string"),
+        ("report_count", "int"),
+        ("created_at", "datetime"),
+        ("updated_at", "datetime"),
+    ],
+}
+
+
+# =============================================================================
+# FILTRES
+# =============================================================================
+def _parse_bound(value, end_of_day=False):
+    """Date ou date-heure ISO → datetime aware ; ValueError si illisible."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Date invalide : {value}")
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_filters(params):
+    """
+    Filtres d'export depuis un dictionnaire de chaînes (request.GET ou
+    options de la commande) : status, type, since, until, min_id, max_id.
+    Lève ValueError si une valeur est invalide.
+    """
+    filters = {}
+    status, waste_type = params.get("status"), params.get("type")
+    if status:
+        if status not in Report.Status.values:
+            raise ValueError(f"Statut inconnu : {status}")
+        filters["status"] = status
+    if waste_type:
+        if waste_type not in Report.WasteType.values:
+            raise ValueError(f"Catégorie inconnue : {waste_type}")
+        filters["waste_type"] = waste_type
+    if params.get("since"):
+        filters["since"] = _parse_bound(params["since"])
+    if params.get("until"):
+        filters["until"] = _parse_bound(params["until"], end_of_day=True)
+    for name in ("min_id", "max_id"):
+        if params.get(name) not in (None, ""):
+            filters[name] = int(params[name])
+    return filters
+
+
+def export_queryset(
+    layer,
+    status=None,
+    waste_type=None,
+    since=None,
+    until=None,
+    min_id=None,
+    max_id=None,
+):
+    """Lignes exportées (dictionnaires avec lon / lat), triées par id."""
+    if layer == "reports":
+        queryset = Report.objects.annotate(
+            lon=Longitude("location"), lat=Latitude("location")
+        )
+        if status:
+            queryset = queryset.filter(status=status)
+        if waste_type:
+            queryset = queryset.filter(type=waste_type)
+    elif layer == "clusters":
+        if status:
+            raise ValueError("Le filtre status ne s'applique qu'aux signalements")
+        queryset = ReportCluster.objects.annotate(
+            lon=Longitude("centroid"), lat=Latitude("centroid")
+        )
+        if waste_type:
+            queryset = queryset.filter(waste_type=waste_type)
+    else:
+        raise ValueError(f"Couche inconnue : {layer}")
+
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lte=until)
+    if min_id is not None:
+        queryset = queryset.filter(pk__gte=min_id)
+    if max_id is not None:
+        queryset = queryset.filter(pk__lte=max_id)
+    names = [name for name, _ in _COLUMNS[layer]]
+    return queryset.order_by("pk").values(*names, "lon", "lat")
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# =============================================================================
+# FORMATS TEXTE
+# =============================================================================
+def _geojsonseq_header(layer):
+    return b""
+
+
+def _geojsonseq_row(layer, row):
+    feature = {
+        "type": "Feature",
+        "id": row["id"],
+        "geometry": {"type": "Point", "coordinates": [row["lon"], row["lat"]]},
+        "properties": {name: _value(row[name]) for name, _ in _COLUMNS[layer]},
+    }
+    return f"\x1e{json.dumps(feature, ensure_ascii=False)}\n".encode()
+
+
+def _csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().encode()
+
+
+def _csv_header(layer):
+    return _csv_line([name for name, _ in _COLUMNS[layer]] + ["lon", "lat"])
+
+
+def _csv_row(layer, row):
+    names = [name for name, _ in _COLUMNS[layer]] + ["lon", "lat"]
+    return _csv_line([_value(row[name]) for name in names])
+
+
+# =============================================================================
+# FLATGEOBUF
+# =============================================================================
+# Spécification : https://flatgeobuf.org (schémas header.fbs / feature.fbs).
+# Fichier = octets magiques, en-tête (table Header), puis une table Feature
+# par entité ; chaque table est précédée de sa taille (uint32).
+_FGB_MAGIC = b"fgb\x03fgb\x00"
+_FGB_POINT = 1  # GeometryType.Point
+_FGB_TYPES = {"int": 5, "long": 7, "string": 11, "datetime": 13}  # ColumnType
+
+
+class _FlatBuffer:
+    """
+    Sérialiseur FlatBuffers minimal, écrit du début vers la fin : chaque table
+    est suivie de ses objets (chaînes, vecteurs, sous-tables), tous les
+    décalages sont donc positifs. Les alignements sont comptés depuis le
+    préfixe de taille qui précède le tampon, comme les écrivains officiels.
+
+    Une table est une liste de (slot, format, valeur) : format struct
+    ("B", "H", "i", "Q"…) pour un scalaire, ou "string", "table", "tables",
+    "vector:<format>" pour un objet. Les valeurs None sont omises.
+    """
+
+    def __init__(self):
+        self.data = bytearray(4)  # préfixe de taille, rempli par finish()
+
+    def _pad(self, align, extra=0):
+        """Complète pour que position + extra soit multiple de `align`."""
+        self.data += bytes(-(len(self.data) + extra) % align)
+
+    def _link(self, at, target):
+        struct.pack_into("<I", self.data, at, target - at)
+
+    def finish(self, root):
+        at = len(self.data)
+        self.data += bytes(4)
+        self._link(at, self.table(root))
+        struct.pack_into("<I", self.data, 0, len(self.data) - 4)
+        return bytes(self.data)
+
+    def table(self, fields):
+        fields = sorted(f for f in fields if f[2] is not None)
+        sizes = {
+            slot: struct.calcsize(fmt) if len(fmt) == 1 else 4
+            for slot, fmt, _ in fields
+        }
+        vtable_len = 4 + 2 * (fields[-1][0] + 1 if fields else 0)
+        self._pad(4, vtable_len)  # la table suit la vtable, alignée sur 4
+        vtable_pos = len(self.data)
+        table_pos = vtable_pos + vtable_len
+
+        # Champs en ligne, du plus grand au plus petit, chacun aligné
+        offsets, cursor = {}, 4  # 4 premiers octets : décalage vers la vtable
+        for slot in sorted(sizes, key=lambda s: -sizes[s]):
+            cursor += -(table_pos + cursor) % sizes[slot]
+            offsets[slot], cursor = cursor, cursor + sizes[slot]
+
+        vtable = [vtable_len, cursor]
+        vtable += [offsets.get(slot, 0) for slot in range((vtable_len - 4) // 2)]
+        self.data += struct.pack(f"<{len(vtable)}H", *vtable)
+        table = bytearray(cursor)
+        struct.pack_into("<i", table, 0, table_pos - vtable_pos)
+        for slot, fmt, value in fields:
+            if len(fmt) == 1:
+                struct.pack_into(f"<{fmt}", table, offsets[slot], value)
+        self.data += table
+
+        for slot, fmt, value in fields:
+            if len(fmt) > 1:
+                self._link(table_pos + offsets[slot], self._object(fmt, value))
+        return table_pos
+
+    def _object(self, fmt, value):
+        if fmt == "table":
+            return self.table(value)
+        if fmt == "string":
+            value = value.encode()
+            self._pad(4)
+            pos = len(self.data)
+            self.data += struct.pack("<I", len(value)) + value + b"\x00"
+            return pos
+        if fmt == "tables":
+            self._pad(4)
+            pos = len(self.data)
+            self.data += struct.pack("<I", len(value)) + bytes(4 * len(value))
+            for i, fields in enumerate(value):
+                self._link(pos + 4 + 4 * i, self.table(fields))
+            return pos
+        item = fmt.removeprefix("vector:")
+        self._pad(max(4, struct.calcsize(item)), 4)  # éléments alignés
+        pos = len(self.data)
+        self.data += struct.pack(f"<I{len(value)}{item}", len(value), *value)
+        return pos
+
+
+def _fgb_header(layer):
+    columns = [
+        [(0, "string", name), (1, "B", _FGB_TYPES[kind])]
+        for name, kind in _COLUMNS[layer]
+    ]
+    crs = [(0, "string", "EPSG"), (1, "i", 4326)]
+    # features_count = 0 (inconnu) et index_node_size = 0 (pas d'index) :
+    # autorisés pour un fichier écrit en flux
+    return _FGB_MAGIC + _FlatBuffer().finish(
+        [
+            (0, "string", layer),
+            (2, "B", _FGB_POINT),
+            (7, "tables", columns),
+            (8, "Q", 0),
+            (9, "H", 0),
+            (10, "table", crs),
+        ]
+    )
+
+
+def _fgb_properties(layer, row):
+    """Propriétés encodées : (index de colonne uint16, valeur) ; None omis."""
+    out = bytearray()
+    for i, (name, kind) in enumerate(_COLUMNS[layer]):
+        value = row[name]
+        if value is None:
+            continue
+        out += struct.pack("<H", i)
+        if kind == "int":
+            out += struct.pack("<i", value)
+        elif kind == "long":
+            out += struct.pack("<q", value)
+        else:
+            raw = str(_value(value)).encode()
+            out += struct.pack("<I", len(raw)) + raw
+    return out
+
+
+def _fgb_row(layer, row):
+    geometry = [(1, "vector:d", [row["lon"], row["lat"]])]
+    return _FlatBuffer().finish(
+        [(0, "table", geometry), (1, "vector:B", _fgb_properties(layer, row))]
+    )
+
+
+# =============================================================================
+# ÉCRITURE
+# =============================================================================
+_WRITERS = {
+    "geojsonseq": (_geojsonseq_header, _geojsonseq_row),
+    "csv": (_csv_header, _csv_row),
+    "fgb": (_fgb_header, _fgb_row),
+}
+
+
+def stream(layer, fmt, queryset, chunk_size=CHUNK_SIZE, header=True, progress=None):
+    """
+    Octets du fichier exporté, par morceaux d'environ 64 Kio. header=False
+    omet l'en-tête (reprise d'un CSV). `progress(n, dernière ligne)` est
+    appelé une fois chaque morceau consommé : la dernière ligne signalée est
+    réellement écrite, son id sert à reprendre.
+    """
+    write_header, write_row = _WRITERS[fmt]
+    buf = bytearray(write_header(layer) if header else b"")
+    count, last = 0, None
+    for row in queryset.iterator(chunk_size=chunk_size):
+        buf += write_row(layer, row)
+        count, last = count + 1, row
+        if len(buf) >= _BUFFER_BYTES:
+            yield bytes(buf)
+            buf.clear()
+            if progress is not None:
+                progress(count, last)
+            count = 0
+    if buf:
+        yield bytes(buf)
+    if progress is not None and count:
+        progress(count, last)
@@ -4,9 +4,16 @@ Formulaire public de signalement de dépôt sauvage.
 Ce formulaire est accessible sans connexion par n'importe quel citoyen.
 Il ne contient PAS le champ 'status' (géré uniquement par l'admin)
 ni le champ 'location' (capturé via un clic sur la carte Leaflet).
+
+La photo est normalisée avant enregistrement (voir images.normalize_upload) :
+on ne stocke jamais l'original de plusieurs Mo envoyé par le téléphone.
 """
 
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from .images import normalize_upload
 from .models import Report
 
 
@@ -27,3 +34,22 @@ class ReportForm(forms.ModelForm):
             "description": "Description",
             "type": "Catégorie de déchets",
         }
+
+    def clean_image(self):
+        """Refuse les fichiers démesurés puis réduit/ré-encode la photo."""
+        image = self.cleaned_data.get("image")
+        if not isinstance(image, UploadedFile):
+            return image
+
+        if image.size > settings.REPORT_IMAGE_MAX_UPLOAD_BYTES:
+            raise forms.ValidationError(
+                f"Fichier trop volumineux "
+                f"(maximum {settings.REPORT_IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)} Mo)"
+            )
+
+        if not settings.REPORT_IMAGE_NORMALIZE:
+            return image
+        try:
+            return normalize_upload(image)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
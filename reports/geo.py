@@ -0,0 +1,163 @@
+"""
+Outils géographiques sans base de données.
+
+Fonctions pures utilisées par le moteur de clustering en mémoire :
+- distance en mètres entre deux points WGS84 (approximation ellipsoïdale locale)
+- grille régulière en degrés dont les cellules mesurent au moins N mètres,
+  et clé entière d'une cellule par catégorie
+- tuiles Web Mercator z/x/y (emprise d'une tuile, tuile d'un point)
+- zone couverte par le service (Beauvais et alentours) et son carroyage
+  en secteurs
+
+La distance reproduit celle de PostGIS (ST_DWithin sur geography, sphéroïde
+WGS84) au millimètre près pour les petites distances qui nous intéressent (≤ 1 km).
+"""
+
+import math
+
+# Ellipsoïde WGS84
+_WGS84_A = 6378137.0  # demi-grand axe (m)
+_WGS84_E2 = 6.69437999014e-3  # excentricité au carré
+
+
+def meters_per_degree(lat):
+    """
+    Retourne (mètres par degré de longitude, mètres par degré de latitude)
+    à la latitude donnée, sur l'ellipsoïde WGS84.
+    """
+    phi = math.radians(lat)
+    w = 1 - _WGS84_E2 * math.sin(phi) ** 2
+    # Rayon de courbure dans le premier vertical (N) et méridien (M)
+    n = _WGS84_A / math.sqrt(w)
+    m = _WGS84_A * (1 - _WGS84_E2) / w**1.5
+    return math.radians(1) * n * math.cos(phi), math.radians(1) * m
+
+
+def distance_m(lon1, lat1, lon2, lat2):
+    """Distance en mètres entre deux points proches (plan tangent à la latitude moyenne)."""
+    m_lon, m_lat = meters_per_degree((lat1 + lat2) / 2)
+    dx = (lon2 - lon1) * m_lon
+    dy = (lat2 - lat1) * m_lat
+    return math.hypot(dx, dy)
+
+
+# =============================================================================
+# GRILLE
+# =============================================================================
+# Les lignes ont une hauteur constante en degrés de latitude. La largeur des
+# colonnes (en degrés de longitude) dépend de la ligne : elle est calculée au
+# bord le plus proche du pôle des lignes voisines, si bien qu'une cellule fait
+# toujours au moins `cell_m` mètres de large. Deux points à moins de `cell_m`
+# mètres sont donc toujours dans des cellules adjacentes (voisinage 3×3).
+
+_LAT_METERS = meters_per_degree(45)[1]  # ~111 km, variation < 1 % sur le globe
+
+
+def _row_height(cell_m):
+    # Marge de 1 % : la longueur d'un degré de latitude varie avec la latitude
+    return cell_m * 1.01 / _LAT_METERS
+
+
+def _col_width(row, cell_m):
+    height = _row_height(cell_m)
+    # Bord le plus proche du pôle parmi les lignes row-2 … row+2
+    edge = max(abs((row - 2) * height), abs((row + 3) * height))
+    edge = min(edge, 89.9)
+    return min(cell_m * 1.01 / meters_per_degree(edge)[0], 360.0)
+
+
+def grid_cell(lon, lat, cell_m):
+    """Cellule (ligne, colonne) de la grille de pas `cell_m` contenant le point."""
+    row = math.floor(lat / _row_height(cell_m))
+    return row, math.floor(lon / _col_width(row, cell_m))
+
+
+def neighbour_cells(lon, lat, cell_m):
+    """
+    Les 9 cellules pouvant contenir un point situé à ≤ `cell_m` mètres.
+    Triées, donc dans un ordre déterministe.
+    """
+    row = math.floor(lat / _row_height(cell_m))
+    cells = []
+    for r in (row - 1, row, row + 1):
+        col = math.floor(lon / _col_width(r, cell_m))
+        cells.extend((r, c) for c in (col - 1, col, col + 1))
+    return sorted(cells)
+
+
+_CELL_KEY_OFFSET = 1 << 23  # lignes / colonnes négatives
+
+
+def cell_key(category, row, col, namespace=0):
+    """
+    Clé entière (0 ≤ clé < 2**63) de la cellule (ligne, colonne) pour la
+    catégorie `category` (0 à 15) : espace de noms sur les bits 52 à 62,
+    catégorie sur les bits 48 à 51, ligne et colonne sur 24 bits chacune.
+    """
+    return (
+        (namespace << 52)
+        | (category << 48)
+        | ((row + _CELL_KEY_OFFSET) << 24)
+        | (col + _CELL_KEY_OFFSET)
+    )
+
+
+# =============================================================================
+# TUILES WEB MERCATOR (schéma XYZ, comme Leaflet / OSM)
+# =============================================================================
+MAX_ZOOM = 22  # niveau le plus fin servi (tuiles d'environ 10 m)
+
+
+def tile_bounds(z, x, y):
+    """Emprise (lon_min, lat_min, lon_max, lat_max) de la tuile z/x/y."""
+    n = 2**z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_for_point(lon, lat, z):
+    """Coordonnées (x, y) de la tuile de niveau z contenant le point."""
+    n = 2**z
+    lat = max(min(lat, 85.0511), -85.0511)
+    phi = math.radians(lat)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(phi)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+# =============================================================================
+# ZONE COUVERTE
+# =============================================================================
+BEAUVAIS_BOUNDS = (1.80, 49.35, 2.30, 49.55)  # lon_min, lat_min, lon_max, lat_max
+
+
+def in_beauvais(lon, lat):
+    """Vrai si le point est dans la zone couverte par le service (Beauvais)."""
+    lon_min, lat_min, lon_max, lat_max = BEAUVAIS_BOUNDS
+    return lon_min <= lon <= lon_max and lat_min <= lat <= lat_max
+
+
+# =============================================================================
+# SECTEURS (carroyage de la zone couverte)
+# =============================================================================
+# Quartiers approchés par un carroyage d'environ 2 km : colonnes A, B, C…
+# d'ouest en est, lignes 1, 2, 3… du nord au sud (« C4 »). Statistiques du
+# tableau de bord ; la fonction SQL reports_stat_sector (migration 0012)
+# applique le même calcul.
+SECTOR_LON_STEP = 0.03  # ~2,2 km à Beauvais
+SECTOR_LAT_STEP = 0.02  # ~2,2 km
+
+
+def sector_for_point(lon, lat):
+    """Secteur du point (ex. "C4"), chaîne vide hors de la zone couverte."""
+    if not in_beauvais(lon, lat):
+        return ""
+    lon_min, lat_min, lon_max, lat_max = BEAUVAIS_BOUNDS
+    cols = math.ceil((lon_max - lon_min) / SECTOR_LON_STEP)
+    rows = math.ceil((lat_max - lat_min) / SECTOR_LAT_STEP)
+    col = min(math.floor((lon - lon_min) / SECTOR_LON_STEP), cols - 1)
+    row = min(math.floor((lat_max - lat) / SECTOR_LAT_STEP), rows - 1)
+    return f"{chr(ord('A') + col)}{row + 1}"
@@ -0,0 +1,160 @@
+"""
+Carte de chaleur des signalements : grilles de densité précalculées.
+
+Une grille par niveau de zoom (HEATMAP_MIN_ZOOM … HEATMAP_MAX_ZOOM) et par
+filtre de catégorie, sur la zone couverte (BEAUVAIS_BOUNDS, identique à
+LEAFLET_CONFIG["MAX_EXTENT"]). Les signalements rejetés sont exclus.
+
+- Calcul complet : une requête GROUP BY ST_SnapToGrid(location, pas) ;
+  le pas vaut 1/8 de tuile au zoom demandé.
+- Rafraîchissement incrémental : la grille mémorise le plus grand id
+  agrégé ; à la lecture suivante, seuls les signalements d'id supérieur
+  (parcours de la clé primaire) sont ajoutés à leur cellule.
+- Contrôle : le total de la grille est comparé au compteur précalculé
+  ReportStat (voir stats.py). Une suppression, un rejet ou un signalement
+  validé hors ordre d'id rend les totaux différents : la grille est
+  recalculée entièrement.
+
+Les grilles sont gardées dans le cache "tiles" (vidé avec tilecache.clear()).
+"""
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Sum
+
+from . import tilecache
+from .geo import BEAUVAIS_BOUNDS
+from .models import Report, ReportStat
+
+HEATMAP_MIN_ZOOM = 10
+HEATMAP_MAX_ZOOM = 17
+
+# Au-delà de ce nombre de nouveaux signalements, recalcul complet
+_INCREMENTAL_LIMIT = 5000
+
+_WHERE_SQL = """
+    location::geometry && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+    AND status <> %s
+"""
+
+
+def cell_size(zoom):
+    """Pas de la grille en degrés : 1/8 de tuile au zoom donné."""
+    return 360 / 2**zoom / 8
+
+
+def clamp_zoom(zoom):
+    return min(max(zoom, HEATMAP_MIN_ZOOM), HEATMAP_MAX_ZOOM)
+
+
+def _where(waste_type):
+    sql = _WHERE_SQL
+    params = [*BEAUVAIS_BOUNDS, Report.Status.REJECTED]
+    if waste_type:
+        sql += " AND type = %s"
+        params.append(waste_type)
+    return sql, params
+
+
+def _expected_total(waste_type):
+    """Signalements non rejetés de la zone, lus dans ReportStat."""
+    stats = ReportStat.objects.exclude(sector="").exclude(status=Report.Status.REJECTED)
+    if waste_type:
+        stats = stats.filter(waste_type=waste_type)
+    return stats.aggregate(n=Sum("count"))["n"] or 0
+
+
+def compute_grid(zoom, waste_type=None):
+    """Grille complète : {"watermark", "total", "cells": {(ix, iy): n}}."""
+    size = cell_size(zoom)
+    where, params = _where(waste_type)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM reports_report")
+        watermark = cursor.fetchone()[0]
+        cursor.execute(
+            f"""
+            SELECT round(ST_X(cell) / %s)::bigint, round(ST_Y(cell) / %s)::bigint, n
+            FROM (
+                SELECT ST_SnapToGrid(location::geometry, %s) AS cell, COUNT(*) AS n
+                FROM reports_report
+                WHERE {where} AND id <= %s
+                GROUP BY 1
+            ) AS cells
+            """,
+            [size, size, size, *params, watermark],
+        )
+        cells = {(ix, iy): n for ix, iy, n in cursor.fetchall()}
+    return {"watermark": watermark, "total": sum(cells.values()), "cells": cells}
+
+
+def _new_points(watermark, waste_type):
+    """(id, lon, lat) des signalements d'id > watermark ; None s'ils sont trop nombreux."""
+    where, params = _where(waste_type)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT id, ST_X(location::geometry), ST_Y(location::geometry)
+            FROM reports_report
+            WHERE id > %s AND {where}
+            ORDER BY id
+            LIMIT %s
+            """,
+            [watermark, *params, _INCREMENTAL_LIMIT + 1],
+        )
+        rows = cursor.fetchall()
+    return rows if len(rows) <= _INCREMENTAL_LIMIT else None
+
+
+def _fold(grid, zoom, rows):
+    """Ajoute les points à leur cellule (même arrondi que ST_SnapToGrid)."""
+    size = cell_size(zoom)
+    cells = dict(grid["cells"])
+    for _, lon, lat in rows:
+        key = (round(lon / size), round(lat / size))
+        cells[key] = cells.get(key, 0) + 1
+    return {
+        "watermark": max(grid["watermark"], rows[-1][0]),
+        "total": grid["total"] + len(rows),
+        "cells": cells,
+    }
+
+
+def get_grid(zoom, waste_type=None):
+    """
+    Grille à jour du zoom (borné à HEATMAP_MIN_ZOOM … HEATMAP_MAX_ZOOM),
+    et l'état du cache : "HIT", "REFRESH" (incrémental) ou "MISS".
+    """
+    zoom = clamp_zoom(zoom)
+    cache = caches[tilecache.CACHE_ALIAS]
+    key = tilecache.entry_key("heatmap", zoom, waste_type)
+    grid = cache.get(key)
+    state = "MISS"
+    if grid is not None:
+        rows = _new_points(grid["watermark"], waste_type)
+        if rows is not None:
+            candidate = _fold(grid, zoom, rows) if rows else grid
+            if candidate["total"] == _expected_total(waste_type):
+                state = "REFRESH" if rows else "HIT"
+                grid = candidate
+    if state == "MISS":
+        grid = compute_grid(zoom, waste_type)
+    if state != "HIT":
+        cache.set(key, grid)
+    return zoom, grid, state
+
+
+def grid_payload(zoom, grid):
+    """Corps JSON : cellules [lat, lon, nombre] (format Leaflet.heat)."""
+    size = cell_size(zoom)
+    cells = [
+        [round(iy * size, 6), round(ix * size, 6), n]
+        for (ix, iy), n in sorted(grid["cells"].items())
+    ]
+    return {
+        "zoom": zoom,
+        "cell_size": size,
+        "bbox": list(BEAUVAIS_BOUNDS),
+        "total": grid["total"],
+        "max": max((n for _, _, n in cells), default=0),
+        "cells": cells,
+    }
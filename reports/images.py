@@ -0,0 +1,235 @@
+"""
+Images dérivées des photos de signalement (miniatures et aperçus).
+
+Les photos de téléphone pèsent plusieurs Mo : les pages de liste et l'admin
+affichent à la place des versions réduites, stockées à côté de l'original
+dans MEDIA_ROOT :
+
+    reports/depot.jpg            ← original
+    reports/depot.thumb.webp     ← miniature (tableaux)
+    reports/depot.medium.webp    ← aperçu (fiche admin)
+
+Les dérivés sont générés après l'upload (signal), à la demande au premier
+affichage s'ils manquent, ou en masse par `python manage.py generate_thumbnails`.
+
+L'original lui-même est normalisé à l'upload (normalize_upload) : rotation
+EXIF appliquée, métadonnées EXIF supprimées, taille et poids plafonnés.
+
+Les vues asynchrones (async_views.py) confient ce travail au pool de
+threads borné pool() : la boucle d'événements n'attend jamais Pillow.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Variantes disponibles : nom → plus grand côté en pixels
+DERIVATIVES = {
+    "thumb": 160,  # miniature 60×60 affichée en 2x
+    "medium": 1024,  # aperçu plein écran dans l'admin
+}
+
+_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+# Vrai pendant l'enregistrement d'un signalement par une vue asynchrone :
+# les dérivés sont alors générés dans pool(), sans retarder la réponse
+derivatives_in_pool = ContextVar("derivatives_in_pool", default=False)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    """
+    Pool de threads du processus pour le travail Pillow des vues asynchrones
+    (REPORT_IMAGE_WORKERS threads). Des threads plutôt que des processus :
+    Pillow relâche le GIL pendant le décodage, la réduction et l'encodage,
+    et les fichiers uploadés n'ont pas à être copiés d'un processus à l'autre.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.REPORT_IMAGE_WORKERS,
+                thread_name_prefix="report-images",
+            )
+        return _pool
+
+
+def derivative_format():
+    """Format des dérivés (WEBP par défaut, JPEG si Pillow n'a pas libwebp)."""
+    fmt = settings.REPORT_IMAGE_DERIVATIVE_FORMAT.upper()
+    if fmt == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return fmt
+
+
+def derivative_name(name, kind, fmt=None):
+    """Nom de stockage du dérivé `kind` de l'image `name`."""
+    fmt = fmt or derivative_format()
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}.{kind}.{_EXTENSIONS[fmt]}"))
+
+
+def render_derivative(src_path, dst_path, max_side, fmt, quality):
+    """
+    Écrit une version réduite de `src_path` dans `dst_path` (chemins disque).
+
+    Sans dépendance à Django : appelable depuis un processus du pool de
+    `generate_thumbnails`. L'écriture passe par un fichier temporaire pour
+    qu'un lecteur ne voie jamais un dérivé à moitié écrit ; supprimé si
+    l'encodage échoue (disque plein, format non pris en charge…).
+    """
+    with Image.open(src_path) as img:
+        # JPEG : décodage directement à une résolution réduite (bien moins de RAM)
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        tmp_path = f"{dst_path}.tmp"
+        try:
+            img.save(tmp_path, format=fmt, quality=quality, optimize=True)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    os.replace(tmp_path, dst_path)
+
+
+def generate_derivatives(name, force=False):
+    """
+    Génère les dérivés manquants de l'image `name` (nom de stockage).
+    Retourne le nombre de fichiers écrits.
+    """
+    fmt = derivative_format()
+    quality = settings.REPORT_IMAGE_DERIVATIVE_QUALITY
+    src_path = default_storage.path(name)
+    written = 0
+    for kind, max_side in DERIVATIVES.items():
+        dst_path = default_storage.path(derivative_name(name, kind, fmt))
+        if force or not os.path.exists(dst_path):
+            render_derivative(src_path, dst_path, max_side, fmt, quality)
+            written += 1
+    return written
+
+
+def derivative_url(image, kind):
+    """
+    URL du dérivé `kind` d'un ImageField, généré à la volée s'il manque.
+    En cas d'échec (fichier absent, image illisible), retourne l'original.
+    """
+    if not image:
+        return ""
+    name = derivative_name(image.name, kind)
+    if not default_storage.exists(name):
+        try:
+            generate_derivatives(image.name)
+        except (OSError, ValueError):
+            logger.warning("Dérivé %s impossible pour %s", kind, image.name)
+            return image.url
+    return default_storage.url(name)
+
+
+# =============================================================================
+# NORMALISATION À L'UPLOAD
+# =============================================================================
+# Qualités JPEG essayées successivement pour tenir le budget en octets
+_QUALITY_STEPS = (0, 10, 20, 30)
+_MIN_QUALITY = 40
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+
+
+def normalize_upload(upload):
+    """
+    Réduit et ré-encode une photo uploadée avant son enregistrement.
+
+    - décodage JPEG directement à résolution réduite (draft) : l'image pleine
+      résolution n'est jamais chargée en mémoire ;
+    - plus grand côté ramené à REPORT_IMAGE_MAX_DIMENSION, puis rotation EXIF
+      appliquée sur l'image déjà réduite ;
+    - ré-encodage sans EXIF (GPS du téléphone, modèle…) : JPEG à
+      REPORT_IMAGE_QUALITY, PNG si l'image a de la transparence ;
+    - qualité abaissée par paliers si le fichier dépasse REPORT_IMAGE_MAX_BYTES.
+
+    Retourne un File prêt à être enregistré ; lève ValueError (message
+    lisible) si l'image est illisible ou ne tient pas dans le budget.
+    """
+    max_dimension = settings.REPORT_IMAGE_MAX_DIMENSION
+    max_bytes = settings.REPORT_IMAGE_MAX_BYTES
+    original_size = upload.size
+
+    # Les gros uploads sont déjà sur disque (TemporaryUploadedFile) : lecture directe
+    source = (
+        upload.temporary_file_path()
+        if hasattr(upload, "temporary_file_path")
+        else upload
+    )
+    try:
+        upload.seek(0)
+        with Image.open(source) as img:
+            img.draft("RGB", (max_dimension, max_dimension))
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            img = ImageOps.exif_transpose(img)
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Image illisible ou trop grande") from exc
+
+    stem = PurePosixPath(upload.name).stem
+    if _has_alpha(img):
+        fmt, name = "PNG", f"{stem}.png"
+        img = img.convert("RGBA")
+    else:
+        fmt, name = "JPEG", f"{stem}.jpg"
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+    icc_profile = img.info.get("icc_profile")
+    out = tempfile.SpooledTemporaryFile(max_size=max_bytes)
+    for step in _QUALITY_STEPS:
+        quality = max(settings.REPORT_IMAGE_QUALITY - step, _MIN_QUALITY)
+        out.seek(0)
+        out.truncate()
+        # Aucun paramètre exif= : les métadonnées EXIF ne sont pas recopiées
+        img.save(
+            out, format=fmt, quality=quality, optimize=True, icc_profile=icc_profile
+        )
+        if out.tell() <= max_bytes or fmt == "PNG":
+            break
+
+    new_size = out.tell()
+    if new_size > max_bytes:
+        out.close()
+        raise ValueError(
+            f"Photo trop lourde même après compression "
+            f"({new_size // 1024} Ko, maximum {max_bytes // 1024} Ko)"
+        )
+
+    logger.info(
+        "Photo normalisée %s : %s → %s octets (%s économisés), %s×%s",
+        upload.name,
+        original_size,
+        new_size,
+        original_size - new_size,
+        *img.size,
+    )
+    out.seek(0)
+    return File(out, name=name)
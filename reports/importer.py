@@ -0,0 +1,396 @@
+"""
+Import en masse de signalements historiques (fichiers des partenaires).
+
+Formats lus en flux, enregistrement par enregistrement : la mémoire reste
+constante quelle que soit la taille du fichier.
+- csv     : colonnes lat / lon (ou latitude / longitude), type, description,
+            date et statut facultatifs ; séparateur , ; ou tabulation détecté ;
+- geojson : FeatureCollection (lue entité par entité, sans charger tout le
+            document) ou GeoJSON délimité par lignes (une Feature par ligne,
+            séparateurs GeoJSONSeq acceptés) ;
+- gpkg    : GeoPackage lu par GDAL, reprojeté en WGS84 si besoin.
+
+Chaque enregistrement est validé comme un signalement du formulaire : même
+zone que views._parse_coords (geo.in_beauvais), catégorie ramenée à
+Report.WasteType (valeur, libellé ou alias). Une ligne invalide est rejetée
+avec son motif sans interrompre l'import.
+
+Insertion par bulk_create, sans signal : le clustering du lot est fait
+ensuite par l'appelant (assign_reports_to_clusters). Les fichiers des
+partenaires ne contiennent pas de photo : les signalements importés
+partagent l'image « photo non fournie » bulk.imported_image.
+"""
+
+import csv
+import json
+import unicodedata
+from collections import namedtuple
+from datetime import date, datetime
+from pathlib import Path
+
+from django.contrib.gis.gdal import (
+    CoordTransform,
+    DataSource,
+    GDALException,
+    SpatialReference,
+)
+from django.contrib.gis.geos import Point
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .bulk import backdate, imported_image
+from .geo import in_beauvais
+from .models import Report
+
+FORMATS = ("csv", "geojson", "gpkg")
+
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".txt": "csv",
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".geojsonl": "geojson",
+    ".geojsons": "geojson",
+    ".ndjson": "geojson",
+    ".jsonl": "geojson",
+    ".gpkg": "gpkg",
+}
+
+# Noms de colonnes / propriétés reconnus (comparés sans casse ni accents)
+_FIELDS = {
+    "lon": ("lon", "lng", "long", "longitude", "x"),
+    "lat": ("lat", "latitude", "y"),
+    "type": ("type", "categorie", "category", "waste_type", "type_dechet"),
+    "description": ("description", "commentaire", "comment", "observations"),
+    "date": ("created_at", "date", "date_signalement", "date_constat"),
+    "status": ("status", "statut"),
+}
+
+# Libellés courants des partenaires, en plus des valeurs et libellés de
+# Report.WasteType (complétés par --category-map)
+_CATEGORY_ALIASES = {
+    "vert": "green",
+    "verts": "green",
+    "vegetaux": "green",
+    "dechets vegetaux": "green",
+    "menager": "household",
+    "menagers": "household",
+    "ordures menageres": "household",
+    "om": "household",
+    "encombrant": "bulky",
+    "dechets encombrants": "bulky",
+    "gravats": "building",
+    "chantier": "building",
+    "btp": "building",
+    "dechets de chantier": "building",
+    "chimique": "chemical",
+    "chimiques": "chemical",
+    "dechets dangereux": "chemical",
+    "amiante": "asbestos",
+}
+
+_DEFAULT_DESCRIPTION = "Signalement importé"
+
+_DATE_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+
+ImportedReport = namedtuple(
+    "ImportedReport", "lon lat waste_type description created_at status"
+)
+
+
+def _normalize(text):
+    """Minuscules, sans accents ni espaces superflus."""
+    text = unicodedata.normalize("NFKD", str(text).strip().lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def detect_format(path):
+    """Format déduit de l'extension du fichier, ou None."""
+    return _EXTENSIONS.get(Path(path).suffix.lower())
+
+
+def parse_category_map(value):
+    """
+    "OM=household,DV=green" → {"om": "household", "dv": "green"}.
+    Lève ValueError si une catégorie cible est inconnue.
+    """
+    mapping = {}
+    for item in value.split(","):
+        source, _, target = item.partition("=")
+        target = target.strip()
+        if target not in Report.WasteType.values:
+            raise ValueError(f"Catégorie inconnue : {target}")
+        mapping[_normalize(source)] = target
+    return mapping
+
+
+# =============================================================================
+# LECTURE EN FLUX
+# =============================================================================
+class _JsonStream:
+    """Valeurs JSON lues une à une dans un fichier texte, par blocs."""
+
+    _BLANKS = " \t\r\n\x1e"  # \x1e : séparateur d'enregistrements GeoJSONSeq
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f, self.chunk_size = f, chunk_size
+        self.buf, self.pos = "", 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self):
+        """Prochain caractère significatif (non consommé), "" en fin de fichier."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self._BLANKS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON invalide : « {char} » attendu")
+        self.pos += 1
+
+    def skip(self, char):
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise ValueError(f"JSON invalide : {e.msg}")
+            # Un nombre peut être coupé par la fin du bloc : relire avec la suite
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_geojson(f):
+    """
+    Features d'une FeatureCollection ou d'un flux de Features. Les objets de
+    premier niveau sont lus clé par clé : seul le tableau "features" est
+    parcouru élément par élément, jamais chargé en entier.
+    """
+    stream = _JsonStream(f)
+    while stream.peek():
+        stream.expect("{")
+        obj = {}
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key == "features" and stream.peek() == "[":
+                stream.expect("[")
+                while stream.peek() != "]":
+                    yield stream.value()
+                    stream.skip(",")
+                stream.expect("]")
+            else:
+                obj[key] = stream.value()
+            stream.skip(",")
+        stream.expect("}")
+        if obj.get("type") == "Feature":
+            yield obj
+
+
+def _feature_fields(feature):
+    fields = dict(feature.get("properties") or {})
+    geometry = feature.get("geometry") or {}
+    coordinates = geometry.get("coordinates") or ()
+    if geometry.get("type") == "Point" and len(coordinates) >= 2:
+        fields["lon"], fields["lat"] = coordinates[0], coordinates[1]
+    return fields
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(8192), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        reader = csv.DictReader(f, dialect=dialect)
+        for fields in reader:
+            yield f"ligne {reader.line_num}", fields
+
+
+def _read_geojson(path):
+    with open(path, encoding="utf-8") as f:
+        for n, feature in enumerate(_iter_geojson(f), 1):
+            if not isinstance(feature, dict):
+                yield f"entité {n}", {}
+            else:
+                yield f"entité {n}", _feature_fields(feature)
+
+
+def _read_geopackage(path, layer=None):
+    source = DataSource(str(path))
+    layer = source[layer if layer is not None else 0]
+    transform = None
+    if layer.srs is not None and layer.srs.srid != 4326:
+        transform = CoordTransform(layer.srs, SpatialReference(4326))
+    for n, feature in enumerate(layer, 1):
+        fields = {name: feature.get(name) for name in feature.fields}
+        try:
+            geom = feature.geom
+        except GDALException:  # entité sans géométrie
+            geom = None
+        if geom is not None and geom.geom_type.name == "Point":
+            if transform is not None:
+                geom.transform(transform)
+            fields["lon"], fields["lat"] = geom.x, geom.y
+        yield f"entité {n}", fields
+
+
+def read_rows(path, fmt, layer=None):
+    """
+    Enregistrements bruts du fichier, en flux : tuples (référence, champs)
+    où la référence situe l'enregistrement ("ligne 12", "entité 3").
+    """
+    if fmt == "csv":
+        return _read_csv(path)
+    if fmt == "geojson":
+        return _read_geojson(path)
+    if fmt == "gpkg":
+        return _read_geopackage(path, layer)
+    raise ValueError(f"Format inconnu : {fmt}")
+
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+def _field(fields, name):
+    for key in _FIELDS[name]:
+        value = fields.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_french_date(value):
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def _parse_created_at(value):
+    if value is None:
+        return timezone.now()
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime.combine(value, datetime.min.time())
+    else:
+        value = str(value).strip()
+        parsed = parse_datetime(value) or _parse_french_date(value)
+        if parsed is None and (day := parse_date(value)) is not None:
+            parsed = datetime.combine(day, datetime.min.time())
+        if parsed is None:
+            raise ValueError(f"Date invalide : {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    if parsed > timezone.now():
+        raise ValueError(f"Date dans le futur : {value}")
+    return parsed
+
+
+def _parse_waste_type(value, category_map):
+    if value is None:
+        raise ValueError("Catégorie manquante")
+    key = _normalize(value)
+    if key in category_map:
+        return category_map[key]
+    for waste_type, label in Report.WasteType.choices:
+        if key in (waste_type, _normalize(label)):
+            return waste_type
+    if key in _CATEGORY_ALIASES:
+        return _CATEGORY_ALIASES[key]
+    raise ValueError(f"Catégorie inconnue : {value}")
+
+
+def clean_row(fields, category_map=None):
+    """
+    Champs bruts → ImportedReport, avec les règles du formulaire.
+    Lève ValueError avec un motif lisible si l'enregistrement est invalide.
+    """
+    fields = {_normalize(key): value for key, value in fields.items()}
+    lon, lat = _field(fields, "lon"), _field(fields, "lat")
+    if lon is None or lat is None:
+        raise ValueError("Coordonnées manquantes")
+    try:
+        # Virgule décimale des tableurs français
+        lon = float(str(lon).replace(",", "."))
+        lat = float(str(lat).replace(",", "."))
+    except ValueError:
+        raise ValueError(f"Coordonnées invalides : {lat}, {lon}")
+    if not in_beauvais(lon, lat):
+        raise ValueError(f"Position hors zone de Beauvais : {lat}, {lon}")
+
+    status = _field(fields, "status")
+    if status is not None and _normalize(status) not in Report.Status.values:
+        raise ValueError(f"Statut inconnu : {status}")
+
+    return ImportedReport(
+        lon=lon,
+        lat=lat,
+        waste_type=_parse_waste_type(_field(fields, "type"), category_map or {}),
+        description=str(_field(fields, "description") or _DEFAULT_DESCRIPTION),
+        created_at=_parse_created_at(_field(fields, "date")),
+        status=_normalize(status) if status is not None else Report.Status.PENDING,
+    )
+
+
+def clean_rows(rows, category_map=None, on_reject=None):
+    """
+    Enregistrements valides (ImportedReport), en flux. Les rejets sont
+    signalés à on_reject(référence, motif).
+    """
+    for ref, fields in rows:
+        try:
+            yield clean_row(fields, category_map)
+        except ValueError as e:
+            if on_reject is not None:
+                on_reject(ref, str(e))
+
+
+# =============================================================================
+# INSERTION
+# =============================================================================
+def insert_records(records):
+    """
+    Insère un lot d'ImportedReport (bulk_create, sans signal : pas de
+    clustering) et retourne les signalements créés, dates à jour.
+    """
+    image = imported_image()
+    created = Report.objects.bulk_create(
+        [
+            Report(
+                description=record.description,
+                type=record.waste_type,
+                location=Point(record.lon, record.lat, srid=4326),
+                status=record.status,
+                image=image,
+            )
+            for record in records
+        ]
+    )
+    backdate(created, [record.created_at for record in records])
+    for report, record in zip(created, records):
+        report.created_at = report.updated_at = record.created_at
+    return created
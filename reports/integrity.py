@@ -0,0 +1,116 @@
+"""
+Contrôle d'intégrité des clusters, en requêtes ensemblistes.
+
+Anomalies recherchées :
+- signalements orphelins : cluster_id pointe vers un cluster inexistant
+  (restauration partielle, SQL manuel, contraintes désactivées…) ;
+- clusters aux agrégats périmés : report_count, sommes ou centroïde
+  différents d'un recalcul à partir des membres ;
+- clusters vides : plus aucun signalement rattaché.
+
+Réparation en masse : les orphelins sont détachés puis reclusterisés
+(assign_reports_to_clusters), les clusters périmés ou vides passent par
+recompute_clusters (vides supprimés). Les pages de l'admin n'écrivent
+jamais : elles signalent les orphelins, `sweep_integrity` les répare
+(à lancer périodiquement, cron ou --loop).
+"""
+
+import time
+
+from django.db import connection, transaction
+
+from .models import Report, ReportCluster
+from .services import (
+    assign_reports_to_clusters,
+    find_aggregate_drift,
+    recompute_clusters,
+)
+
+_ORPHAN_REPORTS_SQL = """
+    SELECT r.id
+    FROM reports_report AS r
+    WHERE r.cluster_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM reports_reportcluster AS c WHERE c.id = r.cluster_id
+      )
+    ORDER BY r.id
+"""
+
+# Revérifie l'absence du cluster : un orphelin ne peut pas être « réparé »
+# deux fois, ni un cluster recréé entre-temps être perdu
+_DETACH_ORPHANS_SQL = """
+    UPDATE reports_report AS r
+    SET cluster_id = NULL, updated_at = now()
+    WHERE r.id = ANY(%s)
+      AND NOT EXISTS (
+          SELECT 1 FROM reports_reportcluster AS c WHERE c.id = r.cluster_id
+      )
+"""
+
+
+def find_issues(tolerance=1e-9):
+    """
+    Anomalies actuelles, en deux requêtes : pk des signalements orphelins,
+    des clusters périmés (encore peuplés) et des clusters vides
+    (services.find_aggregate_drift).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_ORPHAN_REPORTS_SQL)
+        orphans = [row[0] for row in cursor.fetchall()]
+    drift = find_aggregate_drift(tolerance)
+    return {
+        "orphan_reports": orphans,
+        "stale_clusters": [c["pk"] for c in drift if c["expected_count"]],
+        "empty_clusters": [c["pk"] for c in drift if not c["expected_count"]],
+    }
+
+
+def sweep(fix=True, recluster=True, batch_size=5000, tolerance=1e-9):
+    """
+    Recherche les anomalies et, si `fix`, les répare par lots de
+    `batch_size` (une transaction par lot) :
+    1. orphelins détachés, puis reclusterisés si `recluster` ;
+    2. clusters périmés recalculés, clusters vides supprimés (liste
+       recherchée à nouveau après l'étape 1, qui a pu fusionner des clusters).
+
+    Retourne un dictionnaire de statistiques.
+    """
+    start = time.perf_counter()
+    issues = find_issues(tolerance)
+    stats = {
+        "orphan_reports": len(issues["orphan_reports"]),
+        "stale_clusters": len(issues["stale_clusters"]),
+        "empty_clusters": len(issues["empty_clusters"]),
+        "detached": 0,
+        "reclustered": 0,
+        "recomputed": 0,
+        "deleted": 0,
+    }
+    if not fix:
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    orphans = issues["orphan_reports"]
+    for i in range(0, len(orphans), batch_size):
+        batch = orphans[i : i + batch_size]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(_DETACH_ORPHANS_SQL, [batch])
+                stats["detached"] += cursor.rowcount
+            if recluster:
+                detached = Report.objects.filter(pk__in=batch, cluster__isnull=True)
+                stats["reclustered"] += assign_reports_to_clusters(detached)["reports"]
+
+    if orphans and recluster:
+        # Le reclustering a pu modifier des clusters : nouvelle recherche
+        issues = find_issues(tolerance)
+    clusters = issues["stale_clusters"] + issues["empty_clusters"]
+    for i in range(0, len(clusters), batch_size):
+        result = recompute_clusters(
+            ReportCluster.objects.filter(pk__in=clusters[i : i + batch_size])
+        )
+        stats["recomputed"] += result["updated"]
+        stats["deleted"] += result["deleted"]
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
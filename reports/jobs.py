@@ -0,0 +1,169 @@
+"""
+File d'attente de clustering différé, stockée en base (table ClusteringJob).
+
+En mode CLUSTERING_MODE = "deferred", le signal post_save ne fait plus que
+créer une tâche : la requête du citoyen ne prend aucun verrou sur les
+clusters. Un worker (`python manage.py process_clustering_jobs`) consomme
+ensuite la file par lots :
+
+1. Réservation : SELECT … FOR UPDATE SKIP LOCKED + bail (locked_until) :
+   deux workers ne réservent jamais la même tâche.
+2. Traitement : tout le lot en une transaction avec
+   services.assign_reports_to_clusters (une jointure spatiale, écritures en
+   masse), sur les signalements relus et verrouillés dans cette
+   transaction. Le lot prend le verrou exclusif de ses catégories
+   (services.lock_categories) : des workers parallèles dont les lots
+   partagent une catégorie se suivent pour cette étape, et ne créent donc
+   jamais deux clusters pour des signalements voisins. Si le lot échoue,
+   repli tâche par tâche, chacune dans sa propre transaction (verrous par
+   cellule de assign_report_to_cluster), pour isoler la tâche fautive.
+3. Échec : nouvelle tentative avec délai exponentiel, puis statut "failed".
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import ClusteringJob, Report
+from .services import assign_report_to_cluster, assign_reports_to_clusters
+
+logger = logging.getLogger(__name__)
+
+# Durée de réservation d'une tâche : au-delà, un worker planté est considéré mort
+LEASE = timedelta(minutes=5)
+
+
+def is_deferred():
+    """True si le clustering doit passer par la file d'attente."""
+    return settings.CLUSTERING_MODE == "deferred"
+
+
+def enqueue_clustering(report):
+    """Ajoute le signalement à la file (dans la transaction courante)."""
+    return ClusteringJob.objects.get_or_create(report=report)[0]
+
+
+def _retry_delay(attempts):
+    """Délai avant la tentative suivante : 30 s, 1 min, 2 min… plafonné à 1 h."""
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+def claim_jobs(batch_size):
+    """Réserve jusqu'à `batch_size` tâches exécutables (les plus anciennes)."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            ClusteringJob.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("report")
+            .filter(status=ClusteringJob.Status.PENDING, run_after__lte=now)
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by("report__created_at", "report_id")[:batch_size]
+        )
+        ClusteringJob.objects.filter(pk__in=[j.pk for j in jobs]).update(
+            locked_until=now + LEASE
+        )
+    return jobs
+
+
+def _pending_reports(report_ids):
+    """
+    Signalements des tâches relus et verrouillés dans la transaction de
+    traitement : ceux supprimés depuis la réservation (tâche supprimée en
+    cascade) ou déjà rattachés à un cluster par un autre chemin sont ignorés.
+    """
+    return list(
+        Report.objects.select_for_update().filter(
+            pk__in=report_ids, cluster__isnull=True
+        )
+    )
+
+
+def process_clustering_jobs(batch_size=100, max_attempts=None):
+    """
+    Traite un lot de tâches. Retourne {"done": n, "retried": n, "failed": n}.
+    """
+    if max_attempts is None:
+        max_attempts = settings.CLUSTERING_JOB_MAX_ATTEMPTS
+
+    stats = {"done": 0, "retried": 0, "failed": 0}
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return stats
+
+    # Cas nominal : tout le lot d'un coup
+    try:
+        with transaction.atomic():
+            assign_reports_to_clusters(
+                _pending_reports([job.report_id for job in jobs])
+            )
+            stats["done"] = ClusteringJob.objects.filter(
+                pk__in=[job.pk for job in jobs]
+            ).delete()[0]
+        return stats
+    except Exception:
+        logger.warning(
+            "Lot de %s tâche(s) en échec, traitement tâche par tâche",
+            len(jobs),
+            exc_info=True,
+        )
+
+    for job in jobs:
+        try:
+            with transaction.atomic():
+                for report in _pending_reports([job.report_id]):
+                    assign_report_to_cluster(report)
+                job.delete()
+            stats["done"] += 1
+        except Exception as exc:  # une tâche en échec ne doit pas bloquer le lot
+            job.attempts += 1
+            job.last_error = f"{type(exc).__name__}: {exc}"
+            job.locked_until = None
+            if job.attempts >= max_attempts:
+                job.status = ClusteringJob.Status.FAILED
+                stats["failed"] += 1
+                logger.error(
+                    "Clustering du signalement #%s abandonné après %s tentative(s)",
+                    job.report_id,
+                    job.attempts,
+                    exc_info=True,
+                )
+            else:
+                job.run_after = timezone.now() + _retry_delay(job.attempts)
+                stats["retried"] += 1
+                logger.warning(
+                    "Clustering du signalement #%s en échec (tentative %s) : %s",
+                    job.report_id,
+                    job.attempts,
+                    job.last_error,
+                )
+            job.save(
+                update_fields=[
+                    "attempts",
+                    "last_error",
+                    "locked_until",
+                    "status",
+                    "run_after",
+                ]
+            )
+    return stats
+
+
+def queue_depth():
+    """
+    Métriques de la file : tâches en attente, en échec définitif, et âge
+    (en secondes) de la plus ancienne tâche en attente.
+    """
+    totals = ClusteringJob.objects.aggregate(
+        pending=Count("pk", filter=Q(status=ClusteringJob.Status.PENDING)),
+        failed=Count("pk", filter=Q(status=ClusteringJob.Status.FAILED)),
+        oldest=Min("created_at", filter=Q(status=ClusteringJob.Status.PENDING)),
+    )
+    oldest = totals.pop("oldest")
+    totals["oldest_age_seconds"] = (
+        (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    )
+    return totals
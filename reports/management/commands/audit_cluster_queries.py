@@ -0,0 +1,151 @@
+"""
+Audit des plans d'exécution des requêtes de clustering.
+
+Lance EXPLAIN (ANALYZE, FORMAT JSON) sur les requêtes du chemin critique,
+avec les données actuelles, et échoue si l'une d'elles parcourt une table
+de l'application en Seq Scan (index manquant, ou requête qui ne peut plus
+l'utiliser).
+
+Usage :
+    python manage.py audit_cluster_queries
+    python manage.py audit_cluster_queries --lat 49.43 --lon 2.08 --waste-type green
+    python manage.py audit_cluster_queries --disable-seqscan   # petites bases (CI)
+
+Sur une base presque vide, PostgreSQL préfère légitimement un Seq Scan :
+--disable-seqscan (SET enable_seqscan = off) vérifie alors seulement que
+chaque requête PEUT être servie par un index.
+"""
+
+import json
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reports.api import cluster_state_sql
+from reports.models import Latitude, Longitude, Report, ReportCluster
+from reports.services import nearby_clusters
+
+# Demi-côté (en degrés) de l'emprise auditée pour l'API, ~500 m
+_BBOX_HALF_SIDE = 0.005
+
+_APP_TABLES = {ReportCluster._meta.db_table, Report._meta.db_table}
+
+
+def _queryset_sql(queryset):
+    return queryset.query.get_compiler(using=queryset.db).as_sql()
+
+
+def seq_scans(plan):
+    """Nœuds Seq Scan du plan (récursif) portant sur une table de l'application."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in _APP_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+def indexes_used(plan):
+    """Noms des index parcourus par le plan (récursif)."""
+    found = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", ()):
+        found.extend(indexes_used(child))
+    return found
+
+
+def explain(sql, params):
+    """Plan JSON (dict) de la requête, exécutée réellement (ANALYZE)."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+class Command(BaseCommand):
+    help = "Vérifie que les requêtes de clustering utilisent leurs index (EXPLAIN ANALYZE)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lat", type=float, help="Latitude du point testé")
+        parser.add_argument("--lon", type=float, help="Longitude du point testé")
+        parser.add_argument(
+            "--waste-type",
+            help="Catégorie testée (défaut: celle du dernier signalement)",
+        )
+        parser.add_argument(
+            "--disable-seqscan",
+            action="store_true",
+            help="SET enable_seqscan = off : vérifie qu'un index est utilisable",
+        )
+
+    def _sample(self, options):
+        """Point, catégorie et cluster de référence (dernier signalement par défaut)."""
+        latest = (
+            Report.objects.annotate(lon=Longitude("location"), lat=Latitude("location"))
+            .order_by("-created_at", "-pk")
+            .values("lon", "lat", "type", "cluster_id")
+            .first()
+        )
+        default_lat, default_lon = settings.LEAFLET_CONFIG["DEFAULT_CENTER"]
+        lon, lat = options["lon"], options["lat"]  # 0.0 est une valeur valide
+        if lon is None:
+            lon = latest["lon"] if latest else default_lon
+        if lat is None:
+            lat = latest["lat"] if latest else default_lat
+        waste_type = options["waste_type"] or (
+            latest["type"] if latest else "household"
+        )
+        cluster_id = latest["cluster_id"] if latest else None
+        return Point(lon, lat, srid=4326), waste_type, cluster_id or 0
+
+    def handle(self, *args, **options):
+        location, waste_type, cluster_id = self._sample(options)
+        bbox = (
+            location.x - _BBOX_HALF_SIDE,
+            location.y - _BBOX_HALF_SIDE,
+            location.x + _BBOX_HALF_SIDE,
+            location.y + _BBOX_HALF_SIDE,
+        )
+        queries = [
+            (
+                "clusters proches (assign_report_to_cluster)",
+                _queryset_sql(nearby_clusters(location, waste_type)),
+            ),
+            (
+                "signalements d'un cluster (fusion)",
+                _queryset_sql(Report.objects.filter(cluster_id=cluster_id).only("pk")),
+            ),
+            ("état d'une emprise (API)", cluster_state_sql(bbox, None)),
+            ("état d'une emprise filtrée (API)", cluster_state_sql(bbox, waste_type)),
+        ]
+
+        self.stdout.write(
+            f"Point testé : {location.y:.6f}, {location.x:.6f} ({waste_type})"
+        )
+        failures = []
+        with transaction.atomic():
+            if options["disable_seqscan"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, (sql, params) in queries:
+                result = explain(sql, params)
+                plan = result["Plan"]
+                scans = seq_scans(plan)
+                used = ", ".join(indexes_used(plan)) or "aucun index"
+                line = f"  {name} : {result['Execution Time']:.2f} ms — {used}"
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(
+                        self.style.ERROR(f"{line} — Seq Scan sur {', '.join(scans)}")
+                    )
+                else:
+                    self.stdout.write(line)
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} requête(s) en Seq Scan : {', '.join(failures)}"
+            )
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes utilisent un index."))
@@ -0,0 +1,310 @@
+"""
+Benchmarks du chemin critique du clustering.
+
+Pour chaque distribution synthétique (uniform, hotspot, chain) et chaque
+volume (1k, 10k, 100k par défaut), mesure :
+- le débit de la reconstruction en masse (rebuild_clusters) ;
+- la latence de assign_report_to_cluster (p50 / p90 / p99) sur des
+  signalements ajoutés au jeu existant ;
+- la latence de la seule recherche des clusters proches (nearby_clusters) ;
+- le temps de rendu de la liste staff (report_list), à froid puis à chaud.
+
+Avec --geometries geography,l93, chaque jeu est mesuré avec les deux
+valeurs de CLUSTERING_GEOMETRY (sphéroïde ou Lambert-93).
+
+Tout s'exécute dans une transaction annulée à la fin : la base n'est pas
+modifiée. Les verrous consultatifs du clustering (CLUSTER_CELL_LOCKS) sont
+désactivés pendant la mesure : pris par chaque appel et gardés jusqu'à
+l'annulation, ils dépasseraient max_locks_per_transaction avec un grand
+--samples. Une seule connexion écrit, ils ne servent à rien ici ; leur
+coût et leur effet se mesurent avec stress_clustering. Les résultats sont écrits en JSON pour être comparés d'un commit
+à l'autre.
+
+Usage :
+    python manage.py benchmark_clustering --output bench.json
+    python manage.py benchmark_clustering --sizes 1000,10000 --distributions chain
+    python manage.py benchmark_clustering --output new.json --compare bench.json
+    python manage.py benchmark_clustering --sizes 100000 --geometries geography,l93
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import reverse
+
+from reports.models import Report, ReportCluster
+from reports.services import (
+    assign_report_to_cluster,
+    nearby_clusters,
+    rebuild_clusters,
+)
+from reports.synthetic import DISTRIBUTIONS, generate_points, insert_reports
+from reports.views import report_list
+
+GEOMETRIES = ("geography", "l93")
+
+# Métriques comparées par --compare : (section, clé, plus grand = mieux)
+_COMPARED = [
+    ("recluster", "reports_per_second", True),
+    ("assign_ms", "p50", False),
+    ("assign_ms", "p99", False),
+    ("nearby_ms", "p50", False),
+    ("report_list_ms", "p50", False),
+]
+
+
+def summarize(samples_ms):
+    """Percentiles (en ms) d'une série de mesures."""
+    ordered = sorted(samples_ms)
+    if len(ordered) < 2:
+        value = ordered[0] if ordered else 0.0
+        return {
+            "count": len(ordered),
+            "mean": value,
+            "p50": value,
+            "p90": value,
+            "p99": value,
+            "max": value,
+        }
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": cuts[49],
+        "p90": cuts[89],
+        "p99": cuts[98],
+        "max": ordered[-1],
+    }
+
+
+@contextmanager
+def settings_override(**values):
+    """
+    Réglages remplacés le temps d'une mesure, puis restaurés. Pour les
+    commandes : override_settings est un outil de test (django.test) ; les
+    réglages modifiés ici sont relus à chaque appel, sans signal à émettre.
+    """
+    previous = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def _csv(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Mesure les performances du clustering sur des jeux synthétiques (JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,100000",
+            help="Volumes de signalements, séparés par des virgules",
+        )
+        parser.add_argument(
+            "--distributions",
+            default=",".join(DISTRIBUTIONS),
+            help=f"Distributions parmi {', '.join(DISTRIBUTIONS)}",
+        )
+        parser.add_argument(
+            "--samples",
+            type=int,
+            default=200,
+            help="Appels à assign_report_to_cluster mesurés par jeu (défaut: 200)",
+        )
+        parser.add_argument(
+            "--list-runs",
+            type=int,
+            default=20,
+            help="Rendus de report_list mesurés par jeu (défaut: 20)",
+        )
+        parser.add_argument(
+            "--geometries",
+            default="geography",
+            help=f"Valeurs de CLUSTERING_GEOMETRY parmi {', '.join(GEOMETRIES)}",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire")
+        parser.add_argument(
+            "--output", help="Fichier JSON de résultats (défaut: stdout)"
+        )
+        parser.add_argument("--compare", help="Résultats JSON précédents à comparer")
+
+    def handle(self, *args, **options):
+        distributions = _csv(options["distributions"])
+        unknown = set(distributions) - set(DISTRIBUTIONS)
+        if unknown:
+            raise CommandError(f"Distribution(s) inconnue(s) : {', '.join(unknown)}")
+        geometries = _csv(options["geometries"])
+        unknown = set(geometries) - set(GEOMETRIES)
+        if unknown:
+            raise CommandError(f"Géométrie(s) inconnue(s) : {', '.join(unknown)}")
+
+        results = []
+        for distribution in distributions:
+            for size in _csv(options["sizes"], int):
+                for geometry in geometries:
+                    self.stderr.write(f"→ {distribution} × {size} [{geometry}]…")
+                    with settings_override(
+                        CLUSTERING_GEOMETRY=geometry, CLUSTER_CELL_LOCKS=False
+                    ):
+                        result = self._run(distribution, size, options)
+                    results.append({"geometry": geometry, **result})
+
+        report = {
+            "meta": {
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "seed": options["seed"],
+                "samples": options["samples"],
+                "list_runs": options["list_runs"],
+                "cell_locks": False,
+            },
+            "results": results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(payload + "\n")
+            self.stderr.write(f"Résultats écrits dans {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if options["compare"]:
+            self._compare(options["compare"], results)
+
+    # -------------------------------------------------------------------------
+    # Un jeu de données
+    # -------------------------------------------------------------------------
+    def _run(self, distribution, size, options):
+        samples = options["samples"]
+        points = generate_points(size + samples, distribution, seed=options["seed"])
+        result = {"distribution": distribution, "size": size}
+
+        with transaction.atomic():
+            # 1. Insertion en masse (sans clustering)
+            start = time.perf_counter()
+            insert_reports(points[:size])
+            result["insert_seconds"] = time.perf_counter() - start
+
+            # 2. Reconstruction en masse
+            stats = rebuild_clusters()
+            result["recluster"] = {
+                "seconds": stats["total_seconds"],
+                "reports_per_second": stats["reports_per_second"],
+                "clusters": stats["clusters"],
+            }
+
+            # 3. Chemin incrémental, sur le jeu déjà clusterisé
+            insert_reports(points[size:])
+            latencies = []
+            added = Report.objects.filter(cluster__isnull=True).order_by(
+                "created_at", "pk"
+            )
+            for report in added:
+                start = time.perf_counter()
+                assign_report_to_cluster(report)
+                latencies.append((time.perf_counter() - start) * 1000)
+            result["assign_ms"] = summarize(latencies)
+            result["nearby_ms"] = self._time_nearby(added)
+            result["clusters_after"] = ReportCluster.objects.count()
+
+            # 4. Rendu de la liste staff (première page)
+            result.update(self._time_report_list(options["list_runs"]))
+
+            # Base inchangée : tout le jeu de données est annulé
+            transaction.set_rollback(True)
+        return result
+
+    def _time_nearby(self, reports):
+        """Recherche des clusters proches seule (requête DWithin)."""
+        timings = []
+        for report in reports:
+            start = time.perf_counter()
+            list(nearby_clusters(report.location, report.type))
+            timings.append((time.perf_counter() - start) * 1000)
+        return summarize(timings)
+
+    def _time_report_list(self, runs):
+        """Vue + rendu du gabarit, sans middleware (RequestFactory)."""
+        user = User.objects.create_user("benchmark-staff", is_staff=True)
+        factory = RequestFactory()
+
+        def render():
+            request = factory.get(reverse("reports:list"))
+            request.user = user
+            start = time.perf_counter()
+            response = report_list(request)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"report_list a répondu {response.status_code}")
+            return elapsed
+
+        cold = render()  # premier rendu : gabarit pas encore chargé
+        timings = [render() for _ in range(runs)]
+        return {"report_list_cold_ms": cold, "report_list_ms": summarize(timings)}
+
+    # -------------------------------------------------------------------------
+    # Comparaison avec un fichier précédent
+    # -------------------------------------------------------------------------
+    def _compare(self, path, results):
+        with open(path, encoding="utf-8") as f:
+            previous = {
+                (r["distribution"], r["size"], r.get("geometry", "geography")): r
+                for r in json.load(f)["results"]
+            }
+
+        self.stderr.write(f"\nComparaison avec {path} :")
+        for result in results:
+            before = previous.get(
+                (result["distribution"], result["size"], result["geometry"])
+            )
+            if before is None:
+                continue
+            for section, key, higher_is_better in _COMPARED:
+                if section not in before:
+                    continue
+                old, new = before[section][key], result[section][key]
+                if not old:
+                    continue
+                change = (new - old) / old * 100
+                better = change > 0 if higher_is_better else change < 0
+                style = self.style.SUCCESS if better else self.style.WARNING
+                self.stderr.write(
+                    style(
+                        f"  {result['distribution']:>8} {result['size']:>7} "
+                        f"{result['geometry']:>9} "
+                        f"{section}.{key} : {old:.2f} → {new:.2f} ({change:+.1f} %)"
+                    )
+                )
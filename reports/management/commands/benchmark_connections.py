@@ -0,0 +1,177 @@
+"""
+Latence par requête selon la gestion des connexions PostgreSQL.
+
+`--threads` threads (workers) enchaînent chacun `--requests` requêtes
+simulées, comme le gestionnaire de requêtes de Django :
+close_old_connections() (request_started), lecture d'une page de la liste
+des signalements, close_old_connections() (request_finished).
+
+Modes comparés (voir reports/dbpool.py) :
+- none : CONN_MAX_AGE=0, une connexion ouverte puis fermée par requête ;
+- persistent : CONN_MAX_AGE=60 et CONN_HEALTH_CHECKS, une connexion par thread ;
+- pool : pool psycopg 3 de `--pool-size` connexions (psycopg_pool requis).
+
+Chaque mode passe par un alias de connexion temporaire, copié de "default" :
+les réglages de l'application ne changent pas. Lecture seule.
+
+Usage :
+    python manage.py benchmark_connections
+    python manage.py benchmark_connections --threads 16 --pool-size 4
+    python manage.py benchmark_connections --modes none,pool --output conn.json
+"""
+
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from reports import dbpool
+from reports.management.commands.benchmark_clustering import summarize
+from reports.models import Report
+
+MODES = ("none", "persistent", "pool")
+
+_ALIAS = "benchmark_connections"
+_PAGE_SIZE = 50
+
+
+def _mode_settings(mode, options):
+    """Réglages de l'alias temporaire pour un mode, à partir de "default"."""
+    settings_dict = dict(connections.settings["default"])
+    settings_dict["OPTIONS"] = {
+        key: value for key, value in settings_dict["OPTIONS"].items() if key != "pool"
+    }
+    settings_dict["CONN_HEALTH_CHECKS"] = True
+    settings_dict["CONN_MAX_AGE"] = 60 if mode == "persistent" else 0
+    if mode == "pool":
+        settings_dict["OPTIONS"]["pool"] = {
+            "min_size": options["pool_size"],
+            "max_size": options["pool_size"],
+            "timeout": 30,
+        }
+    return settings_dict
+
+
+def _request():
+    """Une requête simulée : ouverture/recyclage, lecture, fin de requête."""
+    close_old_connections()
+    list(
+        Report.objects.using(_ALIAS)
+        .order_by("-created_at", "-pk")
+        .values_list("pk", flat=True)[:_PAGE_SIZE]
+    )
+    close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Compare la latence par requête sans pool, connexions persistantes, pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modes",
+            default=",".join(MODES),
+            help=f"Modes parmi {', '.join(MODES)} (défaut: tous)",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=8,
+            help="Threads simulant les workers (défaut: 8)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requêtes par thread (défaut: 200)",
+        )
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=4,
+            help="Connexions du pool, mode pool (défaut: 4)",
+        )
+        parser.add_argument(
+            "--output", help="Fichier JSON de résultats (défaut: stdout)"
+        )
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options["modes"].split(",") if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Mode(s) inconnu(s) : {', '.join(unknown)}")
+        if min(options["threads"], options["requests"], options["pool_size"]) < 1:
+            raise CommandError("--threads, --requests et --pool-size doivent être ≥ 1")
+        if "pool" in modes and not is_psycopg3:
+            raise CommandError(
+                'Le mode pool nécessite psycopg 3 : pip install "psycopg[binary,pool]"'
+            )
+
+        results = []
+        for mode in modes:
+            self.stderr.write(f"→ {mode}…")
+            connections.settings[_ALIAS] = _mode_settings(mode, options)
+            try:
+                results.append(self._run(mode, options))
+            finally:
+                connections[_ALIAS].close()
+                connections[_ALIAS].close_pool()
+                del connections[_ALIAS]
+                del connections.settings[_ALIAS]
+
+        payload = json.dumps(
+            {
+                "threads": options["threads"],
+                "requests_per_thread": options["requests"],
+                "results": results,
+            },
+            indent=2,
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(payload + "\n")
+            self.stderr.write(f"Résultats écrits dans {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+    def _run(self, mode, options):
+        threads, per_thread = options["threads"], options["requests"]
+        latencies, errors = [], []
+        barrier = threading.Barrier(threads + 1)
+        connects_before = dbpool.connects(_ALIAS)
+
+        def work():
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    start = time.perf_counter()
+                    _request()
+                    latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:  # compté et affiché à la fin
+                errors.append(repr(e))
+            finally:
+                connections[_ALIAS].close()
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        for error in errors[:5]:
+            self.stderr.write(error)
+        if errors:
+            raise CommandError(f"{len(errors)} erreur(s) en mode {mode}")
+        return {
+            "mode": mode,
+            "seconds": elapsed,
+            "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": summarize(latencies),
+            "connects": dbpool.connects(_ALIAS) - connects_before,
+            "pool": dbpool.pool_stats(_ALIAS),
+        }
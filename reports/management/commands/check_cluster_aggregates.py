@@ -0,0 +1,56 @@
+"""
+Commande de vérification des agrégats des clusters.
+
+Compare les valeurs stockées (report_count, sommes des coordonnées, centroïde)
+à un recalcul complet à partir des signalements, et les répare si demandé.
+
+Usage :
+    python manage.py check_cluster_aggregates
+    python manage.py check_cluster_aggregates --fix
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.models import ReportCluster
+from reports.services import find_aggregate_drift, recompute_clusters
+
+
+class Command(BaseCommand):
+    help = "Vérifie (et répare avec --fix) les agrégats stockés des clusters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recalcule les clusters incohérents (supprime les clusters vides)",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=1e-9,
+            help="Écart toléré en degrés, par signalement (défaut: 1e-9)",
+        )
+
+    def handle(self, *args, **options):
+        drifted = find_aggregate_drift(tolerance=options["tolerance"])
+
+        for cluster in drifted:
+            self.stdout.write(
+                f"  Cluster #{cluster['pk']} : {cluster['report_count']} stocké(s), "
+                f"{cluster['expected_count']} réel(s)"
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Tous les agrégats sont cohérents."))
+            return
+
+        if not options["fix"]:
+            raise CommandError(
+                f"{len(drifted)} cluster(s) incohérent(s). Relancer avec --fix."
+            )
+
+        recompute_clusters(
+            ReportCluster.objects.filter(pk__in=[cluster["pk"] for cluster in drifted])
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"{len(drifted)} cluster(s) réparé(s)."))
@@ -0,0 +1,112 @@
+"""
+Export en flux des signalements ou des clusters (QGIS, open data).
+
+Évite de brancher QGIS sur la base de production : le fichier est écrit au
+fil d'un curseur côté serveur, en mémoire constante.
+
+Usage :
+    python manage.py export_reports clusters.fgb --layer clusters
+    python manage.py export_reports signalements.csv --status validated \\
+        --since 2024-01-01 --until 2024-12-31
+    python manage.py export_reports - --format geojsonseq > reports.geojsons
+    # Reprise d'un export interrompu (dernier id affiché + 1)
+    python manage.py export_reports signalements.csv --min-id 120001 --append
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.export import (
+    EXTENSIONS,
+    FORMATS,
+    LAYERS,
+    export_queryset,
+    parse_filters,
+    stream,
+)
+from reports.models import Report
+
+_FORMAT_BY_EXTENSION = {ext: fmt for fmt, ext in EXTENSIONS.items()}
+
+
+class Command(BaseCommand):
+    help = "Exporte signalements ou clusters en GeoJSON-seq, CSV ou FlatGeobuf."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier de sortie (- : sortie standard)")
+        parser.add_argument(
+            "--layer", choices=LAYERS, default="reports", help="Couche exportée"
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format (défaut: déduit de l'extension)",
+        )
+        parser.add_argument("--status", choices=Report.Status.values)
+        parser.add_argument("--type", choices=Report.WasteType.values)
+        parser.add_argument("--since", help="Créés à partir de (AAAA-MM-JJ)")
+        parser.add_argument("--until", help="Créés jusqu'au (AAAA-MM-JJ inclus)")
+        parser.add_argument("--min-id", type=int, help="Premier id exporté")
+        parser.add_argument("--max-id", type=int, help="Dernier id exporté")
+        parser.add_argument(
+            "--append",
+            action="store_true",
+            help="Ajoute au fichier existant, sans en-tête (reprise ; pas en fgb)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Lignes par aller-retour du curseur serveur (défaut: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or _FORMAT_BY_EXTENSION.get(path.rpartition(".")[2])
+        if fmt is None:
+            raise CommandError("Format inconnu : précisez --format")
+        if options["append"] and fmt == "fgb":
+            raise CommandError("--append n'est pas possible en FlatGeobuf")
+        try:
+            queryset = export_queryset(options["layer"], **parse_filters(options))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.count, self.last_id = 0, None
+        start = time.perf_counter()
+        out = (
+            sys.stdout.buffer
+            if path == "-"
+            else open(path, "ab" if options["append"] else "wb")
+        )
+        try:
+            for data in stream(
+                options["layer"],
+                fmt,
+                queryset,
+                chunk_size=options["chunk_size"],
+                header=not options["append"],
+                progress=self._progress,
+            ):
+                out.write(data)
+        except KeyboardInterrupt:
+            raise CommandError(f"Interrompu : reprendre avec --min-id {self._resume()}")
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        elapsed = time.perf_counter() - start
+
+        self.stderr.write(
+            f"{self.count} entité(s) exportée(s) en {elapsed:.1f} s "
+            f"({self.count / elapsed if elapsed else 0:.0f} lignes/s), "
+            f"dernier id : {self.last_id}"
+        )
+
+    def _progress(self, count, last_row):
+        self.count += count
+        self.last_id = last_row["id"]
+
+    def _resume(self):
+        return self.last_id + 1 if self.last_id is not None else 0
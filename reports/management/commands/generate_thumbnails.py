@@ -0,0 +1,103 @@
+"""
+Commande de rattrapage : génère les miniatures et aperçus de toutes les photos.
+
+Le travail (décodage + redimensionnement) est réparti sur un pool de
+processus ; chaque processus ne manipule que des chemins de fichiers.
+
+Usage :
+    python manage.py generate_thumbnails
+    python manage.py generate_thumbnails --workers 8 --force
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from reports.images import (
+    DERIVATIVES,
+    derivative_format,
+    derivative_name,
+    render_derivative,
+)
+from reports.models import Report
+
+
+def _render_all(task):
+    """Exécuté dans un processus du pool : retourne (écrits, erreur éventuelle)."""
+    src_path, targets, fmt, quality, force = task
+    written = 0
+    try:
+        for dst_path, max_side in targets:
+            if force or not os.path.exists(dst_path):
+                render_derivative(src_path, dst_path, max_side, fmt, quality)
+                written += 1
+    except (OSError, ValueError) as exc:
+        return written, f"{src_path} : {exc}"
+    return written, None
+
+
+class Command(BaseCommand):
+    help = "Génère les images dérivées (miniature, aperçu) des signalements existants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Nombre de processus (défaut: nombre de cœurs)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regénère aussi les dérivés déjà présents",
+        )
+
+    def handle(self, *args, **options):
+        fmt = derivative_format()
+        quality = settings.REPORT_IMAGE_DERIVATIVE_QUALITY
+        names = list(
+            Report.objects.exclude(image="")
+            .order_by("pk")
+            .values_list("image", flat=True)
+        )
+        tasks = (
+            (
+                default_storage.path(name),
+                [
+                    (default_storage.path(derivative_name(name, kind, fmt)), max_side)
+                    for kind, max_side in DERIVATIVES.items()
+                ],
+                fmt,
+                quality,
+                options["force"],
+            )
+            for name in names
+        )
+
+        # Les processus fils (fork) ne doivent pas hériter d'une connexion ouverte
+        connections.close_all()
+
+        start = time.perf_counter()
+        images = written = errors = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for count, error in pool.map(_render_all, tasks, chunksize=16):
+                images += 1
+                written += count
+                if error:
+                    errors += 1
+                    self.stderr.write(f"  {error}")
+                if images % 500 == 0:
+                    self.stdout.write(f"  {images} image(s) traitée(s)...")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Terminé : {images} image(s), {written} dérivé(s) écrit(s), "
+                f"{errors} erreur(s) en {elapsed:.1f} s"
+            )
+        )
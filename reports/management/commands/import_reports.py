@@ -0,0 +1,145 @@
+"""
+Import en masse de signalements historiques (CSV, GeoJSON, GeoPackage).
+
+Le fichier est lu en flux et inséré par lots bornés (--batch-size) : la
+mémoire reste constante, même pour plusieurs millions de lignes. Chaque lot
+est inséré et clusterisé (assign_reports_to_clusters) dans sa propre
+transaction : un import interrompu garde les lots déjà validés, relancer le
+même fichier les dupliquerait.
+
+Les lignes invalides (coordonnées hors zone, catégorie inconnue, date
+illisible…) sont rejetées et comptées ; --rejects les écrit dans un CSV
+(référence, motif) pour correction.
+
+Usage :
+    python manage.py import_reports depots.csv
+    python manage.py import_reports depots.geojson --batch-size 2000
+    python manage.py import_reports archives.gpkg --layer depots \\
+        --category-map "OM=household,DV=green"
+    python manage.py import_reports depots.csv --dry-run --rejects rejets.csv
+"""
+
+import csv
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reports.importer import (
+    FORMATS,
+    clean_rows,
+    detect_format,
+    insert_records,
+    parse_category_map,
+    read_rows,
+)
+from reports.services import assign_reports_to_clusters
+
+# Rejets affichés dans la sortie (tous sont comptés, et écrits avec --rejects)
+_SHOWN_REJECTS = 10
+
+
+class Command(BaseCommand):
+    help = "Importe des signalements depuis un fichier CSV, GeoJSON ou GeoPackage."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier à importer")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Format du fichier (défaut: déduit de l'extension)",
+        )
+        parser.add_argument("--layer", help="Couche GeoPackage (défaut: la première)")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Signalements par lot et par transaction (défaut: 5000)",
+        )
+        parser.add_argument(
+            "--category-map",
+            help="Catégories propres au fichier, ex. OM=household,DV=green",
+        )
+        parser.add_argument(
+            "--rejects", help="CSV des lignes rejetées (référence, motif)"
+        )
+        parser.add_argument(
+            "--no-cluster",
+            action="store_true",
+            help="Pas de clustering (à lancer ensuite : recluster_reports)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Valide le fichier sans rien insérer",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or detect_format(options["path"])
+        if fmt is None:
+            raise CommandError("Format inconnu : précisez --format")
+        try:
+            category_map = (
+                parse_category_map(options["category_map"])
+                if options["category_map"]
+                else None
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.rejected = 0
+        rejects_file = (
+            open(options["rejects"], "w", encoding="utf-8", newline="")
+            if options["rejects"]
+            else None
+        )
+        self.rejects_writer = csv.writer(rejects_file) if rejects_file else None
+        if self.rejects_writer:
+            self.rejects_writer.writerow(["reference", "motif"])
+
+        self.stdout.write(f"Import de {options['path']} [{fmt}]…")
+        start = time.perf_counter()
+        try:
+            records = clean_rows(
+                read_rows(options["path"], fmt, options["layer"]),
+                category_map,
+                on_reject=self._reject,
+            )
+            imported = self._import(records, options)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Lecture impossible : {e}")
+        finally:
+            if rejects_file:
+                rejects_file.close()
+        elapsed = time.perf_counter() - start
+
+        rows = imported + self.rejected
+        self.stdout.write(
+            f"  {rows} ligne(s) lue(s) en {elapsed:.1f} s "
+            f"({rows / elapsed if elapsed else 0:.0f} lignes/s) : "
+            f"{imported} {'valide(s)' if options['dry_run'] else 'importée(s)'}, "
+            f"{self.rejected} rejetée(s)"
+        )
+        if self.rejected and options["rejects"]:
+            self.stdout.write(f"  Rejets écrits dans {options['rejects']}")
+        self.stdout.write(self.style.SUCCESS("Terminé."))
+
+    def _import(self, records, options):
+        imported = 0
+        while batch := list(islice(records, options["batch_size"])):
+            if not options["dry_run"]:
+                with transaction.atomic():
+                    created = insert_records(batch)
+                    if not options["no_cluster"]:
+                        assign_reports_to_clusters(created)
+            imported += len(batch)
+            self.stdout.write(f"  {imported} signalement(s)…")
+        return imported
+
+    def _reject(self, ref, reason):
+        self.rejected += 1
+        if self.rejects_writer:
+            self.rejects_writer.writerow([ref, reason])
+        if self.rejected <= _SHOWN_REJECTS:
+            self.stderr.write(f"  Rejet ({ref}) : {reason}")
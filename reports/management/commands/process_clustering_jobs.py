@@ -0,0 +1,92 @@
+"""
+Worker de clustering différé (mode CLUSTERING_MODE = "deferred").
+
+Usage :
+    python manage.py process_clustering_jobs              # vide la file puis s'arrête
+    python manage.py process_clustering_jobs --loop       # tourne en continu
+    python manage.py process_clustering_jobs --stats      # affiche la profondeur de la file
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.jobs import process_clustering_jobs, queue_depth
+
+
+class Command(BaseCommand):
+    help = "Traite la file des tâches de clustering différé."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Nombre de tâches réservées par lot (défaut: 100)",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=None,
+            help="Tentatives avant échec définitif (défaut: CLUSTERING_JOB_MAX_ATTEMPTS)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Ne s'arrête pas quand la file est vide (mode démon)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Pause en secondes quand la file est vide, avec --loop (défaut: 1)",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Affiche les métriques de la file et s'arrête",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self._write_depth()
+            return
+
+        totals = {"done": 0, "retried": 0, "failed": 0}
+        start = time.perf_counter()
+        try:
+            while True:
+                stats = process_clustering_jobs(
+                    batch_size=options["batch_size"],
+                    max_attempts=options["max_attempts"],
+                )
+                for key, value in stats.items():
+                    totals[key] += value
+
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"  lot : {stats['done']} traitée(s), "
+                        f"{stats['retried']} à réessayer, {stats['failed']} en échec"
+                    )
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé.")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Terminé : {totals['done']} tâche(s) traitée(s) en {elapsed:.2f} s, "
+                f"{totals['retried']} à réessayer, {totals['failed']} en échec"
+            )
+        )
+        self._write_depth()
+
+    def _write_depth(self):
+        depth = queue_depth()
+        self.stdout.write(
+            f"File : {depth['pending']} en attente, {depth['failed']} en échec, "
+            f"plus ancienne : {depth['oldest_age_seconds']:.0f} s"
+        )
@@ -0,0 +1,27 @@
+"""
+Reconstruit la table des statistiques du tableau de bord (ReportStat) à
+partir de tous les signalements.
+
+Les triggers la tiennent à jour en continu ; la reconstruction sert après
+une restauration partielle, un TRUNCATE ou une désactivation des triggers.
+
+Usage :
+    python manage.py rebuild_report_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from reports.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques précalculées des signalements."
+
+    def handle(self, *args, **options):
+        result = rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result['rows']} ligne(s) de statistiques en "
+                f"{result['seconds']:.2f} s."
+            )
+        )
@@ -0,0 +1,65 @@
+"""
+Recalcul ensembliste des clusters (même traitement que l'action admin
+« Recalculer les clusters sélectionnés »).
+
+Contrairement à recluster_reports, l'appartenance des signalements n'est pas
+modifiée : seuls report_count, les sommes, le centroïde et waste_type sont
+recalculés à partir des membres, par lots de clusters (une transaction et
+quelques requêtes par lot). Les clusters sans membres sont supprimés.
+
+Usage :
+    python manage.py recompute_clusters                  # tous les clusters
+    python manage.py recompute_clusters --ids 12,15,42
+    python manage.py recompute_clusters --waste-type green --batch-size 20000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.models import Report, ReportCluster
+from reports.services import recompute_clusters
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats des clusters en requêtes ensemblistes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", help="pk des clusters, séparés par des virgules")
+        parser.add_argument("--waste-type", choices=Report.WasteType.values)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Clusters par transaction (défaut: 5000)",
+        )
+
+    def handle(self, *args, **options):
+        clusters = ReportCluster.objects.all()
+        if options["ids"]:
+            clusters = clusters.filter(
+                pk__in=[int(pk) for pk in options["ids"].split(",") if pk]
+            )
+        if options["waste_type"]:
+            clusters = clusters.filter(waste_type=options["waste_type"])
+        pks = list(clusters.order_by("pk").values_list("pk", flat=True))
+
+        start = time.perf_counter()
+        updated = deleted = 0
+        size = options["batch_size"]
+        for i in range(0, len(pks), size):
+            stats = recompute_clusters(
+                ReportCluster.objects.filter(pk__in=pks[i : i + size])
+            )
+            updated += stats["updated"]
+            deleted += stats["deleted"]
+            self.stdout.write(
+                f"  {min(i + size, len(pks))}/{len(pks)} cluster(s) "
+                f"({stats['seconds']:.2f} s)"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated} cluster(s) recalculé(s), {deleted} vide(s) supprimé(s) "
+                f"en {time.perf_counter() - start:.1f} s."
+            )
+        )
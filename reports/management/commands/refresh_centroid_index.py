@@ -0,0 +1,68 @@
+"""
+Écrit l'instantané des centroïdes de clusters (CENTROID_INDEX_PATH), lu par
+les workers pour présélectionner les clusters proches d'un signalement.
+
+Un instantané plus ancien que CENTROID_INDEX_MAX_AGE n'est plus utilisé :
+lancer la commande en continu sur chaque machine qui sert l'application.
+
+Usage :
+    python manage.py refresh_centroid_index                  # une fois
+    python manage.py refresh_centroid_index --loop           # toutes les 30 s
+    python manage.py refresh_centroid_index --loop --interval 10
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.centroid_index import build
+from reports.services import CLUSTER_DISTANCE_M
+
+
+class Command(BaseCommand):
+    help = "Écrit l'instantané des centroïdes de clusters (index en mémoire)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=None,
+            help="Fichier de l'instantané (défaut: CENTROID_INDEX_PATH)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Réécrit l'instantané en continu (mode démon)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Secondes entre deux instantanés, avec --loop (défaut: 30)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.CENTROID_INDEX_PATH
+        if not path:
+            raise CommandError("CENTROID_INDEX_PATH n'est pas défini (ou --path).")
+        if options["loop"] and options["interval"] >= settings.CENTROID_INDEX_MAX_AGE:
+            self.stderr.write(
+                self.style.WARNING(
+                    "--interval ≥ CENTROID_INDEX_MAX_AGE : l'instantané sera "
+                    "périmé entre deux écritures."
+                )
+            )
+
+        try:
+            while True:
+                result = build(CLUSTER_DISTANCE_M, path)
+                self.stdout.write(
+                    f"{result['clusters']} centroïde(s), {result['cells']} cellule(s), "
+                    f"génération {result['generation']}, {result['bytes']} octets "
+                    f"en {result['seconds']:.2f} s."
+                )
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé.")
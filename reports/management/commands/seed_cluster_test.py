@@ -16,6 +16,7 @@ from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 
 from reports.models import Report
+from reports.services import delete_reports
 
 
 # ── Image PNG 1×1 pixel rouge (valide, ~70 octets) ─────────────────────────
@@ -84,9 +85,9 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         if options["delete"]:
-            deleted, _ = Report.objects.filter(
-                description__startswith="[TEST-CLUSTER]"
-            ).delete()
+            deleted = delete_reports(
+                Report.objects.filter(description__startswith="[TEST-CLUSTER]")
+            )["deleted"]
             self.stdout.write(
                 self.style.WARNING(f"{deleted} signalement(s) de test supprimé(s).")
             )
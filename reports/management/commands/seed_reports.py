@@ -0,0 +1,184 @@
+"""
+Générateur de données à grande échelle (planification de capacité).
+
+Insère jusqu'à plusieurs millions de signalements synthétiques, sans un
+fichier image par ligne (image partagée) et sans signal par ligne :
+- --method copy  : COPY FROM STDIN (défaut, le plus rapide)
+- --method bulk  : bulk_create par lots
+
+Le clustering est ensuite :
+- --cluster batch       : nouveaux signalements seulement, par lots
+                          (assign_reports_to_clusters, défaut)
+- --cluster bulk        : reconstruction complète (rebuild_clusters)
+- --cluster incremental : assign_report_to_cluster signalement par signalement
+                          (reproduit le chemin de production, lent)
+- --cluster none        : laissé à plus tard (recluster_reports)
+
+Usage :
+    python manage.py seed_reports --count 1000000
+    python manage.py seed_reports --count 50000 --distribution hotspot \\
+        --waste-mix household=5,green=3,bulky=2 --days 730
+    python manage.py seed_reports --count 10000 --cluster incremental
+    python manage.py seed_reports --delete
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reports.models import Report
+from reports.services import (
+    assign_report_to_cluster,
+    assign_reports_to_clusters,
+    rebuild_clusters,
+)
+from reports.synthetic import (
+    DEFAULT_BOUNDS,
+    DISTRIBUTIONS,
+    SYNTHETIC_PREFIX,
+    copy_reports,
+    insert_reports,
+    iter_dates,
+    iter_points,
+    parse_waste_mix,
+)
+
+
+# Signalements par appel à assign_reports_to_clusters (une transaction chacun)
+_CLUSTER_BATCH = 20000
+
+
+class Command(BaseCommand):
+    help = "Insère en masse des signalements synthétiques (COPY ou bulk_create)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=10000, help="Nombre de signalements"
+        )
+        parser.add_argument(
+            "--distribution",
+            choices=DISTRIBUTIONS,
+            default="hotspot",
+            help="Répartition spatiale (défaut: hotspot)",
+        )
+        parser.add_argument(
+            "--waste-mix",
+            help="Poids par catégorie, ex. household=5,green=3 (défaut: équiprobables)",
+        )
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=365,
+            help="Dates de création réparties sur les N derniers jours (défaut: 365)",
+        )
+        parser.add_argument(
+            "--bounds",
+            default=",".join(str(v) for v in DEFAULT_BOUNDS),
+            help="Emprise lon_min,lat_min,lon_max,lat_max (défaut: Beauvais)",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Graine aléatoire")
+        parser.add_argument(
+            "--method",
+            choices=["copy", "bulk"],
+            default="copy",
+            help="Insertion par COPY (défaut) ou bulk_create",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50000,
+            help="Lignes par lot d'insertion (défaut: 50000)",
+        )
+        parser.add_argument(
+            "--cluster",
+            choices=["batch", "bulk", "incremental", "none"],
+            default="batch",
+            help="Clustering après insertion (défaut: batch)",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Supprime les signalements synthétiques puis reconstruit les clusters",
+        )
+
+    def handle(self, *args, **options):
+        if options["delete"]:
+            self._delete()
+            return
+
+        try:
+            bounds = tuple(float(v) for v in options["bounds"].split(","))
+            waste_mix = (
+                parse_waste_mix(options["waste_mix"]) if options["waste_mix"] else None
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        if len(bounds) != 4:
+            raise CommandError("--bounds attend 4 valeurs")
+
+        count = options["count"]
+        points = iter_points(
+            count, options["distribution"], options["seed"], bounds, waste_mix
+        )
+        dates = iter_dates(count, options["days"], seed=options["seed"])
+        insert = copy_reports if options["method"] == "copy" else insert_reports
+
+        self.stdout.write(
+            f"Insertion de {count} signalement(s) [{options['distribution']}, "
+            f"{options['method']}]…"
+        )
+        start = time.perf_counter()
+        with transaction.atomic():
+            inserted = insert(points, dates, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {inserted} ligne(s) en {elapsed:.1f} s "
+            f"({inserted / elapsed if elapsed else 0:.0f} lignes/s)"
+        )
+
+        self._cluster(options["cluster"])
+
+    def _cluster(self, mode):
+        start = time.perf_counter()
+        pending = Report.objects.filter(cluster__isnull=True).order_by(
+            "created_at", "pk"
+        )
+        if mode == "batch":
+            clustered = 0
+            while batch := list(pending[:_CLUSTER_BATCH]):
+                assign_reports_to_clusters(batch)
+                clustered += len(batch)
+                self.stdout.write(f"  {clustered} signalement(s) clusterisé(s)…")
+            self.stdout.write(
+                f"  Clustering par lots : {time.perf_counter() - start:.1f} s"
+            )
+        elif mode == "bulk":
+            stats = rebuild_clusters()
+            self.stdout.write(
+                f"  Clustering en masse : {stats['clusters']} cluster(s) "
+                f"en {stats['total_seconds']:.1f} s"
+            )
+        elif mode == "incremental":
+            for i, report in enumerate(pending.iterator(chunk_size=2000), 1):
+                assign_report_to_cluster(report)
+                if i % 10000 == 0:
+                    self.stdout.write(f"  {i} signalement(s) clusterisé(s)…")
+            self.stdout.write(
+                f"  Clustering incrémental : {time.perf_counter() - start:.1f} s"
+            )
+        else:
+            self.stdout.write(
+                "  Clustering non lancé : python manage.py recluster_reports"
+            )
+        self.stdout.write(self.style.SUCCESS("Terminé."))
+
+    def _delete(self):
+        synthetic = Report.objects.filter(description__startswith=SYNTHETIC_PREFIX)
+        with transaction.atomic():
+            # Détacher d'abord : la suppression n'a plus de cluster à mettre à
+            # jour, les clusters sont reconstruits ensuite en une passe
+            synthetic.update(cluster=None)
+            deleted = synthetic.delete()[1].get("reports.Report", 0)
+        self.stdout.write(f"  {deleted} signalement(s) synthétique(s) supprimé(s)")
+        self._cluster("bulk")
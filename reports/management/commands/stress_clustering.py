@@ -0,0 +1,225 @@
+"""
+Test de charge du clustering concurrent (verrous par cellule de grille).
+
+`--writers` threads (une connexion PostgreSQL chacun) créent en parallèle
+des signalements synthétiques comme la vue create_report : report.save()
+dans transaction.atomic(), soit l'INSERT, les triggers (statistiques,
+Lambert-93) et le clustering synchrone (signals.py), jusqu'au commit.
+
+Scénarios :
+- same : `--spots` dépôts, tous les signalements d'un dépôt à ≤ 2 m de
+  son centre, répartis entre les threads — chaque dépôt doit donner
+  exactement un cluster (les doublons sont comptés) ;
+- distinct : chaque thread écrit dans sa propre bande de la zone — les
+  threads ne devraient jamais s'attendre (mesure du débit maximal).
+
+Avec --batch, chaque thread passe par le chemin en masse (imports, worker
+de clustering différé) : ses signalements sont insérés en un lot
+(bulk_create) puis clusterisés par assign_reports_to_clusters, dans une
+transaction. Les lots d'une même catégorie se suivent (verrou de
+catégorie) : le scénario same doit toujours donner un cluster par dépôt.
+
+Mesures : débit (signalements/s), latence p50 / p90 / p99 de la création
+(INSERT + clustering + commit ; par lot avec --batch), clusters créés. Le clustering est forcé en
+mode synchrone (CLUSTERING_MODE=sync) pendant le test.
+Les données sont écrites (et validées) dans la base, puis supprimées à la
+fin (sauf --keep) : à lancer sur une base de test.
+
+Usage :
+    python manage.py stress_clustering --writers 8 --reports 400
+    python manage.py stress_clustering --scenario distinct --writers 16
+    python manage.py stress_clustering --batch --writers 2   # lots parallèles
+    python manage.py stress_clustering --no-cell-locks   # comparaison
+"""
+
+import json
+import math
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reports.bulk import synthetic_image
+from reports.geo import meters_per_degree
+from reports.management.commands.benchmark_clustering import (
+    settings_override,
+    summarize,
+)
+from reports.models import Report, ReportCluster
+from reports.services import assign_reports_to_clusters, delete_reports
+from reports.synthetic import DEFAULT_BOUNDS, synthetic_report
+
+SCENARIOS = ("same", "distinct")
+
+# Rayon de dispersion autour d'un dépôt (scénario same)
+_SPOT_RADIUS_M = 2.0
+
+
+def _jitter(rng, lon, lat, radius_m):
+    """Point tiré uniformément dans le disque de rayon `radius_m`."""
+    m_lon, m_lat = meters_per_degree(lat)
+    r = radius_m * math.sqrt(rng.random())
+    angle = rng.uniform(0, 2 * math.pi)
+    return lon + r * math.cos(angle) / m_lon, lat + r * math.sin(angle) / m_lat
+
+
+def same_spot_points(rng, n, spots, waste_type="household"):
+    """n points répartis sur `spots` dépôts éloignés (ordre entrelacé)."""
+    lon_min, lat_min, lon_max, lat_max = DEFAULT_BOUNDS
+    centers = [
+        (rng.uniform(lon_min, lon_max), rng.uniform(lat_min, lat_max))
+        for _ in range(spots)
+    ]
+    return [
+        (*_jitter(rng, *centers[i % spots], _SPOT_RADIUS_M), waste_type)
+        for i in range(n)
+    ]
+
+
+def strip_points(rng, n, writers, waste_type="household"):
+    """n points ; le i-ème tombe dans la bande du thread i % writers."""
+    lon_min, lat_min, lon_max, lat_max = DEFAULT_BOUNDS
+    width = (lon_max - lon_min) / writers
+    points = []
+    for i in range(n):
+        strip = lon_min + (i % writers) * width
+        # Marge de 10 % de chaque côté : deux bandes ne se touchent pas
+        points.append(
+            (
+                rng.uniform(strip + width * 0.1, strip + width * 0.9),
+                rng.uniform(lat_min, lat_max),
+                waste_type,
+            )
+        )
+    return points
+
+
+class Command(BaseCommand):
+    help = "Mesure le clustering sous écritures concurrentes (threads)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            choices=SCENARIOS,
+            default="same",
+            help="same : mêmes dépôts ; distinct : zones séparées (défaut: same)",
+        )
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=8,
+            help="Threads d'écriture, une connexion chacun (défaut: 8)",
+        )
+        parser.add_argument(
+            "--reports",
+            type=int,
+            default=400,
+            help="Signalements au total (défaut: 400)",
+        )
+        parser.add_argument(
+            "--spots",
+            type=int,
+            default=5,
+            help="Dépôts du scénario same (défaut: 5)",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire")
+        parser.add_argument(
+            "--no-cell-locks",
+            action="store_true",
+            help="Désactive les verrous par cellule (CLUSTER_CELL_LOCKS=False)",
+        )
+        parser.add_argument(
+            "--batch",
+            action="store_true",
+            help="Un lot par thread (bulk_create + assign_reports_to_clusters)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Conserve les signalements et clusters créés",
+        )
+
+    def handle(self, *args, **options):
+        writers, total = options["writers"], options["reports"]
+        if writers < 1 or total < 1 or options["spots"] < 1:
+            raise CommandError("--writers, --reports et --spots doivent être ≥ 1")
+
+        with settings_override(
+            CLUSTER_CELL_LOCKS=not options["no_cell_locks"], CLUSTERING_MODE="sync"
+        ):
+            result = self._run(options)
+        self.stdout.write(json.dumps(result, indent=2))
+        if result["errors"]:
+            raise CommandError(f"{result['errors']} erreur(s) pendant le test")
+
+    def _run(self, options):
+        rng = random.Random(options["seed"])
+        writers, scenario = options["writers"], options["scenario"]
+        if scenario == "same":
+            points = same_spot_points(rng, options["reports"], options["spots"])
+        else:
+            points = strip_points(rng, options["reports"], writers)
+
+        image = synthetic_image()
+        reports = [synthetic_report(*point, image) for point in points]
+
+        latencies, errors = [], []
+        barrier = threading.Barrier(writers + 1)
+
+        def write(share):
+            try:
+                barrier.wait()
+                if options["batch"]:
+                    start = time.perf_counter()
+                    with transaction.atomic():
+                        created = Report.objects.bulk_create(share)
+                        assign_reports_to_clusters(created)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    return
+                for report in share:
+                    start = time.perf_counter()
+                    with transaction.atomic():
+                        report.save()  # clustering via signals.py
+                    latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:  # compté et affiché à la fin
+                errors.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=write, args=(reports[i::writers],))
+            for i in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        pks = [report.pk for report in reports if report.pk is not None]
+        clusters = ReportCluster.objects.filter(reports__pk__in=pks).distinct().count()
+        result = {
+            "scenario": scenario,
+            "cell_locks": not options["no_cell_locks"],
+            "batch": options["batch"],
+            "writers": writers,
+            "reports": len(pks),
+            "seconds": elapsed,
+            "reports_per_second": len(pks) / elapsed if elapsed else 0.0,
+            "batch_ms" if options["batch"] else "create_ms": summarize(latencies),
+            "clusters": clusters,
+            "errors": len(errors),
+        }
+        if scenario == "same":
+            result["expected_clusters"] = options["spots"]
+            result["duplicate_clusters"] = max(clusters - options["spots"], 0)
+        for error in errors[:5]:
+            self.stderr.write(error)
+
+        if not options["keep"]:
+            delete_reports(Report.objects.filter(pk__in=pks))
+        return result
@@ -0,0 +1,87 @@
+"""
+Contrôle d'intégrité des clusters (voir reports/integrity.py) : signalements
+orphelins, agrégats périmés, clusters vides, réparés en masse.
+
+Usage :
+    python manage.py sweep_integrity                 # recherche et répare
+    python manage.py sweep_integrity --dry-run       # compte sans modifier
+    python manage.py sweep_integrity --loop --interval 3600   # tâche périodique
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.integrity import sweep
+
+
+class Command(BaseCommand):
+    help = "Recherche et répare les incohérences entre signalements et clusters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Affiche les anomalies sans les réparer",
+        )
+        parser.add_argument(
+            "--no-recluster",
+            action="store_true",
+            help="Détache les orphelins sans les reclusteriser",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Signalements ou clusters par transaction (défaut: 5000)",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=1e-9,
+            help="Écart toléré en degrés, par signalement (défaut: 1e-9)",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Relance le contrôle toutes les --interval secondes (mode démon)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=3600.0,
+            help="Pause entre deux contrôles, avec --loop (défaut: 3600)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self._sweep(options)
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé.")
+
+    def _sweep(self, options):
+        stats = sweep(
+            fix=not options["dry_run"],
+            recluster=not options["no_recluster"],
+            batch_size=options["batch_size"],
+            tolerance=options["tolerance"],
+        )
+        self.stdout.write(
+            f"  {stats['orphan_reports']} signalement(s) orphelin(s), "
+            f"{stats['stale_clusters']} cluster(s) périmé(s), "
+            f"{stats['empty_clusters']} cluster(s) vide(s)"
+        )
+        if options["dry_run"]:
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Réparé en {stats['seconds']:.2f} s : {stats['detached']} "
+                f"détaché(s), {stats['reclustered']} reclusterisé(s), "
+                f"{stats['recomputed']} cluster(s) recalculé(s), "
+                f"{stats['deleted']} supprimé(s)."
+            )
+        )
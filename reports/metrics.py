@@ -0,0 +1,316 @@
+"""
+Instrumentation des requêtes : nombre de requêtes SQL, temps base de
+données, temps total et requête SQL la plus lente, par vue.
+
+- MetricsMiddleware mesure un échantillon des requêtes
+  (METRICS_SAMPLE_PERCENT) : les requêtes SQL passent par un
+  connection.execute_wrapper le temps de la vue, les autres ne paient rien.
+- Chaque réponse échantillonnée porte un en-tête Server-Timing
+  (db, app) lisible dans les outils de développement du navigateur.
+- Sous ASGI (vues asynchrones), le wrapper est posé sur la connexion du
+  thread synchrone de la requête, celui où sync_to_async exécute l'ORM.
+- /reports/metrics expose les compteurs au format texte Prometheus, avec
+  l'état du cache cartographique, de la file de clustering différé et
+  des connexions PostgreSQL (dbpool.stats : occupation et attente du pool).
+  Seul label : la vue ; le texte de la requête SQL la plus lente de chaque
+  vue est servi à part (/reports/api/slow-queries, staff).
+
+Compteurs en mémoire du processus (comme tilecache.stats) : avec plusieurs
+workers, Prometheus agrège les cibles.
+"""
+
+import hmac
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_safe
+
+from . import centroid_index, dbpool, jobs, tilecache
+
+# Bornes de l'histogramme des durées de requête (secondes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PREFIX = "dump_alert"
+_SQL_MAX_LENGTH = 300
+_WRITES = ("INSERT", "UPDATE", "DELETE")
+
+_lock = threading.Lock()
+_views = {}  # nom de vue → compteurs
+
+
+def _new_view():
+    return {
+        "requests": 0,
+        "seconds": 0.0,
+        "db_seconds": 0.0,
+        "queries": 0,
+        "writes": 0,
+        "buckets": [0] * len(BUCKETS),
+        "slowest_sql": "",
+        "slowest_sql_seconds": 0.0,
+    }
+
+
+def record(view, seconds, sample):
+    """Ajoute une requête mesurée aux compteurs de la vue."""
+    with _lock:
+        data = _views.setdefault(view, _new_view())
+        data["requests"] += 1
+        data["seconds"] += seconds
+        data["db_seconds"] += sample.db_seconds
+        data["queries"] += sample.queries
+        data["writes"] += sample.writes
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                data["buckets"][i] += 1
+        if sample.slowest_seconds > data["slowest_sql_seconds"]:
+            data["slowest_sql"] = sample.slowest_sql
+            data["slowest_sql_seconds"] = sample.slowest_seconds
+
+
+def stats():
+    """Copie des compteurs par vue."""
+    with _lock:
+        return {
+            view: {**data, "buckets": list(data["buckets"])}
+            for view, data in _views.items()
+        }
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+# =============================================================================
+# MESURE
+# =============================================================================
+class QuerySample:
+    """execute_wrapper : compte et chronomètre les requêtes SQL d'une vue."""
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+        self.db_seconds = 0.0
+        self.slowest_sql = ""
+        self.slowest_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_seconds += elapsed
+            if sql.lstrip()[:6].upper() in _WRITES:
+                self.writes += 1
+            if elapsed > self.slowest_seconds:
+                self.slowest_seconds = elapsed
+                self.slowest_sql = " ".join(sql.split())[:_SQL_MAX_LENGTH]
+
+
+def _sampled():
+    percent = settings.METRICS_SAMPLE_PERCENT
+    return percent >= 100 or (percent > 0 and random.random() * 100 < percent)
+
+
+def _add_wrapper(sample):
+    connection.execute_wrappers.append(sample)
+
+
+def _remove_wrapper(sample):
+    connection.execute_wrappers.remove(sample)
+
+
+class MetricsMiddleware:
+    """Mesure un échantillon des requêtes ; en-tête Server-Timing."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+
+        sample = QuerySample()
+        start = time.perf_counter()
+        with connection.execute_wrapper(sample):
+            response = self.get_response(request)
+        return self._finish(request, response, time.perf_counter() - start, sample)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+
+        sample = QuerySample()
+        start = time.perf_counter()
+        # Les connexions sont propres à chaque thread : le wrapper va sur
+        # celle du thread où sync_to_async exécute les requêtes SQL
+        await sync_to_async(_add_wrapper)(sample)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(sample)
+        return self._finish(request, response, time.perf_counter() - start, sample)
+
+    def _finish(self, request, response, elapsed, sample):
+        match = request.resolver_match
+        record(match.view_name if match else "<non résolue>", elapsed, sample)
+        if settings.METRICS_SERVER_TIMING:
+            # Valeur ASCII : les en-têtes HTTP ne portent pas d'accents
+            response["Server-Timing"] = (
+                f'db;dur={sample.db_seconds * 1000:.1f};desc="{sample.queries} SQL", '
+                f"app;dur={elapsed * 1000:.1f}"
+            )
+        return response
+
+
+# =============================================================================
+# EXPORT PROMETHEUS
+# =============================================================================
+def _label(value):
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return escaped.replace("\n", "\\n")
+
+
+def _metric(lines, name, kind, help_text, samples):
+    """samples : liste de (suffixe, labels, valeur)."""
+    lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+    lines.append(f"# TYPE {_PREFIX}_{name} {kind}")
+    for suffix, labels, value in samples:
+        rendered = ",".join(f'{key}="{_label(v)}"' for key, v in labels.items())
+        rendered = f"{{{rendered}}}" if rendered else ""
+        lines.append(f"{_PREFIX}_{name}{suffix}{rendered} {value}")
+
+
+def prometheus_text(extra_gauges=()):
+    """
+    Compteurs au format d'exposition texte Prometheus (version 0.0.4).
+    `extra_gauges` : (nom, aide, valeur) ajoutés tels quels.
+    """
+    views = sorted(stats().items())
+    lines = []
+    histogram = []
+    for view, data in views:
+        # Seaux déjà cumulatifs : record() compte chaque requête dans tous
+        # les seaux dont la borne dépasse sa durée
+        for bound, count in zip(BUCKETS, data["buckets"]):
+            histogram.append(("_bucket", {"view": view, "le": bound}, count))
+        histogram.append(("_bucket", {"view": view, "le": "+Inf"}, data["requests"]))
+        histogram.append(("_sum", {"view": view}, data["seconds"]))
+        histogram.append(("_count", {"view": view}, data["requests"]))
+    _metric(
+        lines,
+        "request_duration_seconds",
+        "histogram",
+        "Durée des requêtes échantillonnées, par vue.",
+        histogram,
+    )
+    _metric(
+        lines,
+        "db_duration_seconds_total",
+        "counter",
+        "Temps passé en base de données, par vue.",
+        [("", {"view": view}, data["db_seconds"]) for view, data in views],
+    )
+    _metric(
+        lines,
+        "db_queries_total",
+        "counter",
+        "Requêtes SQL exécutées, par vue.",
+        [("", {"view": view}, data["queries"]) for view, data in views],
+    )
+    _metric(
+        lines,
+        "db_writes_total",
+        "counter",
+        "Requêtes SQL d'écriture (INSERT, UPDATE, DELETE), par vue.",
+        [("", {"view": view}, data["writes"]) for view, data in views],
+    )
+    _metric(
+        lines,
+        "slowest_query_seconds",
+        "gauge",
+        "Durée de la requête SQL la plus lente observée, par vue.",
+        [
+            ("", {"view": view}, data["slowest_sql_seconds"])
+            for view, data in views
+            if data["slowest_sql"]
+        ],
+    )
+    for name, help_text, value in extra_gauges:
+        _metric(lines, name, "gauge", help_text, [("", {}, value)])
+    return "\n".join(lines) + "\n"
+
+
+def _authorized(request):
+    """Jeton Bearer METRICS_TOKEN (collecteur) ou staff connecté."""
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(header, f"Bearer {token}"):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_safe
+def prometheus_metrics(request):
+    """Compteurs du processus au format Prometheus (collecteur ou staff)."""
+    if not _authorized(request):
+        return HttpResponse("Accès refusé\n", status=403, content_type="text/plain")
+
+    cache = tilecache.stats()
+    queue = jobs.queue_depth()
+    index = centroid_index.stats()
+    db = dbpool.stats()
+    gauges = (
+        [
+            (f"tile_cache_{name}", f"Cache cartographique : {name}.", cache[name])
+            for name in sorted(cache)
+        ]
+        + [
+            (f"clustering_jobs_{name}", f"File de clustering : {name}.", queue[name])
+            for name in sorted(queue)
+        ]
+        + [
+            (
+                f"centroid_index_{name}",
+                f"Index des centroïdes : recherches ({name}).",
+                index[name],
+            )
+            for name in sorted(index)
+        ]
+        + [
+            (f"db_{name}", f"Connexions PostgreSQL : {name}.", db[name])
+            for name in sorted(db)
+        ]
+    )
+    return HttpResponse(
+        prometheus_text(gauges), content_type="text/plain; version=0.0.4"
+    )
+
+
+@staff_member_required
+@require_safe
+def slow_queries(request):
+    """Requête SQL la plus lente (texte tronqué, durée) par vue (staff uniquement)."""
+    return JsonResponse(
+        {
+            view: {"sql": data["slowest_sql"], "seconds": data["slowest_sql_seconds"]}
+            for view, data in sorted(stats().items())
+            if data["slowest_sql"]
+        }
+    )
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0007_rename_max_waste_type_to_waste_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportcluster",
+            name="sum_lat",
+            field=models.FloatField(default=0, verbose_name="Somme des latitudes"),
+        ),
+        migrations.AddField(
+            model_name="reportcluster",
+            name="sum_lon",
+            field=models.FloatField(default=0, verbose_name="Somme des longitudes"),
+        ),
+        migrations.AlterField(
+            model_name="reportcluster",
+            name="waste_type",
+            field=models.CharField(
+                choices=[
+                    ("green", "Déchets verts"),
+                    ("household", "Déchets ménagers"),
+                    ("bulky", "Encombrants"),
+                    ("building", "Construction"),
+                    ("chemical", "Déchets chimiques"),
+                    ("asbestos", "Amiante"),
+                ],
+                default="green",
+                max_length=20,
+                verbose_name="Catégorie de déchets",
+            ),
+        ),
+        # Initialise les agrégats à partir des signalements existants
+        migrations.RunSQL(
+            sql="""
+                UPDATE reports_reportcluster AS c
+                SET report_count = a.n, sum_lon = a.sx, sum_lat = a.sy
+                FROM (
+                    SELECT cluster_id,
+                           COUNT(*) AS n,
+                           SUM(ST_X(location::geometry)) AS sx,
+                           SUM(ST_Y(location::geometry)) AS sy
+                    FROM reports_report
+                    WHERE cluster_id IS NOT NULL
+                    GROUP BY cluster_id
+                ) AS a
+                WHERE a.cluster_id = c.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:45
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0010_report_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "green")),
+                fields=["centroid"],
+                name="cluster_centroid_green",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "household")),
+                fields=["centroid"],
+                name="cluster_centroid_household",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "bulky")),
+                fields=["centroid"],
+                name="cluster_centroid_bulky",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "building")),
+                fields=["centroid"],
+                name="cluster_centroid_building",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "chemical")),
+                fields=["centroid"],
+                name="cluster_centroid_chemical",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "asbestos")),
+                fields=["centroid"],
+                name="cluster_centroid_asbestos",
+            ),
+        ),
+        # Index fonctionnel pour les requêtes "centroid::geometry && emprise"
+        # de l'API cartographique (le GiST geography ne sert pas après le cast)
+        migrations.RunSQL(
+            "CREATE INDEX cluster_centroid_geom ON reports_reportcluster "
+            "USING GIST ((centroid::geometry))",
+            reverse_sql="DROP INDEX IF EXISTS cluster_centroid_geom",
+        ),
+    ]
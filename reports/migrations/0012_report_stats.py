@@ -0,0 +1,182 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Semaine (lundi) dans le fuseau du projet ; secteur : même calcul que
+# geo.sector_for_point (BEAUVAIS_BOUNDS, pas de 0,03° × 0,02°, 17 × 10)
+FUNCTIONS_SQL = [
+    f"""
+CREATE FUNCTION reports_stat_week(ts timestamptz) RETURNS date
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc('week', ts AT TIME ZONE '{settings.TIME_ZONE}')::date
+$$
+""",
+    """
+CREATE FUNCTION reports_stat_sector(location geography) RETURNS varchar
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN ST_X(location::geometry) BETWEEN 1.80 AND 2.30
+         AND ST_Y(location::geometry) BETWEEN 49.35 AND 49.55
+        THEN chr(65 + LEAST(
+                 floor((ST_X(location::geometry) - 1.80::float8) / 0.03::float8)::int,
+                 16))
+             || (LEAST(
+                 floor((49.55::float8 - ST_Y(location::geometry)) / 0.02::float8)::int,
+                 9) + 1)::text
+        ELSE ''
+    END
+$$
+""",
+]
+
+# Un trigger par instruction (tables de transition new_rows / old_rows) :
+# une seule requête d'upsert, quel que soit le nombre de lignes touchées.
+# Les UPDATE qui ne changent aucune clé (rattachement à un cluster…) ne
+# produisent aucune écriture (HAVING). Clés triées : ordre de verrouillage
+# constant entre transactions concurrentes.
+TRIGGERS_SQL = [
+    """
+CREATE FUNCTION reports_stat_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT week, status, type, sector, SUM(delta)
+        FROM (
+            SELECT reports_stat_week(created_at) AS week, status, type,
+                   reports_stat_sector(location) AS sector, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT reports_stat_week(created_at), status, type,
+                   reports_stat_sector(location), -1
+            FROM old_rows
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+""",
+    """
+CREATE TRIGGER reports_stat_insert AFTER INSERT ON reports_report
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_stat_apply()
+""",
+    """
+CREATE TRIGGER reports_stat_update AFTER UPDATE ON reports_report
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_stat_apply()
+""",
+    """
+CREATE TRIGGER reports_stat_delete AFTER DELETE ON reports_report
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION reports_stat_apply()
+""",
+    # Signalements existants
+    """
+INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+SELECT reports_stat_week(created_at), status, type,
+       reports_stat_sector(location), COUNT(*)
+FROM reports_report
+GROUP BY 1, 2, 3, 4
+""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS reports_stat_insert ON reports_report",
+    "DROP TRIGGER IF EXISTS reports_stat_update ON reports_report",
+    "DROP TRIGGER IF EXISTS reports_stat_delete ON reports_report",
+    "DROP FUNCTION IF EXISTS reports_stat_apply()",
+    "DROP FUNCTION IF EXISTS reports_stat_sector(geography)",
+    "DROP FUNCTION IF EXISTS reports_stat_week(timestamptz)",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0011_cluster_spatial_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week", models.DateField(verbose_name="Semaine (lundi)")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("validated", "Validé"),
+                            ("rejected", "Rejeté"),
+                        ],
+                        max_length=20,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "waste_type",
+                    models.CharField(
+                        choices=[
+                            ("green", "Déchets verts"),
+                            ("household", "Déchets ménagers"),
+                            ("bulky", "Encombrants"),
+                            ("building", "Construction"),
+                            ("chemical", "Déchets chimiques"),
+                            ("asbestos", "Amiante"),
+                        ],
+                        max_length=20,
+                        verbose_name="Catégorie de déchets",
+                    ),
+                ),
+                (
+                    "sector",
+                    models.CharField(blank=True, max_length=4, verbose_name="Secteur"),
+                ),
+                ("count", models.IntegerField(default=0, verbose_name="Signalements")),
+            ],
+            options={
+                "verbose_name": "Statistique de signalements",
+                "verbose_name_plural": "Statistiques de signalements",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("week", "status", "waste_type", "sector"),
+                        name="report_stat_key",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(FUNCTIONS_SQL + TRIGGERS_SQL, reverse_sql=DROP_SQL),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0012_report_stats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=models.Index(fields=["updated_at"], name="cluster_updated_at"),
+        ),
+        # Génération des instantanés de centroïdes (reports/centroid_index.py),
+        # incrémentée par les traitements en masse sur les clusters
+        migrations.RunSQL(
+            "CREATE SEQUENCE reports_centroid_generation",
+            reverse_sql="DROP SEQUENCE IF EXISTS reports_centroid_generation",
+        ),
+    ]
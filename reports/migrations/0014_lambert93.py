@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# Copies Lambert-93 calculées avant chaque écriture de la position : à jour
+# quel que soit le chemin (save, bulk_create, bulk_update, COPY, SQL brut)
+TRIGGERS_SQL = [
+    """
+CREATE FUNCTION reports_l93_location() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.location_l93 := ST_Transform(NEW.location::geometry, 2154);
+    RETURN NEW;
+END
+$$
+""",
+    """
+CREATE FUNCTION reports_l93_centroid() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.centroid_l93 := ST_Transform(NEW.centroid::geometry, 2154);
+    RETURN NEW;
+END
+$$
+""",
+    """
+CREATE TRIGGER reports_l93_location
+BEFORE INSERT OR UPDATE OF location ON reports_report
+FOR EACH ROW EXECUTE FUNCTION reports_l93_location()
+""",
+    """
+CREATE TRIGGER reports_l93_centroid
+BEFORE INSERT OR UPDATE OF centroid ON reports_reportcluster
+FOR EACH ROW EXECUTE FUNCTION reports_l93_centroid()
+""",
+]
+
+# Remplissage initial. Les statistiques ne dépendent pas de location_l93 :
+# leur trigger d'UPDATE (migration 0012) est suspendu le temps du remplissage.
+BACKFILL_SQL = [
+    "ALTER TABLE reports_report DISABLE TRIGGER reports_stat_update",
+    "UPDATE reports_report SET location_l93 = ST_Transform(location::geometry, 2154)",
+    "ALTER TABLE reports_report ENABLE TRIGGER reports_stat_update",
+    "UPDATE reports_reportcluster "
+    "SET centroid_l93 = ST_Transform(centroid::geometry, 2154)",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS reports_l93_location ON reports_report",
+    "DROP TRIGGER IF EXISTS reports_l93_centroid ON reports_reportcluster",
+    "DROP FUNCTION IF EXISTS reports_l93_location()",
+    "DROP FUNCTION IF EXISTS reports_l93_centroid()",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0013_centroid_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="report",
+            name="location_l93",
+            field=django.contrib.gis.db.models.fields.PointField(
+                editable=False,
+                null=True,
+                srid=2154,
+                verbose_name="Localisation (Lambert-93)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="reportcluster",
+            name="centroid_l93",
+            field=django.contrib.gis.db.models.fields.PointField(
+                editable=False,
+                null=True,
+                spatial_index=False,
+                srid=2154,
+                verbose_name="Centroïde (Lambert-93)",
+            ),
+        ),
+        migrations.RunSQL(TRIGGERS_SQL + BACKFILL_SQL, reverse_sql=DROP_SQL),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "green")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_green",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "household")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_household",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "bulky")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_bulky",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "building")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_building",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "chemical")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_chemical",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reportcluster",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(("waste_type", "asbestos")),
+                fields=["centroid_l93"],
+                name="cluster_centroid_l93_asbestos",
+            ),
+        ),
+    ]
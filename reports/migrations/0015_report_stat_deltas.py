@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:38
+
+from django.db import migrations, models
+
+# Triggers en ajout seul : une ligne de variation par clé et par instruction,
+# sans ON CONFLICT. La transaction du citoyen ne met plus à jour (donc ne
+# verrouille plus jusqu'au commit) la ligne partagée de son secteur.
+APPEND_SQL = """
+CREATE OR REPLACE FUNCTION reports_stat_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4;
+    ELSE
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT week, status, type, sector, SUM(delta)
+        FROM (
+            SELECT reports_stat_week(created_at) AS week, status, type,
+                   reports_stat_sector(location) AS sector, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT reports_stat_week(created_at), status, type,
+                   reports_stat_sector(location), -1
+            FROM old_rows
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+# Retour arrière : une ligne par clé (compactage) avant de rétablir la
+# contrainte unique et les upserts de la migration 0012
+UPSERT_SQL = [
+    """
+WITH moved AS (
+    DELETE FROM reports_reportstat
+    RETURNING week, status, waste_type, sector, count
+)
+INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+SELECT week, status, waste_type, sector, SUM(count)
+FROM moved
+GROUP BY 1, 2, 3, 4
+HAVING SUM(count) <> 0
+""",
+    """
+CREATE OR REPLACE FUNCTION reports_stat_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT week, status, type, sector, SUM(delta)
+        FROM (
+            SELECT reports_stat_week(created_at) AS week, status, type,
+                   reports_stat_sector(location) AS sector, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT reports_stat_week(created_at), status, type,
+                   reports_stat_sector(location), -1
+            FROM old_rows
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+""",
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0014_lambert93"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="reportstat",
+            name="report_stat_key",
+        ),
+        migrations.AddIndex(
+            model_name="reportstat",
+            index=models.Index(
+                fields=["week", "status", "waste_type", "sector"],
+                name="report_stat_key",
+            ),
+        ),
+        migrations.RunSQL(APPEND_SQL, reverse_sql=UPSERT_SQL),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+# Lignes de variation de la migration 0015 ramenées à une ligne par clé
+# (partition 0), avant la contrainte unique
+COMPACT_SQL = """
+WITH moved AS (
+    DELETE FROM reports_reportstat
+    RETURNING week, status, waste_type, sector, count
+)
+INSERT INTO reports_reportstat (week, status, waste_type, sector, count, shard)
+SELECT week, status, waste_type, sector, SUM(count), 0
+FROM moved
+GROUP BY 1, 2, 3, 4
+HAVING SUM(count) <> 0
+"""
+
+# Upserts comme en 0012, sur la ligne (clé, partition) de la connexion :
+# deux transactions simultanées ne se disputent la même ligne que si leurs
+# connexions tombent sur la même partition. Le nombre de lignes reste borné
+# (clés × 16), sans compactage. Clés triées : ordre de verrouillage constant.
+SHARDED_UPSERT_SQL = """
+CREATE OR REPLACE FUNCTION reports_stat_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    part smallint := pg_backend_pid() % 16;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count, shard)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), COUNT(*), part
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector, shard)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count, shard)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), -COUNT(*), part
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector, shard)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    ELSE
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count, shard)
+        SELECT week, status, type, sector, SUM(delta), part
+        FROM (
+            SELECT reports_stat_week(created_at) AS week, status, type,
+                   reports_stat_sector(location) AS sector, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT reports_stat_week(created_at), status, type,
+                   reports_stat_sector(location), -1
+            FROM old_rows
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (week, status, waste_type, sector, shard)
+        DO UPDATE SET count = reports_reportstat.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+# Retour arrière : lignes de variation en ajout seul (migration 0015)
+APPEND_SQL = """
+CREATE OR REPLACE FUNCTION reports_stat_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3, 4;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT reports_stat_week(created_at), status, type,
+               reports_stat_sector(location), -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3, 4;
+    ELSE
+        INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+        SELECT week, status, type, sector, SUM(delta)
+        FROM (
+            SELECT reports_stat_week(created_at) AS week, status, type,
+                   reports_stat_sector(location) AS sector, 1 AS delta
+            FROM new_rows
+            UNION ALL
+            SELECT reports_stat_week(created_at), status, type,
+                   reports_stat_sector(location), -1
+            FROM old_rows
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(delta) <> 0;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reports", "0015_report_stat_deltas"),
+    ]
+
+    operations = [
+        # En premier : verrou exclusif sur la table jusqu'au commit
+        migrations.AddField(
+            model_name="reportstat",
+            name="shard",
+            field=models.SmallIntegerField(
+                default=0, verbose_name="Partition d'écriture"
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="reportstat",
+            name="report_stat_key",
+        ),
+        migrations.RunSQL(COMPACT_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="reportstat",
+            constraint=models.UniqueConstraint(
+                fields=("week", "status", "waste_type", "sector", "shard"),
+                name="report_stat_key",
+            ),
+        ),
+        migrations.RunSQL(SHARDED_UPSERT_SQL, reverse_sql=APPEND_SQL),
+    ]
@@ -21,7 +21,60 @@ Exemple d'utilisation :
     Report.objects.filter(status='pending')
 """
 
+from django.conf import settings
 from django.contrib.gis.db import models  # Modèles GeoDjango (avec champs spatiaux)
+from django.contrib.postgres.indexes import GistIndex
+from django.db.models.functions import Now
+from django.utils import timezone
+
+
+# =============================================================================
+# PROJECTION MÉTRIQUE
+# =============================================================================
+# Lambert-93 (France métropolitaine) : distances planes en mètres, exactes au
+# millimètre près à l'échelle de l'agglomération, bien moins coûteuses que
+# le calcul sur le sphéroïde des colonnes geography. Les colonnes *_l93 sont
+# calculées par des triggers PostgreSQL (migration 0014) : à jour quel que
+# soit le chemin d'écriture (save, bulk_create, bulk_update, COPY, SQL).
+L93_SRID = 2154
+
+# Centroïde Lambert-93 à ≤ distance (m) d'un point WGS84 (lon, lat) ; le point
+# est projeté en SQL, une seule fois par requête. Paramètres : lon, lat, distance.
+WITHIN_L93_SQL = (
+    "ST_DWithin(centroid_l93, "
+    f"ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), {L93_SRID}), %s)"
+)
+
+
+def clustering_uses_l93():
+    """True si le clustering compare les distances en Lambert-93."""
+    return settings.CLUSTERING_GEOMETRY == "l93"
+
+
+# =============================================================================
+# EXPRESSIONS SQL
+# =============================================================================
+# Coordonnées d'un champ geography lues directement en SQL (float), sans
+# construire un objet GEOS par ligne. Utile pour les traitements en masse.
+class Longitude(models.Func):
+    """Longitude (ST_X) d'un point geography."""
+
+    template = "ST_X(%(expressions)s::geometry)"
+    output_field = models.FloatField()
+
+
+class Latitude(models.Func):
+    """Latitude (ST_Y) d'un point geography."""
+
+    template = "ST_Y(%(expressions)s::geometry)"
+    output_field = models.FloatField()
+
+
+class MakeCentroid(models.Func):
+    """Point geography construit en SQL à partir de deux expressions (lon, lat)."""
+
+    template = "ST_SetSRID(ST_MakePoint(%(expressions)s), 4326)::geography"
+    output_field = models.PointField(srid=4326, geography=True)
 
 
 class ReportCluster(models.Model):
@@ -30,6 +83,10 @@ class ReportCluster(models.Model):
 
     Quand plusieurs personnes signalent le même dépôt, l'imprécision GPS
     crée des points distincts. Ce modèle les regroupe avec un centroïde unique.
+
+    Le cluster stocke la somme des longitudes/latitudes de ses membres : le
+    centroïde (sum / report_count) se met à jour en O(1) à chaque ajout,
+    retrait ou fusion, sans relire les signalements (voir apply_delta).
     """
 
     centroid = models.PointField(
@@ -39,10 +96,24 @@ class ReportCluster(models.Model):
         geography=True,
     )
 
+    # Copie projetée du centroïde (trigger, voir L93_SRID) ; index GiST
+    # partiels par catégorie (Meta), pas d'index global
+    centroid_l93 = models.PointField(
+        srid=L93_SRID,
+        null=True,
+        spatial_index=False,
+        editable=False,
+        verbose_name="Centroïde (Lambert-93)",
+    )
+
     report_count = models.PositiveIntegerField(
         default=0, verbose_name="Nombre de signalements"
     )
 
+    # Agrégats courants (mis à jour atomiquement par apply_delta)
+    sum_lon = models.FloatField(default=0, verbose_name="Somme des longitudes")
+    sum_lat = models.FloatField(default=0, verbose_name="Somme des latitudes")
+
     waste_type = models.CharField(
         max_length=20,
         choices=[
@@ -69,21 +140,89 @@ class ReportCluster(models.Model):
         verbose_name = "Cluster"
         verbose_name_plural = "Clusters"
         ordering = ["-report_count"]
+        # Recherche des clusters proches (services.nearby_clusters) :
+        # centroid__dwithin + waste_type. Un index GiST partiel par catégorie
+        # ne contient que les clusters de cette catégorie : le parcours de
+        # l'index ne voit jamais les clusters des autres types.
+        # (L'index GiST fonctionnel sur centroid::geometry, utilisé par l'API
+        # cartographique, est créé en SQL dans la migration 0011.)
+        # Mêmes index sur centroid_l93 (CLUSTERING_GEOMETRY = "l93").
+        # updated_at : clusters modifiés depuis l'instantané de centroid_index.
+        indexes = [
+            GistIndex(
+                fields=[field],
+                condition=models.Q(waste_type=waste_type),
+                name=f"cluster_{field}_{waste_type}",
+            )
+            for field in ("centroid", "centroid_l93")
+            for waste_type in (
+                "green",
+                "household",
+                "bulky",
+                "building",
+                "chemical",
+                "asbestos",
+            )
+        ] + [models.Index(fields=["updated_at"], name="cluster_updated_at")]
 
     def __str__(self):
         return f"Cluster #{self.id} ({self.report_count} signalement(s))"
 
+    @classmethod
+    def apply_delta(cls, pk, d_lon, d_lat, d_count):
+        """
+        Ajoute (ou retire) des signalements aux agrégats du cluster, en O(1).
+
+        Une seule requête UPDATE met à jour les sommes, report_count et le
+        centroïde dérivé : les expressions F() lisent les valeurs courantes de
+        la ligne, l'opération est donc atomique même sans verrou.
+        Un cluster qui se retrouverait vide est supprimé.
+
+        Retourne True si le cluster existe encore.
+        """
+        if (
+            d_count < 0
+            and cls.objects.filter(pk=pk, report_count__lte=-d_count).delete()[0]
+        ):
+            return False
+
+        new_count = models.F("report_count") + d_count
+        new_lon = models.F("sum_lon") + d_lon
+        new_lat = models.F("sum_lat") + d_lat
+        return bool(
+            cls.objects.filter(pk=pk).update(
+                sum_lon=new_lon,
+                sum_lat=new_lat,
+                report_count=new_count,
+                centroid=MakeCentroid(new_lon / new_count, new_lat / new_count),
+                updated_at=Now(),
+            )
+        )
+
     def recalculate_centroid(self):
-        """Recalcule le centroïde via moyenne arithmétique des coordonnées.
-        ST_Collect ne supporte pas le type geography — on calcule en Python.
-        Pour des clusters à ≤10m, la moyenne arithmétique est une très bonne approximation."""
+        """Recalcule sommes, report_count et centroïde à partir de tous les membres.
+        ST_Collect ne supporte pas le type geography — on agrège les coordonnées.
+        Pour des clusters à ≤10m, la moyenne arithmétique est une très bonne approximation.
+        La moyenne reste en degrés même avec CLUSTERING_GEOMETRY = "l93" : le
+        centroïde doit valoir sum / report_count (apply_delta, contrôle
+        d'intégrité) ; centroid_l93 en est déduit par trigger.
+        Chemin O(n) réservé aux réparations : l'ajout courant passe par apply_delta."""
         from django.contrib.gis.geos import Point
 
-        points = list(self.reports.values_list("location", flat=True))
-        if points:
-            avg_lon = sum(p.x for p in points) / len(points)
-            avg_lat = sum(p.y for p in points) / len(points)
-            self.centroid = Point(avg_lon, avg_lat, srid=4326)
+        totals = self.reports.aggregate(
+            count=models.Count("pk"),
+            sum_lon=models.Sum(Longitude("location")),
+            sum_lat=models.Sum(Latitude("location")),
+        )
+        self.report_count = totals["count"]
+        self.sum_lon = totals["sum_lon"] or 0.0
+        self.sum_lat = totals["sum_lat"] or 0.0
+        if self.report_count:
+            self.centroid = Point(
+                self.sum_lon / self.report_count,
+                self.sum_lat / self.report_count,
+                srid=4326,
+            )
 
     def recalculate_waste_type(self):
         """Lit la catégorie de déchets depuis les signalements du cluster (tous identiques)."""
@@ -92,10 +231,23 @@ class ReportCluster(models.Model):
 
     def recalculate(self):
         """Recalcule toutes les métadonnées du cluster."""
-        self.report_count = self.reports.count()
+        from .tilecache import invalidate_points
+
+        old = self.centroid
         self.recalculate_centroid()
         self.recalculate_waste_type()
         self.save()
+        # Le centroïde a pu bouger : invalider les tuiles avant / après
+        invalidate_points([(old.x, old.y), (self.centroid.x, self.centroid.y)])
+
+
+# Numéro de chaque catégorie de déchets (ordre des choix), pour geo.cell_key
+WASTE_TYPE_CODES = {
+    value: code
+    for code, (value, _) in enumerate(
+        ReportCluster._meta.get_field("waste_type").choices
+    )
+}
 
 
 class Report(models.Model):
@@ -163,6 +315,14 @@ class Report(models.Model):
         geography=True,  # Active les calculs de distance en mètres réels
     )
 
+    # Copie projetée de la position (trigger, voir L93_SRID)
+    location_l93 = models.PointField(
+        srid=L93_SRID,
+        null=True,
+        editable=False,
+        verbose_name="Localisation (Lambert-93)",
+    )
+
     # --- Statut et dates ---
     status = models.CharField(
         max_length=20,
@@ -183,7 +343,126 @@ class Report(models.Model):
         verbose_name = "Signalement"
         verbose_name_plural = "Signalements"
         ordering = ["-created_at"]
+        # Pagination par curseur (created_at, id), avec ou sans filtre
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="report_created_idx"),
+            models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="report_status_created_idx",
+            ),
+            models.Index(
+                fields=["type", "-created_at", "-id"], name="report_type_created_idx"
+            ),
+        ]
 
     def __str__(self):
         """Représentation textuelle (affichée dans l'admin)."""
         return f"Signalement #{self.id} - {self.get_status_display()}"
+
+
+class ReportStat(models.Model):
+    """
+    Compteur précalculé de signalements par (semaine, statut, catégorie,
+    secteur), lu par le tableau de bord staff.
+
+    Maintenu par des triggers PostgreSQL sur reports_report (migrations
+    0012, 0016) : chaque INSERT, UPDATE ou DELETE, y compris en masse
+    (update() des actions admin, bulk_create, COPY), ajoute ±n au compteur
+    de sa clé en une requête par instruction (upsert). Chaque clé est
+    répartie sur stats.WRITE_SHARDS lignes au plus (`shard`, choisi
+    d'après la connexion) : deux signalements simultanés du même secteur
+    ne s'attendent que s'ils tombent sur la même ligne. Toujours lire des
+    Sum("count").
+    """
+
+    week = models.DateField(verbose_name="Semaine (lundi)")
+
+    status = models.CharField(
+        max_length=20, choices=Report.Status.choices, verbose_name="Statut"
+    )
+
+    waste_type = models.CharField(
+        max_length=20,
+        choices=Report.WasteType.choices,
+        verbose_name="Catégorie de déchets",
+    )
+
+    # Carroyage de la zone couverte (geo.sector_for_point), vide hors zone
+    sector = models.CharField(max_length=4, blank=True, verbose_name="Secteur")
+
+    count = models.IntegerField(default=0, verbose_name="Signalements")
+
+    # Ligne de la clé écrite par la connexion (pg_backend_pid() % WRITE_SHARDS)
+    shard = models.SmallIntegerField(default=0, verbose_name="Partition d'écriture")
+
+    class Meta:
+        verbose_name = "Statistique de signalements"
+        verbose_name_plural = "Statistiques de signalements"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["week", "status", "waste_type", "sector", "shard"],
+                name="report_stat_key",
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.week} {self.status} {self.waste_type} {self.sector} : {self.count}"
+        )
+
+
+class ClusteringJob(models.Model):
+    """
+    Tâche de clustering différée (mode CLUSTERING_MODE = "deferred").
+
+    Créée dans la même transaction que le signalement, puis consommée par
+    `python manage.py process_clustering_jobs`. Une tâche réussie est
+    supprimée : la table ne contient que la file d'attente et les échecs.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "En attente"
+        FAILED = "failed", "Échec définitif"
+
+    report = models.OneToOneField(
+        Report,
+        on_delete=models.CASCADE,
+        related_name="clustering_job",
+        verbose_name="Signalement",
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name="Statut",
+    )
+
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+
+    # Prochaine exécution possible (délai croissant entre les tentatives)
+    run_after = models.DateTimeField(
+        default=timezone.now, verbose_name="Exécutable à partir de"
+    )
+
+    # Bail du worker qui traite la tâche : expiré = tâche reprise par un autre
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Réservée jusqu'à"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Date de création"
+    )
+
+    class Meta:
+        verbose_name = "Tâche de clustering"
+        verbose_name_plural = "Tâches de clustering"
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return (
+            f"Clustering du signalement #{self.report_id} ({self.get_status_display()})"
+        )
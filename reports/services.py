@@ -5,10 +5,173 @@ Regroupe automatiquement les signalements situés à ≤10m les uns des autres
 dans un cluster unique avec un centroïde recalculé.
 """
 
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import BooleanField, Sum
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from . import centroid_index, tilecache
+from .clustering import ClusterEngine
+from .geo import cell_key, grid_cell, neighbour_cells
+from .models import (
+    WASTE_TYPE_CODES,
+    WITHIN_L93_SQL,
+    Latitude,
+    Longitude,
+    Report,
+    ReportCluster,
+    clustering_uses_l93,
+)
+
+# Distance maximale (en mètres) entre un signalement et le centroïde d'un cluster
+CLUSTER_DISTANCE_M = 10
+
+
+def nearby_clusters(location, waste_type):
+    """
+    Clusters de même catégorie dont le centroïde est à ≤ CLUSTER_DISTANCE_M,
+    sur les colonnes geography ou Lambert-93 selon CLUSTERING_GEOMETRY.
+
+    Requête servie par les index GiST partiels par catégorie (voir
+    ReportCluster.Meta) ; son plan est vérifié par `audit_cluster_queries`.
+    """
+    if clustering_uses_l93():
+        return ReportCluster.objects.filter(
+            RawSQL(
+                WITHIN_L93_SQL,
+                (location.x, location.y, CLUSTER_DISTANCE_M),
+                output_field=BooleanField(),
+            ),
+            waste_type=waste_type,
+        )
+    return ReportCluster.objects.filter(
+        centroid__dwithin=(location, D(m=CLUSTER_DISTANCE_M)),
+        waste_type=waste_type,
+    )
+
+
+# =============================================================================
+# VERROUS PAR CELLULE DE GRILLE
+# =============================================================================
+# select_for_update ne verrouille que des clusters existants : deux
+# signalements simultanés d'un nouveau dépôt ne trouvent rien à verrouiller
+# et créeraient deux clusters. Chaque signalement prend donc des verrous
+# consultatifs PostgreSQL (libérés au commit) sur les cellules de grille de
+# son voisinage, par catégorie :
+# - exclusif sur sa cellule, partagé sur les 8 voisines ;
+# - deux signalements à ≤ CLUSTER_DISTANCE_M sont chacun dans le voisinage
+#   de l'autre : l'un attend le commit de l'autre, puis voit son cluster ;
+# - deux signalements éloignés (ou de catégories différentes) ne partagent
+#   aucune cellule, ou seulement en mode partagé : aucune attente ;
+# - verrous pris en une requête, dans l'ordre des clés : pas d'interblocage.
+# Les chemins en masse (assign_reports_to_clusters, rebuild_clusters) ne
+# peuvent pas prendre une cellule par signalement (la table des verrous
+# déborderait) : ils prennent en exclusif un verrou par catégorie, que
+# chaque signalement prend en partagé avant ses cellules (clé triée en
+# premier). Un lot attend donc les signalements en cours de sa catégorie,
+# et inversement ; deux lots de la même catégorie se suivent.
+
+# Pas de la grille : distance de clustering + marge (approximation de geo)
+_CELL_LOCK_M = CLUSTER_DISTANCE_M + 1
+# Préfixes des clés (bits 52 à 62) réservés au clustering : catégorie
+# (chemins en masse), puis cellules
+_CATEGORY_LOCK_NAMESPACE = 0x2A4
+_CELL_LOCK_NAMESPACE = 0x2A5
+
+# Le tableau est parcouru dans l'ordre : clés déjà triées par l'appelant
+_CELL_LOCKS_SQL = """
+    SELECT CASE WHEN key = ANY(%s::bigint[]) THEN pg_advisory_xact_lock(key)
+                ELSE pg_advisory_xact_lock_shared(key) END
+    FROM unnest(%s::bigint[]) AS key
+"""
+
+
+def cell_lock_key(waste_type, row, col):
+    """Clé de verrou consultatif (bigint) de la cellule pour la catégorie."""
+    return cell_key(
+        WASTE_TYPE_CODES[waste_type], row, col, namespace=_CELL_LOCK_NAMESPACE
+    )
+
+
+def category_lock_key(waste_type):
+    """Clé de verrou consultatif (bigint) de toute la catégorie."""
+    return cell_key(
+        WASTE_TYPE_CODES[waste_type], 0, 0, namespace=_CATEGORY_LOCK_NAMESPACE
+    )
+
 
-from .models import Report, ReportCluster
+def lock_cells(lon, lat, waste_type):
+    """
+    Verrouille le voisinage du point jusqu'à la fin de la transaction
+    courante (voir ci-dessus). Sans effet si CLUSTER_CELL_LOCKS est faux.
+    """
+    if not settings.CLUSTER_CELL_LOCKS:
+        return
+    own = cell_lock_key(waste_type, *grid_cell(lon, lat, _CELL_LOCK_M))
+    keys = sorted(
+        [category_lock_key(waste_type)]
+        + [
+            cell_lock_key(waste_type, row, col)
+            for row, col in neighbour_cells(lon, lat, _CELL_LOCK_M)
+        ]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(_CELL_LOCKS_SQL, [[own], keys])
+
+
+def lock_categories(waste_types):
+    """
+    Verrou exclusif des catégories pour un chemin en masse, jusqu'à la fin
+    de la transaction courante (voir ci-dessus). Sans effet si
+    CLUSTER_CELL_LOCKS est faux.
+    """
+    if not settings.CLUSTER_CELL_LOCKS:
+        return
+    keys = sorted({category_lock_key(waste_type) for waste_type in waste_types})
+    if keys:
+        with connection.cursor() as cursor:
+            cursor.execute(_CELL_LOCKS_SQL, [keys, keys])
+
+
+def _absorb(main_cluster, others):
+    """
+    Rattache au cluster principal les signalements des clusters `others`,
+    supprime ces derniers et retourne leurs agrégats cumulés
+    (count, sum_lon, sum_lat) — à appliquer au principal par apply_delta.
+    """
+    other_pks = [c.pk for c in others]
+
+    # Agrégats des secondaires lus en base (valeurs courantes, pas celles en mémoire)
+    totals = ReportCluster.objects.filter(pk__in=other_pks).aggregate(
+        count=Sum("report_count"),
+        sum_lon=Sum("sum_lon"),
+        sum_lat=Sum("sum_lat"),
+    )
+
+    # Rattacher tous les signalements au cluster principal
+    Report.objects.filter(cluster_id__in=other_pks).update(cluster=main_cluster)
+
+    # Supprimer les clusters désormais vides
+    ReportCluster.objects.filter(pk__in=other_pks).delete()
+
+    return totals["count"] or 0, totals["sum_lon"] or 0.0, totals["sum_lat"] or 0.0
+
+
+def _invalidate_tiles(old_clusters, count, sum_lon, sum_lat):
+    """
+    Invalide les tuiles en cache des anciens centroïdes et du nouveau
+    centroïde (sum / count) du cluster résultant.
+    """
+    points = [(c.centroid.x, c.centroid.y) for c in old_clusters]
+    if count:
+        points.append((sum_lon / count, sum_lat / count))
+    tilecache.invalidate_points(points)
 
 
 def merge_clusters(clusters):
@@ -16,19 +179,24 @@ def merge_clusters(clusters):
     Fusionne plusieurs clusters en un seul (le plus ancien).
 
     Tous les signalements des clusters secondaires sont rattachés
-    au cluster principal, puis les clusters vides sont supprimés.
+    au cluster principal, dont les agrégats absorbent ceux des secondaires
+    (O(nombre de clusters), sans relire les signalements), puis les clusters
+    vides sont supprimés.
     """
-    # Garder le plus ancien comme cluster principal
-    ordered = sorted(clusters, key=lambda c: c.created_at)
+    # Garder le plus ancien comme cluster principal (pk pour départager les égalités)
+    ordered = sorted(clusters, key=lambda c: (c.created_at, c.pk))
     main_cluster = ordered[0]
-    others = ordered[1:]
-
-    # Rattacher tous les signalements au cluster principal
-    for cluster in others:
-        cluster.reports.update(cluster=main_cluster)
 
-    # Supprimer les clusters désormais vides
-    ReportCluster.objects.filter(pk__in=[c.pk for c in others]).delete()
+    with transaction.atomic():
+        count, sum_lon, sum_lat = _absorb(main_cluster, ordered[1:])
+        if count:
+            ReportCluster.apply_delta(main_cluster.pk, sum_lon, sum_lat, count)
+        _invalidate_tiles(
+            ordered,
+            main_cluster.report_count + count,
+            main_cluster.sum_lon + sum_lon,
+            main_cluster.sum_lat + sum_lat,
+        )
 
     return main_cluster
 
@@ -41,15 +209,27 @@ def assign_report_to_cluster(report):
     - 0 cluster proche → créer un nouveau cluster
     - 1 cluster proche → ajouter au cluster existant
     - 2+ clusters proches → fusionner les clusters, puis ajouter
+
+    Coût constant quelle que soit la taille du cluster : les agrégats
+    (sommes, nombre, centroïde) sont mis à jour par ReportCluster.apply_delta.
+    Retourne le cluster du signalement.
     """
+    x, y = report.location.x, report.location.y
+
     with transaction.atomic():
+        # 0. Verrou du voisinage : un seul cluster pour deux signalements
+        # simultanés d'un nouveau dépôt
+        lock_cells(x, y, report.type)
+
         # 1. Verrouiller les clusters proches (≤10m) pour éviter les race conditions
-        nearby = list(
-            ReportCluster.objects.select_for_update().filter(
-                centroid__dwithin=(report.location, D(m=10)),
-                waste_type=report.type,
-            )
+        # (présélection par l'index des centroïdes s'il est activé et à jour)
+        nearby = centroid_index.locked_nearby(
+            report.location, report.type, CLUSTER_DISTANCE_M
         )
+        if nearby is None:
+            nearby = list(
+                nearby_clusters(report.location, report.type).select_for_update()
+            )
 
         if len(nearby) == 0:
             # Aucun cluster proche → en créer un nouveau
@@ -57,18 +237,564 @@ def assign_report_to_cluster(report):
                 centroid=report.location,
                 report_count=1,
                 waste_type=report.type,
+                sum_lon=x,
+                sum_lat=y,
             )
+            Report.objects.filter(pk=report.pk).update(cluster=cluster)
+            report.cluster = cluster
+            _invalidate_tiles([], 1, x, y)
+            return cluster
 
-        elif len(nearby) == 1:
-            # Un seul cluster proche → le rejoindre
-            cluster = nearby[0]
-
-        else:
-            # 2+ clusters proches → les fusionner en un seul
-            cluster = merge_clusters(nearby)
+        # 1 cluster proche → le rejoindre ; 2+ → absorber les autres dans le
+        # plus ancien (pk pour départager les égalités)
+        ordered = sorted(nearby, key=lambda c: (c.created_at, c.pk))
+        cluster = ordered[0]
+        count, sum_lon, sum_lat = _absorb(cluster, ordered[1:])
 
         # Rattacher le report au cluster SANS .save() (évite de re-déclencher post_save)
         Report.objects.filter(pk=report.pk).update(cluster=cluster)
+        report.cluster = cluster
+
+        # Mettre à jour les agrégats et le centroïde en O(1) : une seule
+        # requête pour les clusters absorbés et le nouveau signalement
+        ReportCluster.apply_delta(cluster.pk, sum_lon + x, sum_lat + y, count + 1)
+
+        # Lignes verrouillées : les sommes en mémoire du principal sont à jour
+        _invalidate_tiles(
+            nearby,
+            cluster.report_count + count + 1,
+            cluster.sum_lon + sum_lon + x,
+            cluster.sum_lat + sum_lat + y,
+        )
+
+    return cluster
+
 
-        # Recalculer le centroïde et les métadonnées
-        cluster.recalculate()
+# Clusters existants (même catégorie) à ≤ distance d'au moins un des signalements
+# (colonnes geography ou Lambert-93 selon CLUSTERING_GEOMETRY)
+_CLUSTERS_NEAR_REPORTS_SQL = """
+    SELECT DISTINCT c.id
+    FROM reports_reportcluster AS c
+    JOIN reports_report AS r
+      ON c.waste_type = r.type
+     AND ST_DWithin(c.{centroid}, r.{location}, %s)
+    WHERE r.id = ANY(%s)
+"""
+
+
+def assign_reports_to_clusters(reports, batch_size=2000):
+    """
+    Clusterise un lot de signalements déjà enregistrés (bulk_create, import…)
+    en une transaction, avec le même résultat que assign_report_to_cluster
+    appelé sur chacun dans l'ordre de création.
+
+    1. Verrou exclusif des catégories du lot (lock_categories) : aucun
+       signalement ni autre lot de ces catégories ne crée de cluster en
+       parallèle. Une jointure spatiale trouve ensuite les clusters existants
+       à ≤10m d'au moins un signalement du lot ; ils sont verrouillés. Les
+       autres clusters ne peuvent pas être touchés : seuls les centroïdes
+       modifiés bougent.
+    2. ClusterEngine rejoue la règle en mémoire (ajouts, fusions internes au
+       lot et avec l'existant ; un cluster existant est toujours plus ancien
+       qu'un nouveau).
+    3. Écritures ensemblistes : bulk_create des nouveaux clusters,
+       bulk_update des clusters existants modifiés, rattachement des
+       signalements des clusters absorbés, suppression de ces derniers,
+       bulk_update des signalements du lot.
+
+    Les signalements déjà rattachés à un cluster sont ignorés.
+    Retourne un dictionnaire de statistiques.
+    """
+    start = time.perf_counter()
+    reports = sorted(
+        (r for r in reports if r.cluster_id is None),
+        key=lambda r: (r.created_at, r.pk),
+    )
+    stats = {"reports": len(reports), "created": 0, "updated": 0, "merged": 0}
+    if not reports:
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    with transaction.atomic():
+        centroid_index.invalidate()
+
+        # 1. Clusters existants concernés (jointure spatiale + verrou), une
+        # fois les clusters créés en parallèle validés
+        lock_categories({r.type for r in reports})
+        with connection.cursor() as cursor:
+            columns = (
+                {"centroid": "centroid_l93", "location": "location_l93"}
+                if clustering_uses_l93()
+                else {"centroid": "centroid", "location": "location"}
+            )
+            cursor.execute(
+                _CLUSTERS_NEAR_REPORTS_SQL.format(**columns),
+                [CLUSTER_DISTANCE_M, [r.pk for r in reports]],
+            )
+            nearby_pks = [row[0] for row in cursor.fetchall()]
+        existing = list(
+            ReportCluster.objects.select_for_update()
+            .filter(pk__in=nearby_pks, report_count__gt=0)
+            .order_by("pk")
+            .annotate(lon=Longitude("centroid"), lat=Latitude("centroid"))
+            .values_list(
+                "pk",
+                "created_at",
+                "waste_type",
+                "sum_lon",
+                "sum_lat",
+                "report_count",
+                "lon",
+                "lat",
+            )
+        )
+
+        # 2. Regroupement en mémoire
+        engine = ClusterEngine(distance=CLUSTER_DISTANCE_M)
+        seeded = {}
+        for pk, created_at, waste_type, sum_lon, sum_lat, count, lon, lat in existing:
+            cluster = engine.seed(
+                pk, (0, created_at, pk), waste_type, sum_lon, sum_lat, count
+            )
+            seeded[pk] = (cluster, (lon, lat))
+        for report in reports:
+            engine.add(report.pk, report.location.x, report.location.y, report.type)
+
+        # 3. Écritures
+        live = sorted(engine.clusters.values(), key=lambda c: c.rank)
+        new = [c for c in live if c.pk is None]
+        created = ReportCluster.objects.bulk_create(
+            [
+                ReportCluster(
+                    centroid=Point(*c.centroid, srid=4326),
+                    report_count=c.report_count,
+                    waste_type=c.waste_type,
+                    sum_lon=c.sum_lon,
+                    sum_lat=c.sum_lat,
+                )
+                for c in new
+            ],
+            batch_size=batch_size,
+        )
+        for cluster, obj in zip(new, created):
+            cluster.pk = obj.pk
+
+        # Clusters existants modifiés : ceux qui ont reçu des signalements (une
+        # fusion se produit toujours à l'ajout d'un signalement au principal)
+        now = timezone.now()
+        changed = [c for c in live if c.pk in seeded and c.report_ids]
+        absorbed = engine.merged_into()
+        ReportCluster.objects.bulk_update(
+            [
+                ReportCluster(
+                    pk=c.pk,
+                    centroid=Point(*c.centroid, srid=4326),
+                    report_count=c.report_count,
+                    sum_lon=c.sum_lon,
+                    sum_lat=c.sum_lat,
+                    updated_at=now,
+                )
+                for c in changed
+            ],
+            ["centroid", "report_count", "sum_lon", "sum_lat", "updated_at"],
+            batch_size=batch_size,
+        )
+
+        # Clusters existants absorbés par une fusion : membres rattachés au
+        # cluster final, puis suppression
+        targets = {}
+        for old_pk, cluster in absorbed.items():
+            targets.setdefault(cluster.pk, []).append(old_pk)
+        for target_pk, old_pks in targets.items():
+            Report.objects.filter(cluster_id__in=old_pks).update(cluster_id=target_pk)
+        ReportCluster.objects.filter(pk__in=absorbed).delete()
+
+        # Signalements du lot
+        cluster_of = {
+            report_id: cluster.pk
+            for cluster in live
+            for report_id in cluster.report_ids
+        }
+        for report in reports:
+            report.cluster_id = cluster_of[report.pk]
+        Report.objects.bulk_update(reports, ["cluster"], batch_size=batch_size)
+
+        # Tuiles en cache : anciens centroïdes touchés et nouveaux centroïdes
+        touched = set(absorbed) | {c.pk for c in changed}
+        tilecache.invalidate_points(
+            [seeded[pk][1] for pk in touched]
+            + [c.centroid for c in live if c.pk in touched or c.pk not in seeded]
+        )
+
+    stats.update(
+        created=len(created),
+        updated=len(changed),
+        merged=len(absorbed),
+        seconds=time.perf_counter() - start,
+    )
+    return stats
+
+
+def delete_reports(reports, resplit=None, batch_size=2000):
+    """
+    Supprime un ensemble de signalements (queryset) en maintenant leurs
+    clusters en un nombre constant de requêtes par lot, au lieu d'un verrou
+    et d'un UPDATE par signalement (post_delete).
+
+    1. Les clusters touchés sont verrouillés une fois, dans l'ordre des pk.
+    2. Les signalements sont détachés puis supprimés (post_delete n'a plus
+       rien à faire).
+    3. Chaque cluster touché est mis à jour une seule fois : agrégats moins
+       la somme des membres retirés (bulk_update), ou supprimé s'il est vide.
+    4. Avec `resplit` (défaut : settings.CLUSTER_RESPLIT_ON_DELETE), la
+       règle de clustering est rejouée sur les membres restants de chaque
+       cluster touché : un cluster dont les membres ne sont plus reliés
+       (point « pont » supprimé) est découpé, le plus ancien morceau garde
+       le cluster d'origine.
+
+    Retourne un dictionnaire de statistiques.
+    """
+    start = time.perf_counter()
+    if resplit is None:
+        resplit = settings.CLUSTER_RESPLIT_ON_DELETE
+
+    with transaction.atomic():
+        centroid_index.invalidate()
+        rows = list(
+            reports.order_by()
+            .annotate(lon=Longitude("location"), lat=Latitude("location"))
+            .values_list("pk", "cluster_id", "lon", "lat")
+        )
+        deltas = defaultdict(lambda: [0, 0.0, 0.0])  # cluster → count, lon, lat
+        for _, cluster_id, lon, lat in rows:
+            if cluster_id is not None:
+                delta = deltas[cluster_id]
+                delta[0] += 1
+                delta[1] += lon
+                delta[2] += lat
+
+        # 1. Verrou des clusters touchés (ordre des pk : pas d'interblocage)
+        locked = list(
+            ReportCluster.objects.select_for_update()
+            .filter(pk__in=deltas)
+            .order_by("pk")
+            .values_list("pk", "sum_lon", "sum_lat", "report_count")
+        )
+
+        # 2. Suppression, par lots
+        pks = [row[0] for row in rows]
+        deleted = 0
+        for i in range(0, len(pks), batch_size):
+            chunk = Report.objects.filter(pk__in=pks[i : i + batch_size])
+            chunk.update(cluster=None)
+            deleted += chunk.delete()[1].get("reports.Report", 0)
+
+        # 3. Une mise à jour (ou suppression) par cluster touché
+        now = timezone.now()
+        emptied, updated, points = [], [], []
+        for pk, sum_lon, sum_lat, count in locked:
+            d_count, d_lon, d_lat = deltas[pk]
+            if count:
+                points.append((sum_lon / count, sum_lat / count))
+            if count <= d_count:
+                emptied.append(pk)
+                continue
+            count, sum_lon, sum_lat = count - d_count, sum_lon - d_lon, sum_lat - d_lat
+            points.append((sum_lon / count, sum_lat / count))
+            updated.append(
+                ReportCluster(
+                    pk=pk,
+                    centroid=Point(sum_lon / count, sum_lat / count, srid=4326),
+                    report_count=count,
+                    sum_lon=sum_lon,
+                    sum_lat=sum_lat,
+                    updated_at=now,
+                )
+            )
+        ReportCluster.objects.filter(pk__in=emptied).delete()
+        ReportCluster.objects.bulk_update(
+            updated,
+            ["centroid", "report_count", "sum_lon", "sum_lat", "updated_at"],
+            batch_size=batch_size,
+        )
+
+        # 4. Re-découpage des clusters dont les membres ne sont plus reliés
+        split = (
+            _resplit_clusters([c.pk for c in updated], batch_size) if resplit else []
+        )
+        tilecache.invalidate_points(points + split)
+
+    return {
+        "deleted": deleted,
+        "clusters_updated": len(updated),
+        "clusters_deleted": len(emptied),
+        "clusters_created": len(split),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _resplit_clusters(cluster_pks, batch_size):
+    """
+    Rejoue la règle de clustering (ClusterEngine) sur les membres de chaque
+    cluster, dans l'ordre de création. Si elle donne plusieurs clusters, le
+    plus ancien garde le cluster d'origine, les autres sont créés.
+    Retourne les centroïdes des clusters modifiés ou créés.
+    """
+    engines = defaultdict(lambda: ClusterEngine(distance=CLUSTER_DISTANCE_M))
+    members = (
+        Report.objects.filter(cluster_id__in=cluster_pks)
+        .order_by("created_at", "pk")
+        .annotate(lon=Longitude("location"), lat=Latitude("location"))
+        .values_list("pk", "cluster_id", "lon", "lat", "type")
+    )
+    for pk, cluster_id, lon, lat, waste_type in members.iterator(chunk_size=batch_size):
+        engines[cluster_id].add(pk, lon, lat, waste_type)
+
+    now = timezone.now()
+    kept, new = [], []
+    for cluster_pk, engine in engines.items():
+        parts = sorted(engine.clusters.values(), key=lambda c: c.rank)
+        if len(parts) < 2:
+            continue
+        parts[0].pk = cluster_pk
+        kept.append(parts[0])
+        new.extend(parts[1:])
+
+    ReportCluster.objects.bulk_update(
+        [
+            ReportCluster(
+                pk=c.pk,
+                centroid=Point(*c.centroid, srid=4326),
+                report_count=c.report_count,
+                sum_lon=c.sum_lon,
+                sum_lat=c.sum_lat,
+                updated_at=now,
+            )
+            for c in kept
+        ],
+        ["centroid", "report_count", "sum_lon", "sum_lat", "updated_at"],
+        batch_size=batch_size,
+    )
+    created = ReportCluster.objects.bulk_create(
+        [
+            ReportCluster(
+                centroid=Point(*c.centroid, srid=4326),
+                report_count=c.report_count,
+                waste_type=c.waste_type,
+                sum_lon=c.sum_lon,
+                sum_lat=c.sum_lat,
+            )
+            for c in new
+        ],
+        batch_size=batch_size,
+    )
+    Report.objects.bulk_update(
+        [
+            Report(pk=report_id, cluster_id=obj.pk)
+            for cluster, obj in zip(new, created)
+            for report_id in cluster.report_ids
+        ],
+        ["cluster"],
+        batch_size=batch_size,
+    )
+    return [c.centroid for c in kept + new]
+
+
+def rebuild_clusters(batch_size=2000):
+    """
+    Reconstruit tous les clusters en quelques requêtes ensemblistes.
+
+    Les signalements sont chargés une seule fois (dans l'ordre de création),
+    regroupés en mémoire par `ClusterEngine` — même logique, donc mêmes
+    clusters, que `assign_report_to_cluster` appelé un par un — puis écrits
+    avec bulk_create / bulk_update.
+
+    Retourne un dictionnaire de statistiques (volumes et durées en secondes).
+    """
+    start = time.perf_counter()
+
+    with transaction.atomic():
+        centroid_index.invalidate()
+        lock_categories(WASTE_TYPE_CODES)
+        detached = Report.objects.filter(cluster__isnull=False).update(cluster=None)
+        deleted, _ = ReportCluster.objects.all().delete()
+
+        # 1. Chargement des points et regroupement en mémoire
+        grouping_start = time.perf_counter()
+        engine = ClusterEngine(distance=CLUSTER_DISTANCE_M)
+        points = (
+            Report.objects.order_by("created_at", "pk")
+            .annotate(lon=Longitude("location"), lat=Latitude("location"))
+            .values_list("pk", "lon", "lat", "type")
+        )
+        total = 0
+        for pk, lon, lat, waste_type in points.iterator(chunk_size=batch_size):
+            engine.add(pk, lon, lat, waste_type)
+            total += 1
+        grouped = time.perf_counter()
+
+        # 2. Écriture des clusters (ordre de création conservé → pk croissantes)
+        clusters = sorted(engine.clusters.values(), key=lambda c: c.rank)
+        created = ReportCluster.objects.bulk_create(
+            [
+                ReportCluster(
+                    centroid=Point(*c.centroid, srid=4326),
+                    report_count=c.report_count,
+                    waste_type=c.waste_type,
+                    sum_lon=c.sum_lon,
+                    sum_lat=c.sum_lat,
+                )
+                for c in clusters
+            ],
+            batch_size=batch_size,
+        )
+
+        # 3. Rattachement des signalements
+        Report.objects.bulk_update(
+            [
+                Report(pk=report_id, cluster_id=obj.pk)
+                for cluster, obj in zip(clusters, created)
+                for report_id in cluster.report_ids
+            ],
+            ["cluster"],
+            batch_size=batch_size,
+        )
+
+        # Tous les centroïdes ont changé : cache cartographique vidé au commit
+        transaction.on_commit(tilecache.clear)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "detached": detached,
+        "deleted": deleted,
+        "reports": total,
+        "clusters": len(created),
+        "grouping_seconds": grouped - grouping_start,
+        "total_seconds": elapsed,
+        "reports_per_second": total / elapsed if elapsed else 0.0,
+    }
+
+
+# Au-delà, le recalcul vide tout le cache cartographique plutôt que
+# d'invalider les tuiles de chaque centroïde
+_RECOMPUTE_CLEAR_CACHE_ABOVE = 1000
+
+_RECOMPUTE_CLUSTERS_SQL = """
+    UPDATE reports_reportcluster AS c
+    SET report_count = m.report_count,
+        sum_lon = m.sum_lon,
+        sum_lat = m.sum_lat,
+        centroid = ST_SetSRID(
+            ST_MakePoint(m.sum_lon / m.report_count, m.sum_lat / m.report_count),
+            4326
+        )::geography,
+        waste_type = m.waste_type,
+        updated_at = now()
+    FROM (
+        SELECT cluster_id,
+               COUNT(*) AS report_count,
+               SUM(ST_X(location::geometry)) AS sum_lon,
+               SUM(ST_Y(location::geometry)) AS sum_lat,
+               mode() WITHIN GROUP (ORDER BY type) AS waste_type
+        FROM reports_report
+        WHERE cluster_id = ANY(%s)
+        GROUP BY cluster_id
+    ) AS m
+    WHERE c.id = m.cluster_id
+"""
+
+_DELETE_EMPTY_CLUSTERS_SQL = """
+    DELETE FROM reports_reportcluster AS c
+    WHERE c.id = ANY(%s)
+      AND NOT EXISTS (SELECT 1 FROM reports_report AS r WHERE r.cluster_id = c.id)
+"""
+
+
+def recompute_clusters(clusters):
+    """
+    Recalcule report_count, sommes, centroïde et waste_type d'un ensemble de
+    clusters (queryset) à partir de leurs membres, en quelques requêtes
+    quel que soit leur nombre :
+    1. verrou des clusters (ordre des pk) et lecture des anciens centroïdes ;
+    2. UPDATE … FROM (SELECT … GROUP BY cluster_id) ;
+    3. suppression des clusters sans membres.
+
+    Retourne un dictionnaire de statistiques.
+    """
+    start = time.perf_counter()
+    with transaction.atomic():
+        centroid_index.invalidate()
+        old = list(
+            clusters.select_for_update()
+            .order_by("pk")
+            .annotate(lon=Longitude("centroid"), lat=Latitude("centroid"))
+            .values_list("pk", "lon", "lat")
+        )
+        pks = [pk for pk, _, _ in old]
+        with connection.cursor() as cursor:
+            cursor.execute(_RECOMPUTE_CLUSTERS_SQL, [pks])
+            updated = cursor.rowcount
+            cursor.execute(_DELETE_EMPTY_CLUSTERS_SQL, [pks])
+            deleted = cursor.rowcount
+
+        if len(pks) > _RECOMPUTE_CLEAR_CACHE_ABOVE:
+            transaction.on_commit(tilecache.clear)
+        else:
+            new = (
+                ReportCluster.objects.filter(pk__in=pks)
+                .annotate(lon=Longitude("centroid"), lat=Latitude("centroid"))
+                .values_list("lon", "lat")
+            )
+            tilecache.invalidate_points([(lon, lat) for _, lon, lat in old] + list(new))
+
+    return {
+        "clusters": len(pks),
+        "updated": updated,
+        "deleted": deleted,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# Clusters dont les agrégats diffèrent d'un recalcul à partir des membres,
+# avec le nombre stocké et le nombre réel de membres (0 : cluster vide, à
+# supprimer). Tolérance en degrés, relative au nombre de membres pour les
+# sommes (erreurs d'arrondi).
+_AGGREGATE_DRIFT_SQL = """
+    SELECT c.id, c.report_count, COALESCE(m.report_count, 0)
+    FROM reports_reportcluster AS c
+    LEFT JOIN (
+        SELECT cluster_id,
+               COUNT(*) AS report_count,
+               SUM(ST_X(location::geometry)) AS sum_lon,
+               SUM(ST_Y(location::geometry)) AS sum_lat
+        FROM reports_report
+        WHERE cluster_id IS NOT NULL
+        GROUP BY cluster_id
+    ) AS m ON m.cluster_id = c.id
+    WHERE m.cluster_id IS NULL
+       OR c.report_count <> m.report_count
+       OR abs(c.sum_lon - m.sum_lon) > %(tolerance)s * m.report_count
+       OR abs(c.sum_lat - m.sum_lat) > %(tolerance)s * m.report_count
+       OR abs(ST_X(c.centroid::geometry) - m.sum_lon / m.report_count)
+          > %(tolerance)s
+       OR abs(ST_Y(c.centroid::geometry) - m.sum_lat / m.report_count)
+          > %(tolerance)s
+    ORDER BY c.id
+"""
+
+
+def find_aggregate_drift(tolerance=1e-9):
+    """
+    Compare les agrégats stockés de chaque cluster à un recalcul complet.
+
+    Une seule requête groupée (LEFT JOIN sur les signalements). Retourne les
+    clusters incohérents, clusters vides compris : liste de dictionnaires
+    `pk`, `report_count` (stocké) et `expected_count` (membres réels).
+    Détecteur commun à check_cluster_aggregates et à integrity.sweep.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_AGGREGATE_DRIFT_SQL, {"tolerance": tolerance})
+        return [
+            {"pk": pk, "report_count": stored, "expected_count": members}
+            for pk, stored, members in cursor.fetchall()
+        ]
@@ -2,13 +2,24 @@
 Signaux Django pour le clustering automatique des signalements.
 
 - post_save : à la CRÉATION d'un Report, assigne automatiquement un cluster
-- post_delete : quand un Report est supprimé, recalcule ou supprime le cluster
+  (ou, en mode CLUSTERING_MODE = "deferred", crée une tâche pour le worker)
+- post_save : après l'upload, génère les miniatures de la photo (après
+  commit ; dans images.pool() pour les vues asynchrones)
+- post_delete : quand un Report est supprimé, retire ses coordonnées des
+  agrégats du cluster (O(1)) ou supprime le cluster devenu vide, et
+  invalide les tuiles en cache touchées par le centroïde
 """
 
+import logging
+
+from django.conf import settings
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import Report
+from .models import Report, ReportCluster
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Report)
@@ -17,20 +28,67 @@ def auto_cluster_on_create(sender, instance, created, **kwargs):
     if not created:
         return
 
+    from .jobs import enqueue_clustering, is_deferred
     from .services import assign_report_to_cluster
 
-    assign_report_to_cluster(instance)
+    if is_deferred():
+        enqueue_clustering(instance)
+    else:
+        assign_report_to_cluster(instance)
+
+
+@receiver(post_save, sender=Report)
+def generate_image_derivatives(sender, instance, created, **kwargs):
+    """Prépare miniature et aperçu de la photo, une fois le signalement validé en base."""
+    if not created or not instance.image:
+        return
+    if not settings.REPORT_IMAGE_DERIVATIVES_ON_UPLOAD:
+        return
+
+    from .images import derivatives_in_pool, generate_derivatives, pool
+
+    name = instance.image.name
+
+    def generate():
+        try:
+            generate_derivatives(name)
+        except (OSError, ValueError):
+            # Pas bloquant : le dérivé sera regénéré au premier affichage
+            logger.warning("Génération des miniatures impossible pour %s", name)
+
+    if derivatives_in_pool.get():
+        # Vue asynchrone : la réponse n'attend pas les miniatures
+        transaction.on_commit(lambda: pool().submit(generate))
+    else:
+        transaction.on_commit(generate)
 
 
 @receiver(post_delete, sender=Report)
 def update_cluster_on_delete(sender, instance, **kwargs):
-    """Recalcule ou supprime le cluster quand un signalement est supprimé."""
-    cluster = instance.cluster
-    if cluster is None:
+    """Retire le signalement des agrégats de son cluster (supprimé s'il devient vide)."""
+    if instance.cluster_id is None:
         return
 
-    # Si le cluster n'a plus de signalements, le supprimer
-    if cluster.reports.count() == 0:
-        cluster.delete()
-    else:
-        cluster.recalculate()
+    from .tilecache import invalidate_points
+
+    x, y = instance.location.x, instance.location.y
+    with transaction.atomic():
+        cluster = (
+            ReportCluster.objects.select_for_update()
+            .filter(pk=instance.cluster_id)
+            .values_list("sum_lon", "sum_lat", "report_count")
+            .first()
+        )
+        if cluster is None:
+            return
+        ReportCluster.apply_delta(instance.cluster_id, -x, -y, -1)
+
+    # Ancien centroïde, et nouveau s'il reste des membres (agrégats
+    # incohérents possibles : report_count déjà à 0)
+    sum_lon, sum_lat, count = cluster
+    points = []
+    if count:
+        points.append((sum_lon / count, sum_lat / count))
+    if count > 1:
+        points.append(((sum_lon - x) / (count - 1), (sum_lat - y) / (count - 1)))
+    invalidate_points(points)
@@ -0,0 +1,117 @@
+"""
+Statistiques précalculées des signalements (tableau de bord staff).
+
+La table ReportStat compte les signalements par (semaine, statut,
+catégorie, secteur). Elle est tenue à jour par des triggers PostgreSQL
+(migrations 0012, 0016) : les lectures ne parcourent jamais reports_report,
+leur coût dépend du nombre de semaines et de secteurs, pas du nombre de
+signalements.
+
+Chaque clé est répartie sur WRITE_SHARDS lignes au plus : un trigger met
+à jour la ligne de la partition de sa connexion, deux signalements
+simultanés d'un même secteur ne s'attendent donc presque jamais. Les
+lectures somment count par clé ; la table reste bornée (clés ×
+WRITE_SHARDS lignes), sans compactage.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ReportStat
+
+# Partitions d'écriture par clé (pg_backend_pid() % 16, migration 0016)
+WRITE_SHARDS = 16
+
+# Semaines affichées dans l'évolution du tableau de bord
+DASHBOARD_WEEKS = 12
+# Secteurs affichés (les plus signalés)
+DASHBOARD_SECTORS = 15
+
+# Même calcul que les triggers (fonctions SQL de la migration 0012)
+_REBUILD_SQL = """
+    INSERT INTO reports_reportstat (week, status, waste_type, sector, count)
+    SELECT reports_stat_week(created_at), status, type,
+           reports_stat_sector(location), COUNT(*)
+    FROM reports_report
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def week_start(value):
+    """Lundi de la semaine (fuseau du projet) d'une date-heure aware."""
+    day = timezone.localtime(value).date()
+    return day - timedelta(days=day.weekday())
+
+
+def rebuild():
+    """
+    Recalcule toute la table depuis reports_report, en une transaction.
+    Les écritures concurrentes sur les signalements attendent la fin du
+    recalcul (verrou SHARE) : leurs triggers s'appliquent ensuite.
+    """
+    start = time.perf_counter()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE reports_report IN SHARE MODE")
+        cursor.execute("DELETE FROM reports_reportstat")
+        cursor.execute(_REBUILD_SQL)
+        rows = cursor.rowcount
+    return {"rows": rows, "seconds": time.perf_counter() - start}
+
+
+def _totals(queryset, field):
+    return {
+        row[field]: row["n"]
+        for row in queryset.values(field).annotate(n=Sum("count")).order_by(field)
+        if row["n"]
+    }
+
+
+def counts_by_status_and_type():
+    """
+    Nombre de signalements par (statut, catégorie) : somme des partitions de
+    chaque clé, au plus clés × WRITE_SHARDS lignes lues.
+    """
+    return {
+        (row["status"], row["waste_type"]): row["n"]
+        for row in ReportStat.objects.values("status", "waste_type")
+        .annotate(n=Sum("count"))
+        .order_by()
+        if row["n"]
+    }
+
+
+def dashboard(status=None, waste_type=None, weeks=DASHBOARD_WEEKS):
+    """
+    Données du tableau de bord, filtrées par statut et catégorie : total,
+    répartitions par statut et par catégorie, évolution sur les `weeks`
+    dernières semaines (semaines sans signalement à 0) et secteurs les plus
+    signalés.
+    """
+    stats = ReportStat.objects.all()
+    if status:
+        stats = stats.filter(status=status)
+    if waste_type:
+        stats = stats.filter(waste_type=waste_type)
+
+    current = week_start(timezone.now())
+    first = current - timedelta(weeks=weeks - 1)
+    per_week = _totals(stats.filter(week__gte=first), "week")
+    sectors = _totals(stats.exclude(sector=""), "sector")
+
+    by_status = _totals(stats, "status")
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_type": _totals(stats, "waste_type"),
+        "by_week": [
+            (first + timedelta(weeks=i), per_week.get(first + timedelta(weeks=i), 0))
+            for i in range(weeks)
+        ],
+        "by_sector": sorted(sectors.items(), key=lambda item: -item[1])[
+            :DASHBOARD_SECTORS
+        ],
+    }
@@ -0,0 +1,244 @@
+"""
+Signalements synthétiques autour de Beauvais (benchmarks, jeux de données).
+
+Distributions spatiales :
+- uniform : points tirés uniformément dans l'emprise ;
+- hotspot : 80 % des points concentrés autour de quelques dépôts
+  récurrents (écart-type ~15 m, une catégorie par dépôt), le reste uniforme ;
+- chain : cas défavorable pour le clustering — chaînes de points espacés
+  de ~9 m (chaque point est à ≤ 10 m du précédent : le centroïde dérive,
+  les clusters grossissent et fusionnent sans cesse).
+
+Génération en flux (iter_points) : des millions de points sans les garder
+en mémoire. Insertion par bulk_create (insert_reports) ou par COPY
+(copy_reports, le plus rapide), sans signal : le clustering est déclenché
+ensuite par l'appelant.
+
+Les signalements générés partagent tous une même image (bulk.synthetic_image)
+et leur description commence par SYNTHETIC_PREFIX, pour pouvoir les supprimer.
+"""
+
+import io
+import math
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.utils import timezone
+
+from .bulk import backdate, synthetic_image
+from .geo import meters_per_degree
+from .models import Report
+
+DISTRIBUTIONS = ("uniform", "hotspot", "chain")
+
+# Emprise par défaut : Beauvais intra-muros et premiers quartiers
+DEFAULT_BOUNDS = (2.03, 49.40, 2.14, 49.46)
+
+SYNTHETIC_PREFIX = "[SYNTH]"
+
+# Pas des chaînes : juste sous la distance de clustering (10 m)
+CHAIN_STEP_M = 9.0
+_CHAIN_LENGTH = 50
+_HOTSPOT_SHARE = 0.8
+_HOTSPOT_SIGMA_M = 15.0
+
+
+def _offset(lon, lat, dx_m, dy_m):
+    """Point décalé de (dx, dy) mètres vers l'est et le nord."""
+    m_lon, m_lat = meters_per_degree(lat)
+    return lon + dx_m / m_lon, lat + dy_m / m_lat
+
+
+def _uniform(rng, n, bounds, pick):
+    lon_min, lat_min, lon_max, lat_max = bounds
+    for _ in range(n):
+        yield rng.uniform(lon_min, lon_max), rng.uniform(lat_min, lat_max), pick()
+
+
+def _hotspot(rng, n, bounds, pick):
+    # ~1 dépôt récurrent pour 200 signalements
+    spots = list(_uniform(rng, max(1, n // 200), bounds, pick))
+    for point in _uniform(rng, n, bounds, pick):
+        if rng.random() < _HOTSPOT_SHARE:
+            lon, lat, waste_type = rng.choice(spots)
+            lon, lat = _offset(
+                lon,
+                lat,
+                rng.gauss(0, _HOTSPOT_SIGMA_M),
+                rng.gauss(0, _HOTSPOT_SIGMA_M),
+            )
+            yield lon, lat, waste_type
+        else:
+            yield point
+
+
+def _chain(rng, n, bounds, pick):
+    lon_min, lat_min, lon_max, lat_max = bounds
+    produced = 0
+    while produced < n:
+        lon, lat, waste_type = next(_uniform(rng, 1, bounds, pick))
+        heading = rng.uniform(0, 2 * math.pi)
+        for _ in range(min(_CHAIN_LENGTH, n - produced)):
+            yield lon, lat, waste_type
+            produced += 1
+            # Marche presque rectiligne : le point suivant s'éloigne du cluster
+            heading += rng.gauss(0, 0.2)
+            lon, lat = _offset(
+                lon,
+                lat,
+                CHAIN_STEP_M * math.cos(heading),
+                CHAIN_STEP_M * math.sin(heading),
+            )
+            lon = min(max(lon, lon_min), lon_max)
+            lat = min(max(lat, lat_min), lat_max)
+
+
+_GENERATORS = {"uniform": _uniform, "hotspot": _hotspot, "chain": _chain}
+
+
+def parse_waste_mix(value):
+    """
+    "household=5,green=3" → {"household": 5.0, "green": 3.0}.
+    Lève ValueError si une catégorie est inconnue ou un poids invalide.
+    """
+    mix = {}
+    for item in value.split(","):
+        waste_type, _, weight = item.partition("=")
+        waste_type = waste_type.strip()
+        if waste_type not in Report.WasteType.values:
+            raise ValueError(f"Catégorie inconnue : {waste_type}")
+        mix[waste_type] = float(weight or 1)
+        if mix[waste_type] < 0:
+            raise ValueError(f"Poids négatif pour {waste_type}")
+    if not any(mix.values()):
+        raise ValueError("Au moins une catégorie doit avoir un poids positif")
+    return mix
+
+
+def iter_points(
+    n, distribution="uniform", seed=0, bounds=DEFAULT_BOUNDS, waste_mix=None
+):
+    """
+    Génère `n` tuples (lon, lat, waste_type) selon la distribution donnée,
+    en flux. `waste_mix` : poids par catégorie (défaut : équiprobables).
+    Déterministe pour une graine donnée.
+    """
+    if distribution not in _GENERATORS:
+        raise ValueError(f"Distribution inconnue : {distribution}")
+    rng = random.Random(seed)
+    if waste_mix:
+        types, weights = list(waste_mix), list(waste_mix.values())
+
+        def pick():
+            return rng.choices(types, weights)[0]
+
+    else:
+        types = list(Report.WasteType.values)
+
+        def pick():
+            return rng.choice(types)
+
+    return _GENERATORS[distribution](rng, n, bounds, pick)
+
+
+def generate_points(n, distribution="uniform", seed=0, bounds=DEFAULT_BOUNDS):
+    """Liste de `n` tuples (lon, lat, waste_type) — voir iter_points."""
+    return list(iter_points(n, distribution, seed, bounds))
+
+
+def iter_dates(n, days, seed=0, end=None):
+    """
+    `n` dates croissantes réparties sur les `days` jours précédant `end`
+    (maintenant par défaut) : l'ordre de création est celui des points.
+    """
+    rng = random.Random(seed)
+    end = end or timezone.now()
+    step = timedelta(days=days) / max(n, 1)
+    start = end - timedelta(days=days)
+    for i in range(n):
+        yield start + step * (i + rng.random())
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _description(waste_type):
+    return f"{SYNTHETIC_PREFIX} dépôt {waste_type} simulé"
+
+
+def synthetic_report(lon, lat, waste_type, image=None):
+    """Signalement synthétique non enregistré (image neutre par défaut)."""
+    return Report(
+        description=_description(waste_type),
+        type=waste_type,
+        location=Point(lon, lat, srid=4326),
+        image=image or synthetic_image(),
+    )
+
+
+# =============================================================================
+# INSERTION
+# =============================================================================
+def insert_reports(points, dates=None, batch_size=5000):
+    """
+    Insère les points avec bulk_create, par lots (aucun signal : pas de
+    clustering). `dates` : dates de création, dans l'ordre des points (sinon
+    maintenant). Retourne le nombre de signalements insérés.
+    """
+    image = synthetic_image()
+    rows = zip(points, dates) if dates is not None else ((p, None) for p in points)
+    total = 0
+    for batch in _batches(rows, batch_size):
+        created = Report.objects.bulk_create(
+            [
+                synthetic_report(lon, lat, waste_type, image)
+                for (lon, lat, waste_type), _ in batch
+            ]
+        )
+        if dates is not None:
+            backdate(created, [date for _, date in batch])
+        total += len(created)
+    return total
+
+
+def copy_reports(points, dates=None, batch_size=50000):
+    """
+    Insère les points avec COPY FROM STDIN (le plus rapide : plusieurs
+    centaines de milliers de lignes par seconde). Même contrat que
+    insert_reports ; retourne le nombre de signalements insérés.
+    """
+    image = synthetic_image()
+    now = timezone.now()
+    rows = zip(points, dates) if dates is not None else ((p, now) for p in points)
+    columns = "(image, description, type, location, status, created_at, updated_at)"
+    sql = f"COPY reports_report {columns} FROM STDIN"
+    total = 0
+    with connection.cursor() as cursor:
+        for batch in _batches(rows, batch_size):
+            buf = io.StringIO()
+            for (lon, lat, waste_type), date in batch:
+                created_at = date.isoformat()
+                buf.write(
+                    f"{image}\t{_description(waste_type)}\t{waste_type}\t"
+                    f"SRID=4326;POINT({lon!r} {lat!r})\t"
+                    f"{Report.Status.PENDING.value}\t{created_at}\t{created_at}\n"
+                )
+            buf.seek(0)
+            _copy(cursor.cursor, sql, buf)
+            total += len(batch)
+    return total
+
+
+def _copy(raw_cursor, sql, buf):
+    """COPY … FROM STDIN avec psycopg2 (copy_expert) ou psycopg 3 (copy)."""
+    if hasattr(raw_cursor, "copy_expert"):
+        raw_cursor.copy_expert(sql, buf)
+    else:
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buf.getvalue())
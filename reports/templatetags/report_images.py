@@ -0,0 +1,19 @@
+"""
+Filtres de template pour les images des signalements.
+
+Usage :
+    {% load report_images %}
+    <img src="{{ report.image|derivative:'thumb' }}">
+"""
+
+from django import template
+
+from reports.images import derivative_url
+
+register = template.Library()
+
+
+@register.filter
+def derivative(image, kind):
+    """URL de la version réduite `kind` (thumb, medium) d'un ImageField."""
+    return derivative_url(image, kind)
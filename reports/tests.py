@@ -5,20 +5,109 @@ Couverture :
 - ReportCluster : méthodes recalculate_*
 - services.merge_clusters : fusion de clusters
 - services.assign_report_to_cluster : 0 / 1 / 2+ clusters proches
+- services.lock_cells / lock_categories / stress_clustering : verrous par
+  cellule et par catégorie, écritures et lots parallèles
+- services.rebuild_clusters : mêmes clusters que le chemin incrémental
+- colonnes Lambert-93 : triggers, clustering plan (CLUSTERING_GEOMETRY)
+- services.assign_reports_to_clusters : lots importés sans post_save
+- services.delete_reports : suppression en masse, re-découpage des clusters
+- services.recompute_clusters : recalcul ensembliste (action admin, commande)
+- integrity / sweep_integrity : orphelins, agrégats périmés, admin en lecture
+- centroid_index : présélection par instantané mmap, repli si périmé
+- ReportCluster.apply_delta : agrégats O(1) (ajout, suppression, réparation)
+- jobs : clustering différé (file, worker, tentatives)
+- images : miniatures et aperçus dérivés des photos
+- ReportForm : normalisation de la photo à l'upload (EXIF, taille, budget)
 - Vue create_report : accès, validation, soumission
-- Vue report_list : contrôle d'accès staff
+- Vue report_list : contrôle d'accès staff, pagination par curseur, compteurs
+- async_views : formulaire et liste asynchrones (ASGI), middleware de mesure
+- stats / tableau de bord : ReportStat tenu à jour par triggers (upserts
+  par partition, nombre de lignes borné), reconstruction
+- API cartographique : GeoJSON par emprise/zoom, tuiles MVT, ETag / 304
+- heatmap : grilles de densité par zoom, rafraîchissement incrémental
+- tilecache : cache des réponses, invalidation des seules tuiles touchées
+- audit_cluster_queries : plans d'exécution sans Seq Scan
+- synthetic / benchmark_clustering : jeux synthétiques et mesures JSON
+- seed_reports : insertion en masse (COPY, bulk_create) puis clustering
+- import_reports : import CSV / GeoJSON en flux, validation et rejets
+- export : export en flux (vue staff, export_reports), filtres et reprise
+- metrics : middleware d'instrumentation, Server-Timing, sortie Prometheus,
+  requêtes lentes
+- dbpool / benchmark_connections : connexions persistantes, pool, statistiques
 """
 
+import json
+import shutil
 import struct
+import tempfile
 import zlib
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import Point
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
 
-from .models import Report, ReportCluster
+from . import (
+    async_views,
+    bulk,
+    centroid_index,
+    dbpool,
+    export,
+    heatmap,
+    importer,
+    integrity,
+    metrics,
+    stats,
+    synthetic,
+    tilecache,
+)
+from .clustering import ClusterEngine
+from .forms import ReportForm
+from .geo import BEAUVAIS_BOUNDS, distance_m, meters_per_degree, sector_for_point
+from .images import (
+    derivative_name,
+    derivative_url,
+    generate_derivatives,
+    render_derivative,
+)
+from .jobs import claim_jobs, process_clustering_jobs, queue_depth
+from .models import L93_SRID, ClusteringJob, Report, ReportCluster, ReportStat
+from .services import (
+    CLUSTER_DISTANCE_M,
+    assign_report_to_cluster,
+    assign_reports_to_clusters,
+    category_lock_key,
+    cell_lock_key,
+    delete_reports,
+    find_aggregate_drift,
+    lock_categories,
+    lock_cells,
+    rebuild_clusters,
+    recompute_clusters,
+)
 
 
 # =============================================================================
@@ -40,6 +129,15 @@ def _make_png():
     return sig + ihdr + idat + iend
 
 
+def _make_jpeg(width=1200, height=900, exif=None):
+    """Photo JPEG de test (dimensions réalistes, générée avec Pillow)."""
+    buf = BytesIO()
+    Image.new("RGB", (width, height), (120, 160, 60)).save(
+        buf, "JPEG", exif=exif or Image.Exif()
+    )
+    return buf.getvalue()
+
+
 def make_report(lat=49.430, lon=2.082, waste_type="household"):
     """Crée et sauvegarde un Report minimal avec image PNG factice."""
     r = Report(
@@ -56,6 +154,18 @@ def make_report(lat=49.430, lon=2.082, waste_type="household"):
     return r
 
 
+class TempMediaMixin:
+    """MEDIA_ROOT temporaire, supprimé après chaque test (photos, fichiers écrits)."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
 # =============================================================================
 # MODÈLE : ReportCluster
 # =============================================================================
@@ -145,6 +255,718 @@ class AssignReportToClusterTest(TestCase):
         self.assertEqual(ReportCluster.objects.count(), 2)
 
 
+class CellLocksTest(TestCase):
+    """Verrous consultatifs sur les cellules voisines du signalement."""
+
+    def test_keys_by_cell_and_waste_type(self):
+        keys = {
+            cell_lock_key(waste_type, row, col)
+            for waste_type in ("household", "green")
+            for row, col in ((0, 0), (0, 1), (-1, 0), (551000, 15000))
+        }
+        self.assertEqual(len(keys), 8)
+        self.assertTrue(all(0 < key < 2**63 for key in keys))
+        # Verrou de catégorie pris avant les cellules (ordre des clés)
+        self.assertLess(category_lock_key("green"), min(keys))
+
+    def test_bulk_paths_lock_categories_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            lock_categories(["green", "household", "green"])
+        self.assertEqual(len(queries), 1)
+        self.assertIn("pg_advisory_xact_lock", queries[0]["sql"])
+
+    def test_one_query_per_report(self):
+        with CaptureQueriesContext(connection) as queries:
+            lock_cells(2.082, 49.430, "household")
+        self.assertEqual(len(queries), 1)
+        self.assertIn("pg_advisory_xact_lock", queries[0]["sql"])
+        with override_settings(CLUSTER_CELL_LOCKS=False):
+            with CaptureQueriesContext(connection) as queries:
+                lock_cells(2.082, 49.430, "household")
+        self.assertEqual(len(queries), 0)
+
+
+class StressClusteringTest(TempMediaMixin, TransactionTestCase):
+    """Écritures parallèles (une connexion par thread) sur les mêmes dépôts."""
+
+    def test_one_cluster_per_spot(self):
+        out = StringIO()
+        call_command(
+            "stress_clustering",
+            "--writers",
+            "4",
+            "--reports",
+            "40",
+            "--spots",
+            "2",
+            stdout=out,
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["clusters"], 2)
+        self.assertEqual(result["duplicate_clusters"], 0)
+        self.assertGreater(result["reports_per_second"], 0)
+        self.assertEqual(result["create_ms"]["count"], 40)
+        # Données supprimées à la fin
+        self.assertFalse(Report.objects.exists())
+        self.assertFalse(ReportCluster.objects.exists())
+
+    def test_parallel_batches_on_same_spots(self):
+        out = StringIO()
+        call_command(
+            "stress_clustering",
+            "--batch",
+            "--writers",
+            "2",
+            "--reports",
+            "40",
+            "--spots",
+            "2",
+            stdout=out,
+        )
+        result = json.loads(out.getvalue())
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(result["batch_ms"]["count"], 2)
+        self.assertEqual(result["clusters"], 2)
+        self.assertEqual(result["duplicate_clusters"], 0)
+        self.assertFalse(Report.objects.exists())
+
+
+# =============================================================================
+# AGRÉGATS INCRÉMENTAUX : ReportCluster.apply_delta
+# =============================================================================
+
+
+class ClusterAggregatesTest(TestCase):
+    """Les sommes stockées suivent les ajouts et suppressions sans recalcul complet."""
+
+    def test_join_updates_sums_and_centroid(self):
+        r1 = make_report(lat=49.43000, lon=2.08200)
+        make_report(lat=49.43002, lon=2.08202)
+        cluster = ReportCluster.objects.get(pk=r1.cluster_id)
+        self.assertEqual(cluster.report_count, 2)
+        self.assertAlmostEqual(cluster.sum_lon, 2.08200 + 2.08202, places=9)
+        self.assertAlmostEqual(cluster.centroid.x, 2.08201, places=9)
+        self.assertAlmostEqual(cluster.centroid.y, 49.43001, places=9)
+
+    def test_delete_removes_report_from_aggregates(self):
+        r1 = make_report(lat=49.43000, lon=2.08200)
+        r2 = make_report(lat=49.43002, lon=2.08202)
+        r2.delete()
+        cluster = ReportCluster.objects.get(pk=r1.cluster_id)
+        self.assertEqual(cluster.report_count, 1)
+        self.assertAlmostEqual(cluster.centroid.x, 2.08200, places=9)
+
+    def test_deleting_last_report_deletes_cluster(self):
+        make_report().delete()
+        self.assertEqual(ReportCluster.objects.count(), 0)
+
+    def test_delete_with_zero_stored_count(self):
+        report = make_report()
+        ReportCluster.objects.update(report_count=0)
+        report.delete()
+        self.assertEqual(ReportCluster.objects.count(), 0)
+
+    def test_repair_command_fixes_drift(self):
+        r1 = make_report()
+        make_report()
+        ReportCluster.objects.filter(pk=r1.cluster_id).update(report_count=7)
+        self.assertEqual(
+            find_aggregate_drift(),
+            [{"pk": r1.cluster_id, "report_count": 7, "expected_count": 2}],
+        )
+        with self.assertRaises(CommandError):
+            call_command("check_cluster_aggregates", stdout=StringIO())
+        call_command("check_cluster_aggregates", "--fix", stdout=StringIO())
+        self.assertEqual(find_aggregate_drift(), [])
+        self.assertEqual(ReportCluster.objects.get(pk=r1.cluster_id).report_count, 2)
+
+
+# =============================================================================
+# SERVICE : rebuild_clusters (reclustering en masse)
+# =============================================================================
+
+# 9 m vers l'est ≈ 0.000123° de longitude à 49°N
+_STEP_9M = 0.000123
+
+
+def _partition():
+    """Ensemble des groupes de signalements (indépendant des pk des clusters)."""
+    groups = {}
+    for pk, cluster_id in Report.objects.values_list("pk", "cluster_id"):
+        groups.setdefault(cluster_id, set()).add(pk)
+    return {frozenset(g) for g in groups.values()}
+
+
+class ClusterEngineTest(TestCase):
+    """Moteur en mémoire : mêmes règles que assign_report_to_cluster."""
+
+    def test_close_points_share_a_cluster(self):
+        engine = ClusterEngine(distance=10)
+        a = engine.add(1, 2.08200, 49.43000, "household")
+        b = engine.add(2, 2.08201, 49.43001, "household")
+        self.assertIs(a, b)
+        self.assertEqual(a.report_count, 2)
+
+    def test_waste_types_are_not_mixed(self):
+        engine = ClusterEngine(distance=10)
+        engine.add(1, 2.082, 49.430, "household")
+        engine.add(2, 2.082, 49.430, "green")
+        self.assertEqual(len(engine.clusters), 2)
+
+    def test_bridging_point_merges_into_oldest(self):
+        engine = ClusterEngine(distance=10)
+        first = engine.add(1, 2.08200, 49.430, "household")
+        engine.add(2, 2.08200 + 2 * _STEP_9M, 49.430, "household")  # ~18 m
+        merged = engine.add(
+            3, 2.08200 + _STEP_9M, 49.430, "household"
+        )  # entre les deux
+        self.assertIs(merged, first)
+        self.assertEqual(len(engine.clusters), 1)
+        self.assertEqual(sorted(merged.report_ids), [1, 2, 3])
+
+
+class RebuildClustersTest(TestCase):
+    """rebuild_clusters() doit produire exactement les clusters du chemin incrémental."""
+
+    def setUp(self):
+        # Chaîne de points espacés de ~9 m (cas adverse pour le clustering)
+        for i in range(8):
+            make_report(lat=49.430, lon=2.082 + i * _STEP_9M)
+        # Doublons proches, autre catégorie au même endroit, point isolé
+        make_report(lat=49.44000, lon=2.09000)
+        make_report(lat=49.44001, lon=2.09001)
+        make_report(lat=49.44000, lon=2.09000, waste_type="green")
+        make_report(lat=49.50000, lon=2.10000)
+
+    def test_same_partition_as_incremental(self):
+        expected = _partition()
+        rebuild_clusters()
+        self.assertEqual(_partition(), expected)
+        self.assertEqual(ReportCluster.objects.count(), len(expected))
+
+    def test_cluster_metadata(self):
+        stats = rebuild_clusters()
+        self.assertEqual(stats["reports"], 12)
+        for cluster in ReportCluster.objects.all():
+            self.assertEqual(cluster.report_count, cluster.reports.count())
+            self.assertEqual(
+                set(cluster.reports.values_list("type", flat=True)),
+                {cluster.waste_type},
+            )
+
+
+class Lambert93Test(TestCase):
+    """Colonnes Lambert-93 tenues par trigger ; clustering en calcul plan."""
+
+    def _assert_projected(self, geography, projected):
+        expected = geography.transform(L93_SRID, clone=True)
+        self.assertEqual(projected.srid, L93_SRID)
+        self.assertAlmostEqual(projected.x, expected.x, places=2)
+        self.assertAlmostEqual(projected.y, expected.y, places=2)
+
+    def test_columns_follow_every_write_path(self):
+        report = make_report()
+        synthetic.insert_reports([(2.09, 49.44, "green")])
+        for obj in Report.objects.all():
+            self._assert_projected(obj.location, obj.location_l93)
+
+        cluster = ReportCluster.objects.get()
+        self._assert_projected(cluster.centroid, cluster.centroid_l93)
+        ReportCluster.apply_delta(cluster.pk, 2.083, 49.431, 1)
+        cluster.refresh_from_db()
+        self._assert_projected(cluster.centroid, cluster.centroid_l93)
+
+        Report.objects.filter(pk=report.pk).update(
+            location=Point(2.1, 49.45, srid=4326)
+        )
+        report.refresh_from_db()
+        self._assert_projected(report.location, report.location_l93)
+
+    @override_settings(CLUSTERING_GEOMETRY="l93")
+    def test_same_partition_as_geography(self):
+        for i in range(8):
+            make_report(lat=49.430, lon=2.082 + i * _STEP_9M)
+        make_report(lat=49.44000, lon=2.09000)
+        make_report(lat=49.44001, lon=2.09001)
+        make_report(lat=49.44000, lon=2.09000, waste_type="green")
+        planar = _partition()
+        # Reconstruction en mémoire : distances du sphéroïde (geo.distance_m)
+        rebuild_clusters()
+        self.assertEqual(_partition(), planar)
+
+        Report.objects.update(cluster=None)
+        ReportCluster.objects.all().delete()
+        assign_reports_to_clusters(Report.objects.all())
+        self.assertEqual(_partition(), planar)
+
+    def test_benchmark_compares_geometries(self):
+        out = StringIO()
+        call_command(
+            "benchmark_clustering",
+            "--sizes=20",
+            "--distributions=uniform",
+            "--samples=3",
+            "--list-runs=1",
+            "--geometries=geography,l93",
+            stdout=out,
+            stderr=StringIO(),
+        )
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual([r["geometry"] for r in results], ["geography", "l93"])
+        self.assertEqual(results[1]["nearby_ms"]["count"], 3)
+
+
+class AssignReportsToClustersTest(TestCase):
+    """Lot de signalements importés sans signal : même résultat que un par un."""
+
+    def setUp(self):
+        # Existant : début d'une chaîne, et deux clusters à ~18 m l'un de l'autre
+        for i in range(3):
+            make_report(lat=49.430, lon=2.082 + i * _STEP_9M)
+        make_report(lat=49.440, lon=2.090)
+        make_report(lat=49.440, lon=2.090 + 2 * _STEP_9M)
+        # Lot importé (bulk_create : aucun clustering) : suite de la chaîne,
+        # point qui relie les deux clusters existants, doublons internes au lot
+        synthetic.insert_reports(
+            [(2.082 + i * _STEP_9M, 49.430, "household") for i in range(3, 8)]
+            + [(2.090 + _STEP_9M, 49.440, "household")]
+            + [(2.100, 49.450, "green"), (2.10001, 49.45001, "green")]
+        )
+
+    def _batch(self):
+        return list(Report.objects.filter(cluster__isnull=True))
+
+    def test_same_partition_as_sequential_assignment(self):
+        stats = assign_reports_to_clusters(self._batch())
+        self.assertEqual(stats["reports"], 8)
+        self.assertEqual(stats["merged"], 1)
+        batched = _partition()
+        rebuild_clusters()  # = assign_report_to_cluster dans l'ordre de création
+        self.assertEqual(batched, _partition())
+
+    def test_aggregates_are_consistent(self):
+        assign_reports_to_clusters(self._batch())
+        self.assertFalse(Report.objects.filter(cluster__isnull=True).exists())
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_already_clustered_reports_are_ignored(self):
+        stats = assign_reports_to_clusters(list(Report.objects.all()))
+        self.assertEqual(stats["reports"], 8)
+        self.assertEqual(assign_reports_to_clusters(self._batch())["reports"], 0)
+
+
+class DeleteReportsTest(TestCase):
+    def _east(self, meters, lat=49.430, lon=2.082):
+        """Signalement à `meters` mètres à l'est du point de référence."""
+        return make_report(lat=lat, lon=lon + meters / meters_per_degree(lat)[0])
+
+    def test_bulk_delete_updates_each_cluster_once(self):
+        kept = [self._east(0), self._east(2)]
+        removed = [self._east(4), self._east(1)]
+        lone = make_report(lat=49.440)
+        stats = delete_reports(
+            Report.objects.filter(pk__in=[r.pk for r in removed + [lone]])
+        )
+        self.assertEqual(stats["deleted"], 3)
+        self.assertEqual(stats["clusters_updated"], 1)
+        self.assertEqual(stats["clusters_deleted"], 1)
+        cluster = ReportCluster.objects.get()
+        self.assertEqual(cluster.report_count, 2)
+        self.assertEqual(set(cluster.reports.all()), set(kept))
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_resplit_when_bridge_is_deleted(self):
+        # A (0 m) puis B (9 m) : centroïde à 4,5 m ; C (13 m) est à 8,5 m du
+        # centroïde et rejoint le cluster. Sans B, A et C sont à 13 m.
+        a, bridge, c = self._east(0), self._east(9), self._east(13)
+        self.assertEqual(ReportCluster.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = delete_reports(Report.objects.filter(pk=bridge.pk), resplit=True)
+        self.assertEqual(stats["clusters_created"], 1)
+        a.refresh_from_db()
+        c.refresh_from_db()
+        self.assertNotEqual(a.cluster_id, c.cluster_id)
+        self.assertEqual(a.cluster.report_count, 1)
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_no_resplit_by_default(self):
+        self._east(0)
+        bridge = self._east(9)
+        self._east(13)
+        delete_reports(Report.objects.filter(pk=bridge.pk))
+        self.assertEqual(ReportCluster.objects.get().report_count, 2)
+
+
+class RecomputeClustersTest(TestCase):
+    def setUp(self):
+        self.reports = [make_report(lon=2.082 + i * 0.001) for i in range(3)]
+        # Agrégats corrompus et cluster vide
+        ReportCluster.objects.update(
+            report_count=7, sum_lon=0, sum_lat=0, waste_type="green"
+        )
+        self.empty = ReportCluster.objects.create(
+            centroid=Point(2.09, 49.43, srid=4326), report_count=1, sum_lon=2.09
+        )
+
+    def test_recompute_repairs_and_deletes_empty(self):
+        stats = recompute_clusters(ReportCluster.objects.all())
+        self.assertEqual(stats, {**stats, "clusters": 4, "updated": 3, "deleted": 1})
+        self.assertFalse(ReportCluster.objects.filter(pk=self.empty.pk).exists())
+        self.assertEqual(
+            set(ReportCluster.objects.values_list("waste_type", flat=True)),
+            {"household"},
+        )
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_admin_action_reports_timing(self):
+        User.objects.create_superuser("admin", password="pass")
+        self.client.login(username="admin", password="pass")
+        response = self.client.post(
+            reverse("admin:reports_reportcluster_changelist"),
+            {
+                "action": "recalculer_clusters",
+                "_selected_action": list(
+                    ReportCluster.objects.values_list("pk", flat=True)
+                ),
+            },
+            follow=True,
+        )
+        message = str(list(response.context["messages"])[0])
+        self.assertIn("3 cluster(s) recalculé(s), 1 vide(s) supprimé(s)", message)
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_command_in_batches(self):
+        out = StringIO()
+        call_command("recompute_clusters", "--batch-size=2", stdout=out)
+        self.assertIn("3 cluster(s) recalculé(s)", out.getvalue())
+        self.assertEqual(find_aggregate_drift(), [])
+
+
+class IntegritySweepTest(TestCase):
+    def setUp(self):
+        self.report = make_report()
+        self.cluster = self.report.cluster
+
+    def _orphan(self):
+        # Contrainte de clé étrangère différée : l'orphelin doit être réparé
+        # avant la fin du test
+        Report.objects.filter(pk=self.report.pk).update(cluster_id=999999)
+
+    def test_orphan_is_detached_and_reclustered(self):
+        self._orphan()
+        stats = integrity.sweep()
+        self.assertEqual(stats["orphan_reports"], 1)
+        self.assertEqual(stats["empty_clusters"], 1)
+        self.assertEqual((stats["detached"], stats["reclustered"]), (1, 1))
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.cluster.report_count, 1)
+        self.assertEqual(
+            integrity.find_issues(),
+            {"orphan_reports": [], "stale_clusters": [], "empty_clusters": []},
+        )
+
+    def test_command_dry_run_then_fix(self):
+        ReportCluster.objects.update(report_count=5)
+        out = StringIO()
+        call_command("sweep_integrity", "--dry-run", stdout=out)
+        self.assertIn("1 cluster(s) périmé(s)", out.getvalue())
+        self.assertEqual(ReportCluster.objects.get().report_count, 5)
+
+        call_command("sweep_integrity", stdout=StringIO())
+        self.assertEqual(ReportCluster.objects.get().report_count, 1)
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_admin_changelist_is_read_only(self):
+        self._orphan()
+        User.objects.create_superuser("admin", password="pass")
+        self.client.login(username="admin", password="pass")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:reports_report_changelist"))
+        self.assertContains(response, "⚠ orphelin (#999999)")
+        self.assertFalse(
+            [q["sql"] for q in queries if q["sql"].startswith('UPDATE "reports_')]
+        )
+        integrity.sweep()
+
+
+# =============================================================================
+# INDEX DES CENTROÏDES
+# =============================================================================
+
+
+class CentroidIndexTest(TestCase):
+    """Présélection par instantané, confirmation en base, repli si périmé."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = str(Path(tmp) / "centroids.bin")
+        override = override_settings(CENTROID_INDEX_PATH=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _build(self):
+        return centroid_index.build(CLUSTER_DISTANCE_M)
+
+    def test_snapshot_candidates(self):
+        near = make_report(lat=49.43000, lon=2.08200).cluster
+        make_report(lat=49.43000, lon=2.08200, waste_type="green")
+        make_report(lat=49.50000, lon=2.10000)
+        self.assertEqual(self._build()["clusters"], 3)
+
+        snapshot = centroid_index.Snapshot(self.path)
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(
+            snapshot.candidates(2.08201, 49.43001, "household", CLUSTER_DISTANCE_M),
+            [near.pk],
+        )
+        self.assertEqual(
+            snapshot.candidates(2.08300, 49.43000, "household", CLUSTER_DISTANCE_M),
+            [],
+        )
+
+    def test_assignment_uses_index(self):
+        r1 = make_report(lat=49.43000, lon=2.08200)
+        self._build()
+        hits = centroid_index.stats()["hits"]
+        with mock.patch("reports.services.nearby_clusters") as db_path:
+            r2 = make_report(lat=49.43001, lon=2.08201)
+        db_path.assert_not_called()
+        self.assertEqual(centroid_index.stats()["hits"], hits + 1)
+        self.assertEqual(Report.objects.get(pk=r2.pk).cluster_id, r1.cluster_id)
+        self.assertEqual(ReportCluster.objects.get().report_count, 2)
+
+    def test_cluster_created_after_snapshot_is_found(self):
+        self._build()
+        r1 = make_report(lat=49.43000, lon=2.08200)
+        r2 = make_report(lat=49.43001, lon=2.08201)
+        self.assertEqual(ReportCluster.objects.count(), 1)
+        self.assertEqual(Report.objects.get(pk=r2.pk).cluster_id, r1.cluster_id)
+
+    def test_stale_snapshot_falls_back_to_database(self):
+        report = make_report()
+        self._build()
+        location = report.location
+        self.assertIsNotNone(
+            centroid_index.locked_nearby(location, "household", CLUSTER_DISTANCE_M)
+        )
+
+        # Traitement en masse : nouvelle génération
+        rebuild_clusters()
+        self.assertIsNone(
+            centroid_index.locked_nearby(location, "household", CLUSTER_DISTANCE_M)
+        )
+        make_report(lat=49.43001, lon=2.08201)
+        self.assertEqual(ReportCluster.objects.get().report_count, 2)
+
+        self._build()
+        with override_settings(CENTROID_INDEX_MAX_AGE=-1):
+            self.assertIsNone(
+                centroid_index.locked_nearby(location, "household", CLUSTER_DISTANCE_M)
+            )
+
+    def test_command(self):
+        make_report()
+        out = StringIO()
+        call_command("refresh_centroid_index", stdout=out)
+        self.assertIn("1 centroïde(s)", out.getvalue())
+        with override_settings(CENTROID_INDEX_PATH=""):
+            self.assertIsNone(centroid_index.current())
+            with self.assertRaises(CommandError):
+                call_command("refresh_centroid_index", stdout=StringIO())
+
+
+# =============================================================================
+# FILE DE CLUSTERING DIFFÉRÉ
+# =============================================================================
+
+
+@override_settings(CLUSTERING_MODE="deferred")
+class DeferredClusteringTest(TestCase):
+    """En mode différé, la création ne fait qu'ajouter une tâche à la file."""
+
+    def test_create_enqueues_without_clustering(self):
+        r = make_report()
+        self.assertIsNone(Report.objects.get(pk=r.pk).cluster_id)
+        self.assertEqual(queue_depth()["pending"], 1)
+
+    def test_worker_clusters_and_empties_queue(self):
+        r1 = make_report(lat=49.43000, lon=2.08200)
+        r2 = make_report(lat=49.43001, lon=2.08201)
+        stats = process_clustering_jobs()
+        self.assertEqual(stats["done"], 2)
+        self.assertFalse(ClusteringJob.objects.exists())
+        c1 = Report.objects.get(pk=r1.pk).cluster_id
+        self.assertIsNotNone(c1)
+        self.assertEqual(Report.objects.get(pk=r2.pk).cluster_id, c1)
+
+    def test_batch_takes_category_lock(self):
+        make_report(waste_type="green")
+        with CaptureQueriesContext(connection) as queries:
+            process_clustering_jobs()
+        locks = [q["sql"] for q in queries if "pg_advisory_xact_lock" in q["sql"]]
+        self.assertEqual(len(locks), 1)
+
+    def test_reports_changed_after_claim_are_skipped(self):
+        gone = make_report(lat=49.43000, lon=2.08200)
+        clustered = make_report(lat=49.50000, lon=2.10000)
+
+        def claim_then_change(batch_size):
+            jobs = claim_jobs(batch_size)
+            # Entre la réservation et le traitement : une suppression (la
+            # tâche part en cascade) et un clustering par un autre chemin
+            Report.objects.filter(pk=gone.pk).delete()
+            assign_report_to_cluster(Report.objects.get(pk=clustered.pk))
+            return jobs
+
+        with mock.patch("reports.jobs.claim_jobs", side_effect=claim_then_change):
+            self.assertEqual(process_clustering_jobs()["done"], 1)
+        self.assertFalse(ClusteringJob.objects.exists())
+        cluster = ReportCluster.objects.get()
+        self.assertEqual(cluster.report_count, 1)
+        self.assertEqual(cluster.reports.get().pk, clustered.pk)
+
+    def test_batch_failure_falls_back_to_one_job_at_a_time(self):
+        make_report(lat=49.43000, lon=2.08200)
+        make_report(lat=49.50000, lon=2.10000)
+        with mock.patch(
+            "reports.jobs.assign_reports_to_clusters", side_effect=RuntimeError("lot")
+        ):
+            self.assertEqual(process_clustering_jobs()["done"], 2)
+        self.assertFalse(Report.objects.filter(cluster__isnull=True).exists())
+
+    def test_failure_is_retried_then_marked_failed(self):
+        make_report()
+        with (
+            mock.patch(
+                "reports.jobs.assign_reports_to_clusters",
+                side_effect=RuntimeError("lot"),
+            ),
+            mock.patch(
+                "reports.jobs.assign_report_to_cluster",
+                side_effect=RuntimeError("boom"),
+            ),
+        ):
+            self.assertEqual(process_clustering_jobs(max_attempts=2)["retried"], 1)
+            job = ClusteringJob.objects.get()
+            self.assertEqual(job.attempts, 1)
+            self.assertIn("boom", job.last_error)
+
+            # Pas de nouvelle tentative avant l'échéance
+            self.assertEqual(process_clustering_jobs(max_attempts=2)["retried"], 0)
+            ClusteringJob.objects.update(run_after=job.created_at)
+            self.assertEqual(process_clustering_jobs(max_attempts=2)["failed"], 1)
+
+        self.assertEqual(queue_depth()["failed"], 1)
+        self.assertEqual(queue_depth()["pending"], 0)
+
+
+# =============================================================================
+# IMAGES DÉRIVÉES
+# =============================================================================
+
+
+@override_settings(REPORT_IMAGE_DERIVATIVES_ON_UPLOAD=False)
+class ImageDerivativesTest(TempMediaMixin, TestCase):
+    """Miniatures/aperçus générés à côté de l'original, jamais plus grands que demandé."""
+
+    def setUp(self):
+        super().setUp()
+        self.report = Report(
+            description="Photo", type="household", location=Point(2.082, 49.43)
+        )
+        self.report.image.save(
+            "depot.jpg", SimpleUploadedFile("depot.jpg", _make_jpeg()), save=False
+        )
+        self.report.save()
+
+    def test_derivative_name_sits_next_to_original(self):
+        self.assertEqual(
+            derivative_name("reports/depot.jpg", "thumb", "WEBP"),
+            "reports/depot.thumb.webp",
+        )
+
+    def test_generate_resizes_each_variant(self):
+        self.assertEqual(generate_derivatives(self.report.image.name), 2)
+        for kind, max_side in (("thumb", 160), ("medium", 1024)):
+            path = Path(self.media_root) / derivative_name(self.report.image.name, kind)
+            with Image.open(path) as img:
+                self.assertEqual(max(img.size), max_side)
+        # Deuxième passage : rien à refaire
+        self.assertEqual(generate_derivatives(self.report.image.name), 0)
+
+    def test_failed_save_leaves_no_temporary_file(self):
+        def partial_save(img, path, **kwargs):
+            Path(path).write_bytes(b"RIFF")
+            raise OSError("disque plein")
+
+        src = Path(self.media_root) / self.report.image.name
+        dst = src.with_name("depot.thumb.webp")
+        with mock.patch.object(Image.Image, "save", partial_save):
+            with self.assertRaises(OSError):
+                render_derivative(str(src), str(dst), 160, "WEBP", 80)
+        self.assertEqual(sorted(p.name for p in src.parent.iterdir()), ["depot.jpg"])
+
+    def test_url_generates_missing_derivative_lazily(self):
+        url = derivative_url(self.report.image, "thumb")
+        self.assertTrue(url.endswith(derivative_name(self.report.image.name, "thumb")))
+        self.assertTrue(
+            (
+                Path(self.media_root) / derivative_name(self.report.image.name, "thumb")
+            ).exists()
+        )
+
+    def test_report_list_uses_thumbnail(self):
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        response = self.client.get(reverse("reports:list"))
+        self.assertContains(response, ".thumb.")
+        self.assertNotContains(response, f'src="{self.report.image.url}"')
+
+
+# =============================================================================
+# FORMULAIRE : normalisation de la photo
+# =============================================================================
+
+
+@override_settings(REPORT_IMAGE_MAX_DIMENSION=800)
+class ReportFormImageTest(TestCase):
+    """La photo est réduite, redressée et débarrassée de son EXIF avant stockage."""
+
+    def _form(self, content, name="photo.jpg"):
+        return ReportForm(
+            {"description": "Dépôt", "type": "household"},
+            {"image": SimpleUploadedFile(name, content, content_type="image/jpeg")},
+        )
+
+    def test_photo_is_downscaled_rotated_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation : rotation de 90°
+        exif[0x010F] = "Téléphone"  # fabricant
+        form = self._form(_make_jpeg(2000, 1000, exif=exif))
+        self.assertTrue(form.is_valid(), form.errors)
+
+        image = form.cleaned_data["image"]
+        with Image.open(image) as img:
+            self.assertEqual(img.size, (400, 800))  # redressée puis réduite
+            self.assertEqual(dict(img.getexif()), {})
+        self.assertTrue(image.name.endswith(".jpg"))
+
+    @override_settings(REPORT_IMAGE_MAX_BYTES=200)
+    def test_photo_over_budget_is_rejected(self):
+        form = self._form(_make_jpeg())
+        self.assertFalse(form.is_valid())
+        self.assertIn("trop lourde", form.errors["image"][0])
+
+    @override_settings(REPORT_IMAGE_MAX_UPLOAD_BYTES=1000)
+    def test_oversized_upload_is_rejected_before_decoding(self):
+        form = self._form(_make_jpeg())
+        self.assertFalse(form.is_valid())
+        self.assertIn("trop volumineux", form.errors["image"][0])
+
+
 # =============================================================================
 # VUE : create_report
 # =============================================================================
@@ -236,3 +1058,801 @@ class ReportListViewTest(TestCase):
         self.client.login(username="admin", password="pass")
         response = self.client.get(self.url, {"type": "household"})
         self.assertEqual(response.status_code, 200)
+
+
+@mock.patch("reports.views._PAGE_SIZE", 2)
+class ReportListPaginationTest(TestCase):
+    """Pagination keyset : pages disjointes, filtres conservés, compteur groupé."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        self.url = reverse("reports:list")
+        # Points éloignés (pas de fusion) ; 3 "household" et 2 "green"
+        self.household = [make_report(lat=49.40 + i / 100) for i in range(3)]
+        self.green = [
+            make_report(lat=49.40 + i / 100, waste_type="green") for i in range(2)
+        ]
+
+    def _ids(self, response):
+        return [r.pk for r in response.context["reports"]]
+
+    def test_pages_cover_all_reports_newest_first(self):
+        seen = []
+        response = self.client.get(self.url)
+        while True:
+            seen += self._ids(response)
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+            response = self.client.get(self.url, {"after": cursor})
+        expected = Report.objects.order_by("-created_at", "-pk")
+        self.assertEqual(seen, [r.pk for r in expected])
+
+    def test_previous_page_returns_same_rows(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url, {"after": first.context["next_cursor"]})
+        back = self.client.get(self.url, {"before": second.context["previous_cursor"]})
+        self.assertEqual(self._ids(back), self._ids(first))
+
+    def test_filter_and_count(self):
+        response = self.client.get(self.url, {"type": "household"})
+        self.assertEqual(response.context["total_count"], 3)
+        page2 = self.client.get(
+            self.url, {"type": "household", "after": response.context["next_cursor"]}
+        )
+        ids = self._ids(response) + self._ids(page2)
+        self.assertEqual(sorted(ids), sorted(r.pk for r in self.household))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(self.url, {"after": "pas-un-curseur"})
+        self.assertEqual(len(self._ids(response)), 2)
+
+
+# =============================================================================
+# VUES ASYNCHRONES (ASGI)
+# =============================================================================
+
+
+class AsyncViewsTest(TempMediaMixin, TestCase):
+    """async_views : même contrat que les vues synchrones, photo écrite par le pool."""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user("async", password="pass", is_staff=True)
+
+    def _post(self, lat="49.430", lon="2.082"):
+        request = self.factory.post(
+            reverse("reports:create"),
+            {
+                "description": "Dépôt test",
+                "type": "household",
+                "image": SimpleUploadedFile(
+                    "t.jpg", _make_jpeg(), content_type="image/jpeg"
+                ),
+                "lat": lat,
+                "lon": lon,
+            },
+        )
+        return self._as_user(request)
+
+    def _as_user(self, request):
+        """Requête authentifiée, sans passer par les middlewares."""
+
+        async def auser():
+            return self.user
+
+        request.user, request.auser = self.user, auser
+        return request
+
+    async def test_valid_post_creates_report_and_stores_image(self):
+        response = await async_views.create_report(self._post())
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse("reports:success"))
+        report = await Report.objects.select_related("cluster").aget()
+        self.assertIsNotNone(report.cluster)
+        self.assertTrue(report.image.name.endswith(".jpg"))
+        self.assertTrue(Path(self.media_root, report.image.name).exists())
+
+    async def test_invalid_location_keeps_form_errors(self):
+        response = await async_views.create_report(self._post(lat="48.8566"))
+        self.assertContains(response, "hors zone")
+        self.assertEqual(await Report.objects.acount(), 0)
+        self.assertEqual(list(Path(self.media_root).rglob("*.jpg")), [])
+
+    async def test_report_list_reads_page(self):
+        await sync_to_async(make_report)()
+        request = self._as_user(self.factory.get(reverse("reports:list")))
+        response = await async_views.report_list(request)
+        self.assertContains(response, "1 signalement(s)")
+
+    def test_metrics_middleware_is_async_capable(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(metrics.MetricsMiddleware(view)))
+        self.assertFalse(
+            iscoroutinefunction(metrics.MetricsMiddleware(lambda request: None))
+        )
+
+
+# =============================================================================
+# STATISTIQUES PRÉCALCULÉES (tableau de bord)
+# =============================================================================
+
+
+class ReportStatsTest(TestCase):
+    def setUp(self):
+        self.reports = [make_report(lon=2.082 + i * 0.001) for i in range(3)]
+        make_report(lat=49.50, lon=2.20, waste_type="green")
+
+    def _expected(self):
+        """Comptage direct dans reports_report, même clé que ReportStat."""
+        counts = {}
+        for report in Report.objects.all():
+            key = (
+                stats.week_start(report.created_at),
+                report.status,
+                report.type,
+                sector_for_point(report.location.x, report.location.y),
+            )
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def _stored(self):
+        """Sommes par clé (une ligne par partition d'écriture et par clé)."""
+        rows = ReportStat.objects.values("week", "status", "waste_type", "sector")
+        return {
+            (r["week"], r["status"], r["waste_type"], r["sector"]): r["n"]
+            for r in rows.annotate(n=Sum("count")).order_by()
+            if r["n"]
+        }
+
+    def test_triggers_follow_creates_updates_and_deletes(self):
+        self.assertEqual(self._stored(), self._expected())
+        # Mise à jour en masse (action admin), sans signal Django
+        Report.objects.filter(pk=self.reports[0].pk).update(status="validated")
+        self.assertEqual(self._stored(), self._expected())
+        delete_reports(Report.objects.filter(pk=self.reports[1].pk))
+        self.assertEqual(self._stored(), self._expected())
+        self.assertEqual(
+            stats.counts_by_status_and_type(),
+            {
+                ("validated", "household"): 1,
+                ("pending", "household"): 1,
+                ("pending", "green"): 1,
+            },
+        )
+
+    def test_triggers_upsert_one_row_per_key_and_shard(self):
+        # Écritures répétées sur les mêmes clés : pas de nouvelle ligne
+        rows = ReportStat.objects.count()
+        for _ in range(3):
+            make_report(lon=2.0825)
+        delete_reports(Report.objects.filter(pk=self.reports[2].pk))
+        self.assertEqual(self._stored(), self._expected())
+        self.assertEqual(ReportStat.objects.count(), rows)
+        self.assertTrue(
+            all(s.shard in range(stats.WRITE_SHARDS) for s in ReportStat.objects.all())
+        )
+
+    def test_backdated_bulk_insert_and_rebuild(self):
+        old = timezone.now() - timedelta(weeks=30)
+        synthetic.insert_reports([(2.1, 49.45, "bulky")], dates=[old])
+        self.assertEqual(self._stored(), self._expected())
+        ReportStat.objects.update(count=99)
+        call_command("rebuild_report_stats", stdout=StringIO())
+        self.assertEqual(self._stored(), self._expected())
+
+    def test_dashboard_is_staff_only(self):
+        url = reverse("reports:dashboard")
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        response = self.client.get(url, {"type": "household"})
+        self.assertEqual(response.context["total"], 3)
+        self.assertEqual(response.context["by_week"][-1][1], 3)
+        self.assertEqual(len(response.context["by_week"]), stats.DASHBOARD_WEEKS)
+        sector = sector_for_point(2.082, 49.430)
+        self.assertEqual(response.context["by_sector"][0][:2], (sector, 3))
+
+
+# =============================================================================
+# TESTS : API CARTOGRAPHIQUE (GeoJSON, tuiles MVT)
+# =============================================================================
+
+
+class ClusterApiTest(TestCase):
+    """Lecture publique, validateurs HTTP (ETag / 304) et agrégation par zoom."""
+
+    def setUp(self):
+        tilecache.clear()
+        self.client = Client()
+        self.url = reverse("reports:clusters_geojson")
+        # Deux clusters distincts à ~50 m l'un de l'autre, un troisième loin
+        make_report(lat=49.4300, lon=2.0820)
+        make_report(lat=49.4305, lon=2.0820)
+        make_report(lat=49.4500, lon=2.1000)
+
+    def test_geojson_returns_clusters_in_bbox(self):
+        response = self.client.get(
+            self.url, {"bbox": "2.08,49.42,2.09,49.44", "zoom": 18}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        features = response.json()["features"]
+        self.assertEqual(len(features), 2)
+        self.assertTrue(response.has_header("ETag"))
+        # Pas de Last-Modified : MAX(updated_at) ignore les suppressions
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_revalidation_returns_304_until_clusters_change(self):
+        params = {"bbox": "2.08,49.42,2.09,49.44", "zoom": 18}
+        etag = self.client.get(self.url, params)["ETag"]
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_report(lat=49.4350, lon=2.0850)
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since_alone_never_returns_304(self):
+        # Une suppression ne fait pas avancer MAX(updated_at) : pas de 304
+        params = {"bbox": "2.08,49.42,2.09,49.44", "zoom": 18}
+        self.client.get(self.url, params)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Report.objects.order_by("pk")[:1]  # dépôt à 49.4300
+            delete_reports(Report.objects.filter(pk__in=first))
+        since = http_date(timezone.now().timestamp() + 3600)
+        response = self.client.get(self.url, params, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["features"]), 1)
+
+    def test_low_zoom_aggregates_nearby_clusters(self):
+        response = self.client.get(self.url, {"zoom": 10})
+        features = response.json()["features"]
+        self.assertLess(len(features), ReportCluster.objects.count())
+        self.assertEqual(
+            sum(f["properties"]["report_count"] for f in features),
+            Report.objects.count(),
+        )
+
+    def test_invalid_parameters_return_400(self):
+        self.assertEqual(self.client.get(self.url, {"bbox": "1,2,3"}).status_code, 400)
+        response = self.client.get(self.url, {"waste_type": "inconnu"})
+        self.assertEqual(response.status_code, 400)
+        for zoom in (-1100, 23):
+            response = self.client.get(self.url, {"zoom": zoom})
+            self.assertEqual(response.status_code, 400)
+
+    def test_tile(self):
+        response = self.client.get(
+            reverse("reports:cluster_tile", args=[14, 8286, 5596])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertTrue(response.has_header("ETag"))
+
+    def test_tile_out_of_range_is_404(self):
+        response = self.client.get(reverse("reports:cluster_tile", args=[2, 9, 0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class HeatmapTest(TestCase):
+    def setUp(self):
+        tilecache.clear()
+        self.url = reverse("reports:heatmap")
+        make_report(lat=49.4300, lon=2.0820)
+        make_report(lat=49.4300, lon=2.0820)
+        make_report(lat=49.4500, lon=2.1000, waste_type="green")
+
+    def _get(self, **params):
+        response = self.client.get(self.url, {"zoom": 14, **params})
+        return response.json(), response["X-Cache"]
+
+    def test_extent_matches_leaflet_config(self):
+        self.assertEqual(tuple(settings.LEAFLET_CONFIG["MAX_EXTENT"]), BEAUVAIS_BOUNDS)
+
+    def test_grid_counts_and_cache(self):
+        data, state = self._get()
+        self.assertEqual(state, "MISS")
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(data["max"], 2)
+        self.assertEqual(len(data["cells"]), 2)
+        self.assertEqual(self._get()[1], "HIT")
+        data, _ = self._get(waste_type="green")
+        self.assertEqual(data["total"], 1)
+
+    def test_new_reports_are_folded_incrementally(self):
+        self._get()
+        make_report(lat=49.4400, lon=2.0900)
+        data, state = self._get()
+        self.assertEqual(state, "REFRESH")
+        self.assertEqual(data["total"], 4)
+        full = heatmap.grid_payload(14, heatmap.compute_grid(14))
+        self.assertEqual(data["cells"], full["cells"])
+
+    def test_rejected_report_triggers_full_recompute(self):
+        self._get()
+        Report.objects.filter(type="green").update(status="rejected")
+        data, state = self._get()
+        self.assertEqual(state, "MISS")
+        self.assertEqual(data["total"], 2)
+
+
+class TileCacheTest(TestCase):
+    """Les réponses sont servies depuis le cache jusqu'à ce qu'un centroïde de la tuile bouge."""
+
+    def setUp(self):
+        tilecache.clear()
+        tilecache.reset_stats()
+        self.client = Client()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report = make_report(lat=49.4300, lon=2.0820)
+            make_report(lat=49.4500, lon=2.1000)
+        self.near = reverse("reports:cluster_tile", args=[16, 33147, 22386])
+        self.far = reverse("reports:cluster_tile", args=[16, 33150, 22381])
+
+    def _status(self, url):
+        return self.client.get(url)["X-Cache"]
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self._status(self.near), "MISS")
+        self.assertEqual(self._status(self.near), "HIT")
+        self.assertEqual(tilecache.stats()["hits"], 1)
+        self.assertEqual(tilecache.stats()["misses"], 1)
+
+    def test_only_touched_tiles_are_invalidated(self):
+        self._status(self.near)
+        self._status(self.far)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_report(lat=49.43001, lon=2.08201)  # rejoint le premier cluster
+        self.assertEqual(self._status(self.near), "MISS")
+        self.assertEqual(self._status(self.far), "HIT")
+
+    def test_delete_invalidates_tile(self):
+        self._status(self.near)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.delete()
+        self.assertEqual(self._status(self.near), "MISS")
+
+    def test_evicted_version_never_serves_stale_entry(self):
+        self._status(self.near)
+        tilecache._cache().delete("v:16/33147/22386")
+        self.assertEqual(self._status(self.near), "MISS")
+
+    def test_change_without_local_invalidation_is_a_miss(self):
+        # Modification faite par un autre processus : les jetons de ce
+        # processus ne bougent pas, mais l'ETag calculé en base change
+        self._status(self.near)
+        ReportCluster.objects.filter(pk=self.report.cluster_id).update(
+            report_count=5, updated_at=timezone.now()
+        )
+        self.assertEqual(self._status(self.near), "MISS")
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse("reports:cache_stats")
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        self.assertIn("hit_ratio", self.client.get(url).json())
+
+
+# =============================================================================
+# TESTS : INDEX SPATIAUX (audit des plans d'exécution)
+# =============================================================================
+
+
+class AuditClusterQueriesTest(TestCase):
+    def test_queries_can_use_indexes(self):
+        make_report(lat=49.4300, lon=2.0820)
+        out = StringIO()
+        call_command("audit_cluster_queries", "--disable-seqscan", stdout=out)
+        self.assertIn("utilisent un index", out.getvalue())
+
+    def test_explicit_zero_coordinates_are_kept(self):
+        from .management.commands.audit_cluster_queries import Command
+
+        make_report(lat=49.4300, lon=2.0820)
+        location, _, _ = Command()._sample({"lon": 0.0, "lat": 0.0, "waste_type": None})
+        self.assertEqual((location.x, location.y), (0.0, 0.0))
+
+    def test_seq_scan_detection(self):
+        from .management.commands.audit_cluster_queries import seq_scans
+
+        plan = {
+            "Node Type": "Aggregate",
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "reports_reportcluster"}
+            ],
+        }
+        self.assertEqual(seq_scans(plan), ["reports_reportcluster"])
+        plan["Plans"][0] = {
+            "Node Type": "Bitmap Heap Scan",
+            "Relation Name": "reports_reportcluster",
+        }
+        self.assertEqual(seq_scans(plan), [])
+
+
+# =============================================================================
+# TESTS : DONNÉES SYNTHÉTIQUES ET BENCHMARKS
+# =============================================================================
+
+
+class SyntheticDataTest(TempMediaMixin, TestCase):
+    def test_generation_is_deterministic(self):
+        for distribution in synthetic.DISTRIBUTIONS:
+            points = synthetic.generate_points(300, distribution, seed=7)
+            self.assertEqual(len(points), 300)
+            self.assertEqual(
+                points, synthetic.generate_points(300, distribution, seed=7)
+            )
+
+    def test_chain_points_are_just_under_cluster_distance(self):
+        points = synthetic.generate_points(40, "chain", seed=1)
+        for (lon1, lat1, type1), (lon2, lat2, type2) in zip(points, points[1:]):
+            self.assertEqual(type1, type2)
+            self.assertAlmostEqual(distance_m(lon1, lat1, lon2, lat2), 9.0, places=1)
+
+    def test_insert_reports_shares_one_image(self):
+        self.assertEqual(
+            synthetic.insert_reports(synthetic.generate_points(5, seed=3)), 5
+        )
+        names = set(Report.objects.values_list("image", flat=True))
+        self.assertEqual(names, {bulk.SYNTHETIC_IMAGE_NAME})
+        self.assertEqual(Report.objects.filter(cluster__isnull=True).count(), 5)
+
+
+class BenchmarkCommandTest(TempMediaMixin, TestCase):
+    def test_results_are_json_and_database_is_untouched(self):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "benchmark_clustering",
+                "--sizes=30",
+                "--distributions=chain",
+                "--samples=5",
+                "--list-runs=2",
+                stdout=out,
+                stderr=StringIO(),
+            )
+        # Aucun verrou consultatif gardé jusqu'à l'annulation
+        self.assertFalse([q for q in queries if "pg_advisory_xact_lock" in q["sql"]])
+        result = json.loads(out.getvalue())["results"][0]
+        self.assertEqual(result["size"], 30)
+        self.assertEqual(result["assign_ms"]["count"], 5)
+        self.assertIn("p99", result["report_list_ms"])
+        self.assertEqual(Report.objects.count(), 0)
+        self.assertEqual(ReportCluster.objects.count(), 0)
+        # Réglages remplacés pendant la mesure, restaurés ensuite
+        self.assertTrue(settings.CLUSTER_CELL_LOCKS)
+
+
+class SeedReportsCommandTest(TempMediaMixin, TestCase):
+    def _seed(self, *args):
+        call_command("seed_reports", *args, stdout=StringIO())
+
+    def test_copy_then_batch_clustering(self):
+        self._seed("--count=200", "--method=copy", "--days=30")
+        self.assertEqual(Report.objects.count(), 200)
+        self.assertFalse(Report.objects.filter(cluster__isnull=True).exists())
+        # Dates réparties sur la période, dans l'ordre de génération
+        dates = list(Report.objects.order_by("pk").values_list("created_at", flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater((dates[-1] - dates[0]).days, 25)
+
+    def test_bulk_create_with_waste_mix_and_incremental_clustering(self):
+        self._seed(
+            "--count=60",
+            "--method=bulk",
+            "--waste-mix=green=1",
+            "--cluster=incremental",
+        )
+        self.assertEqual(set(Report.objects.values_list("type", flat=True)), {"green"})
+        self.assertFalse(Report.objects.filter(cluster__isnull=True).exists())
+        self.assertEqual(find_aggregate_drift(), [])
+
+    def test_delete_keeps_real_reports(self):
+        real = make_report()
+        self._seed("--count=20", "--cluster=none")
+        self._seed("--delete")
+        self.assertEqual(list(Report.objects.all()), [real])
+        self.assertEqual(ReportCluster.objects.count(), 1)
+
+    def test_invalid_waste_mix(self):
+        with self.assertRaises(CommandError):
+            self._seed("--waste-mix=plastique=1")
+
+
+class ImportReportsCommandTest(TempMediaMixin, TestCase):
+    def _write(self, name, content):
+        path = Path(self.media_root) / name
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    def _import(self, *args):
+        out = StringIO()
+        call_command("import_reports", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_csv_import_clusters_and_rejects(self):
+        path = self._write(
+            "depots.csv",
+            "latitude;longitude;categorie;description;date\n"
+            "49,4300;2,0820;Déchets verts;Tas de branches;12/03/2021\n"
+            "49.43003;2.08203;vert;Tontes;2021-03-14\n"
+            "48.85;2.35;green;Hors zone;\n"
+            "49.43;2.08;plastique;Inconnue;\n",
+        )
+        rejects = str(Path(self.media_root) / "rejets.csv")
+        out = self._import(path, "--batch-size=1", f"--rejects={rejects}")
+        self.assertIn("2 importée(s), 2 rejetée(s)", out)
+        self.assertEqual(Report.objects.filter(type="green").count(), 2)
+        cluster = ReportCluster.objects.get()
+        self.assertEqual(cluster.report_count, 2)
+        first = Report.objects.get(description="Tas de branches")
+        self.assertEqual(first.created_at.date().isoformat(), "2021-03-12")
+        with open(rejects, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 3)  # en-tête + 2 rejets
+
+    def test_geojson_feature_collection_and_lines(self):
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [2.082, 49.43]},
+            "properties": {"type": "household", "description": "Sacs"},
+        }
+        collection = self._write(
+            "depots.geojson",
+            json.dumps({"type": "FeatureCollection", "features": [feature] * 3}),
+        )
+        lines = self._write("depots.geojsonl", (json.dumps(feature) + "\n") * 2)
+        self._import(collection)
+        self._import(lines)
+        self.assertEqual(Report.objects.count(), 5)
+        self.assertEqual(ReportCluster.objects.get().report_count, 5)
+        names = set(Report.objects.values_list("image", flat=True))
+        self.assertEqual(names, {bulk.IMPORTED_IMAGE_NAME})
+
+    def test_dry_run_inserts_nothing(self):
+        path = self._write("depots.csv", "lat,lon,type\n49.43,2.08,bulky\n")
+        out = self._import(path, "--dry-run")
+        self.assertIn("1 valide(s)", out)
+        self.assertFalse(Report.objects.exists())
+
+    def test_geojson_stream_reads_in_small_chunks(self):
+        features = [
+            {"type": "Feature", "geometry": None, "properties": {"n": n}}
+            for n in range(50)
+        ]
+        f = StringIO(json.dumps({"features": features, "name": "x"}))
+        with mock.patch.object(importer._JsonStream.__init__, "__defaults__", (7,)):
+            parsed = list(importer._iter_geojson(f))
+        self.assertEqual([p["properties"]["n"] for p in parsed], list(range(50)))
+
+
+class ExportTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.reports = [make_report(lon=2.082 + i * 0.001) for i in range(3)]
+        self.reports[0].status = Report.Status.VALIDATED
+        self.reports[0].save()
+
+    def _export(self, name, *args):
+        path = str(Path(self.media_root) / name)
+        call_command("export_reports", path, *args, stderr=StringIO())
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_csv_with_filters_and_resume(self):
+        lines = self._export("all.csv").decode().splitlines()
+        self.assertEqual(
+            lines[0],
+            "id,type,status,description,cluster_id,created_at,updated_at,lon,lat",
+        )
+        self.assertEqual(len(lines), 4)
+        validated = self._export("v.csv", "--status=validated").decode().splitlines()
+        self.assertEqual(len(validated), 2)
+        # Reprise : les lignes suivantes sont ajoutées, sans second en-tête
+        self._export("part.csv", f"--max-id={self.reports[0].pk}")
+        resumed = self._export(
+            "part.csv", f"--min-id={self.reports[1].pk}", "--append"
+        ).decode()
+        self.assertEqual(resumed.splitlines(), lines)
+
+    def test_geojsonseq_clusters(self):
+        records = self._export("c.geojsons", "--layer=clusters").split(b"\x1e")[1:]
+        features = [json.loads(record) for record in records]
+        self.assertEqual(len(features), ReportCluster.objects.count())
+        self.assertEqual(features[0]["geometry"]["type"], "Point")
+        self.assertIn("report_count", features[0]["properties"])
+
+    def test_flatgeobuf_header(self):
+        data = self._export("r.fgb")
+        self.assertEqual(data[:8], b"fgb\x03fgb\x00")
+        header_size = struct.unpack_from("<I", data, 8)[0]
+        self.assertIn(b"description", data[12 : 12 + header_size])
+        self.assertGreater(len(data), 12 + header_size)
+
+    # Lecture FlatBuffers minimale (décalages relatifs au début du tampon)
+    @staticmethod
+    def _fb_field(buf, table, slot):
+        vtable = table - struct.unpack_from("<i", buf, table)[0]
+        if 4 + 2 * slot >= struct.unpack_from("<H", buf, vtable)[0]:
+            return None
+        offset = struct.unpack_from("<H", buf, vtable + 4 + 2 * slot)[0]
+        return table + offset if offset else None
+
+    @staticmethod
+    def _fb_ref(buf, at):
+        return at + struct.unpack_from("<I", buf, at)[0]
+
+    def _fb_vector(self, buf, table, slot):
+        at = self._fb_ref(buf, self._fb_field(buf, table, slot))
+        return at + 4, struct.unpack_from("<I", buf, at)[0]
+
+    def _fb_string(self, buf, table, slot):
+        start, length = self._fb_vector(buf, table, slot)
+        return buf[start : start + length].decode()
+
+    def test_flatgeobuf_round_trip(self):
+        data = self._export("r.fgb")
+        header_size = struct.unpack_from("<I", data, 8)[0]
+        header = data[12 : 12 + header_size]
+        root = self._fb_ref(header, 0)
+        self.assertEqual(self._fb_string(header, root, 0), "reports")
+        geometry_type = struct.unpack_from(
+            "<B", header, self._fb_field(header, root, 2)
+        )
+        self.assertEqual(geometry_type, (export._FGB_POINT,))
+
+        start, count = self._fb_vector(header, root, 7)
+        columns = []
+        for i in range(count):
+            column = self._fb_ref(header, start + 4 * i)
+            kind = struct.unpack_from("<B", header, self._fb_field(header, column, 1))
+            columns.append((self._fb_string(header, column, 0), kind[0]))
+        self.assertEqual(
+            columns,
+            [
+                (name, export._FGB_TYPES[kind])
+                for name, kind in export._COLUMNS["reports"]
+            ],
+        )
+
+        # Première entité : celle du plus petit id
+        at = 12 + header_size
+        size = struct.unpack_from("<I", data, at)[0]
+        feature = data[at + 4 : at + 4 + size]
+        geometry = self._fb_ref(
+            feature, self._fb_field(feature, self._fb_ref(feature, 0), 0)
+        )
+        start, count = self._fb_vector(feature, geometry, 1)
+        lon, lat = struct.unpack_from(f"<{count}d", feature, start)
+        location = self.reports[0].location
+        self.assertAlmostEqual(lon, location.x, places=9)
+        self.assertAlmostEqual(lat, location.y, places=9)
+
+    def test_endpoint_is_staff_only_and_streams(self):
+        url = reverse("reports:export", args=["reports", "csv"])
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        response = self.client.get(url, {"type": "household"})
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 4)
+        self.assertEqual(self.client.get(url, {"since": "hier"}).status_code, 400)
+        missing = reverse("reports:export", args=["reports", "shp"])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_clusters_reject_status_filter(self):
+        with self.assertRaises(ValueError):
+            export.export_queryset("clusters", status="validated")
+
+
+# =============================================================================
+# TESTS : INSTRUMENTATION
+# =============================================================================
+
+
+@override_settings(METRICS_SAMPLE_PERCENT=100, METRICS_SERVER_TIMING=True)
+class MetricsTest(TestCase):
+    def setUp(self):
+        metrics.reset()
+        tilecache.clear()
+        make_report(lat=49.4300, lon=2.0820)
+        self.url = reverse("reports:clusters_geojson")
+
+    def test_sampled_request_is_recorded(self):
+        response = self.client.get(self.url, {"zoom": 18})
+        self.assertIn('desc="', response["Server-Timing"])
+        data = metrics.stats()["reports:clusters_geojson"]
+        self.assertEqual(data["requests"], 1)
+        self.assertGreater(data["queries"], 0)
+        self.assertEqual(data["writes"], 0)
+        self.assertTrue(data["slowest_sql"])
+
+    @override_settings(METRICS_SAMPLE_PERCENT=0)
+    def test_unsampled_request_is_not_recorded(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(metrics.stats(), {})
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_prometheus_endpoint_requires_token_or_staff(self):
+        self.client.get(self.url)
+        url = reverse("reports:metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'dump_alert_request_duration_seconds_count{view="reports:clusters_geojson"} 1',
+            body,
+        )
+        self.assertIn("dump_alert_clustering_jobs_pending 0", body)
+        self.assertNotIn('sql="', body)
+
+    def test_slow_queries_are_staff_only(self):
+        self.client.get(self.url)
+        url = reverse("reports:slow_queries")
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+        User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        data = self.client.get(url).json()["reports:clusters_geojson"]
+        self.assertTrue(data["sql"])
+        self.assertGreater(data["seconds"], 0)
+
+
+# =============================================================================
+# TESTS : CONNEXIONS POSTGRESQL
+# =============================================================================
+
+
+class ConnectionPoolingTest(TestCase):
+    """dbpool / benchmark_connections : connexions établies selon le mode."""
+
+    def _bench(self, *args):
+        out = StringIO()
+        call_command(
+            "benchmark_connections",
+            "--threads",
+            "2",
+            "--requests",
+            "5",
+            *args,
+            stdout=out,
+            stderr=StringIO(),
+        )
+        return {r["mode"]: r for r in json.loads(out.getvalue())["results"]}
+
+    def test_persistent_connections_are_reused(self):
+        results = self._bench("--modes", "none,persistent")
+        # Une connexion par requête, puis une par thread
+        self.assertEqual(results["none"]["connects"], 10)
+        self.assertEqual(results["persistent"]["connects"], 2)
+        self.assertEqual(results["persistent"]["latency_ms"]["count"], 10)
+        self.assertEqual(results["persistent"]["pool"], {})
+        self.assertNotIn("benchmark_connections", connections.settings)
+
+    @skipUnless(is_psycopg3, "pool de connexions : psycopg 3 requis")
+    def test_pool_reports_saturation(self):
+        pool = self._bench("--modes", "pool", "--pool-size", "1")["pool"]["pool"]
+        self.assertEqual(pool["max"], 1)
+        self.assertEqual(pool["requests"], 10)
+        self.assertLessEqual(pool["opened"], 2)
+
+    def test_stats_and_metrics_without_pool(self):
+        self.assertEqual(dbpool.pool_stats(), {})
+        self.assertGreater(dbpool.stats()["connects"], 0)
+        staff = User.objects.create_user("ops", password="pass", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("reports:metrics"))
+        self.assertIn("dump_alert_db_connects ", response.content.decode())
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self._bench("--modes", "pgbouncer")
@@ -0,0 +1,163 @@
+"""
+Cache des réponses cartographiques (tuiles MVT et GeoJSON par emprise).
+
+Stockage : cache Django "tiles" (CACHES dans settings.py). Par défaut un
+LocMemCache, utilisable hors ligne, borné à TILE_CACHE_MAX_ENTRIES entrées
+et qui évince les moins récemment lues (LRU).
+
+Invalidation exacte par versions de tuiles :
+- chaque tuile z/x/y (z = 0…MAX_ZOOM) porte un jeton de version ;
+- une réponse est stockée avec les jetons des tuiles qu'elle couvre (la
+  tuile demandée, ou les tuiles qui recouvrent l'emprise GeoJSON) ;
+- quand un centroïde change (création, ajout, fusion, suppression,
+  recalcul), les jetons des tuiles contenant son ancienne ET sa nouvelle
+  position sont renouvelés après le commit. Seules les réponses couvrant
+  ces tuiles deviennent invalides ; les autres restent servies.
+
+Un jeton expulsé par la LRU est recréé avec une nouvelle valeur : aucune
+réponse stockée ne lui correspond, on ne sert jamais de données périmées.
+
+Un LocMemCache est propre à chaque processus : les invalidations faites par
+un autre worker, par process_clustering_jobs ou par les commandes de
+maintenance ne l'atteignent pas. lookup() compare donc aussi l'ETag stocké
+à celui de l'état courant en base (api.cluster_state).
+"""
+
+import hashlib
+import secrets
+import threading
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .geo import MAX_ZOOM, tile_for_point
+
+CACHE_ALIAS = "tiles"
+
+# Une emprise GeoJSON est rattachée aux tuiles qui la recouvrent, au zoom le
+# plus fin (≤ _COVER_MAX_ZOOM) qui en donne au plus _MAX_COVER_TILES.
+_COVER_MAX_ZOOM = 16
+_MAX_COVER_TILES = 16
+
+# Compteurs du processus (hits / misses / tuiles invalidées)
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "invalidated_tiles": 0}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def stats():
+    """Compteurs du processus courant, avec le taux de succès."""
+    with _lock:
+        data = dict(_counters)
+    lookups = data["hits"] + data["misses"]
+    data["hit_ratio"] = data["hits"] / lookups if lookups else 0.0
+    return data
+
+
+def reset_stats():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
+
+
+# =============================================================================
+# TUILES ET VERSIONS
+# =============================================================================
+def _version_key(z, x, y):
+    return f"v:{z}/{x}/{y}"
+
+
+def point_tiles(lon, lat):
+    """Les tuiles (z, x, y) contenant le point, à tous les niveaux de zoom."""
+    return [(z, *tile_for_point(lon, lat, z)) for z in range(MAX_ZOOM + 1)]
+
+
+def bbox_tiles(bbox):
+    """Tuiles (z, x, y) recouvrant l'emprise (lon_min, lat_min, lon_max, lat_max)."""
+    lon_min, lat_min, lon_max, lat_max = bbox
+    for z in range(_COVER_MAX_ZOOM, -1, -1):
+        x0, y0 = tile_for_point(lon_min, lat_max, z)
+        x1, y1 = tile_for_point(lon_max, lat_min, z)
+        # Toujours vrai au zoom 0 (une seule tuile)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= _MAX_COVER_TILES:
+            return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def versions(tiles):
+    """Jetons de version courants des tuiles (créés s'ils manquent)."""
+    cache = _cache()
+    keys = [_version_key(*tile) for tile in tiles]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, secrets.token_hex(8), None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key) for key in keys)
+
+
+# =============================================================================
+# LECTURE / ÉCRITURE
+# =============================================================================
+def entry_key(kind, *parts):
+    """Clé d'une réponse : type ("mvt", "geojson") + paramètres normalisés."""
+    raw = "|".join(str(part) for part in parts)
+    return f"{kind}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def lookup(key, tiles, etag):
+    """
+    Retourne (entrée ou None, jetons courants). L'entrée n'est servie que si
+    ses jetons sont à jour et son ETag égal à `etag` (état courant en base).
+
+    Les jetons sont lus AVANT que l'appelant ne calcule la réponse : si un
+    commit invalide ces tuiles pendant le calcul, la réponse sera stockée
+    avec des jetons déjà périmés et ne sera jamais servie.
+    """
+    current = versions(tiles)
+    entry = _cache().get(key)
+    if entry is not None and entry["versions"] == current and entry["etag"] == etag:
+        _count("hits")
+        return entry, current
+    _count("misses")
+    return None, current
+
+
+def store(key, current, entry):
+    """Enregistre une réponse calculée avec les jetons lus par lookup()."""
+    _cache().set(key, {**entry, "versions": current})
+
+
+# =============================================================================
+# INVALIDATION
+# =============================================================================
+def invalidate_points(points):
+    """
+    Invalide, après le commit de la transaction courante, les réponses
+    couvrant les positions (lon, lat) données : anciens et nouveaux
+    centroïdes des clusters modifiés.
+    """
+    keys = {
+        _version_key(*tile) for lon, lat in points for tile in point_tiles(lon, lat)
+    }
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def _bump(keys):
+    token = secrets.token_hex(8)
+    _cache().set_many(dict.fromkeys(keys, token), None)
+    _count("invalidated_tiles", len(keys))
+
+
+def clear():
+    """Vide tout le cache (après une reconstruction complète des clusters)."""
+    _cache().clear()
@@ -5,19 +5,43 @@ Ce fichier définit les URLs spécifiques à l'app reports.
 Il sera inclus dans le fichier urls.py principal du projet.
 """
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, metrics, views
 
 app_name = "reports"  # Namespace pour éviter les conflits de noms
 
+# Liste et formulaire : variantes asynchrones sous un serveur ASGI (ASYNC_VIEWS)
+pages = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # Liste des signalements (tableau) — staff uniquement
     # Accessible à : /reports/
-    path("", views.report_list, name="list"),
+    path("", pages.report_list, name="list"),
+    # Tableau de bord (statistiques précalculées) — staff uniquement
+    # Accessible à : /reports/tableau-de-bord/
+    path("tableau-de-bord/", views.dashboard, name="dashboard"),
     # Formulaire public de signalement — accessible sans connexion
     # Accessible à : /reports/signaler/
-    path("signaler/", views.create_report, name="create"),
+    path("signaler/", pages.create_report, name="create"),
     # Page de confirmation après soumission
     # Accessible à : /reports/merci/
     path("merci/", views.report_success, name="success"),
+    # API cartographique (lecture seule) — GeoJSON et tuiles vectorielles
+    # Accessible à : /reports/api/clusters.geojson?bbox=…&zoom=…
+    path("api/clusters.geojson", api.clusters_geojson, name="clusters_geojson"),
+    # Accessible à : /reports/tiles/14/8286/5596.mvt
+    path("tiles/<int:z>/<int:x>/<int:y>.mvt", api.cluster_tile, name="cluster_tile"),
+    # Carte de chaleur (grille de densité par zoom)
+    # Accessible à : /reports/api/heatmap.json?zoom=13&waste_type=green
+    path("api/heatmap.json", api.heatmap_grid, name="heatmap"),
+    # Compteurs du cache cartographique (staff)
+    path("api/cache-stats", api.cache_stats, name="cache_stats"),
+    # Export en flux (staff) — QGIS, open data
+    # Accessible à : /reports/export/clusters.fgb?type=green
+    path("export/<str:layer>.<str:fmt>", api.export_layer, name="export"),
+    # Mesures des requêtes au format Prometheus (jeton METRICS_TOKEN ou staff)
+    path("metrics", metrics.prometheus_metrics, name="metrics"),
+    # Requête SQL la plus lente de chaque vue mesurée (staff)
+    path("api/slow-queries", metrics.slow_queries, name="slow_queries"),
 ]
@@ -10,18 +10,24 @@ C'est le "C" du pattern MVC (Model-View-Controller).
 En Django, on parle de MTV : Model-Template-View.
 """
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
 from django.shortcuts import render, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.gis.geos import Point
+from django.db import transaction
 from django.views.decorators.http import require_safe, require_http_methods
 
+from . import stats
 from .models import Report
 from .forms import ReportForm
+from .geo import in_beauvais
 
-# Limites géographiques de la zone de Beauvais
-_LAT_MIN, _LAT_MAX = 49.35, 49.55
-_LON_MIN, _LON_MAX = 1.80, 2.30
+# Liste des signalements : taille de page
+_PAGE_SIZE = 50
 
 
 def _parse_coords(lat_str, lon_str):
@@ -35,44 +41,168 @@ def _parse_coords(lat_str, lon_str):
         lat_f, lon_f = float(lat_str), float(lon_str)
     except ValueError:
         raise ValueError("Erreur de coordonnées : réessayez")
-    if not (_LAT_MIN <= lat_f <= _LAT_MAX and _LON_MIN <= lon_f <= _LON_MAX):
+    if not in_beauvais(lon_f, lat_f):
         raise ValueError("Position hors zone de Beauvais")
     return lat_f, lon_f
 
 
-@staff_member_required  # Accessible uniquement aux utilisateurs staff (admin et certaines permissions)
-def report_list(request):
-    """
-    Affiche la liste de tous les signalements dans un tableau.
+def _encode_cursor(report):
+    """Curseur opaque (created_at, id) d'un signalement, utilisable dans l'URL."""
+    raw = f"{report.created_at.isoformat()}|{report.pk}"
+    return urlsafe_b64encode(raw.encode()).decode()
 
-    Accessible uniquement aux admins (is_staff=True).
-    URL : /reports/
+
+def _decode_cursor(cursor):
+    """Retourne (created_at, id) ou None si le curseur est absent ou invalide."""
+    if not cursor:
+        return None
+    try:
+        created_at, pk = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except ValueError:
+        return None
+
+
+def _list_query(params):
+    """
+    Requête d'une page de report_list (_PAGE_SIZE + 1 lignes, une de plus
+    pour savoir s'il en reste) et état de la pagination.
+    Partagée avec la variante asynchrone (async_views.report_list).
     """
-    # Récupérer tous les signalements, triés par date (plus récents en premier)
-    reports = Report.objects.select_related("cluster").order_by("-created_at")
+    reports = Report.objects.all()
 
     # Filtrage optionnel par statut (via paramètre GET)
-    status_filter = request.GET.get("status")
+    status_filter = params.get("status")
     if status_filter:
         reports = reports.filter(status=status_filter)
 
     # Filtrage optionnel par catégorie de déchets
-    waste_filter = request.GET.get("type")
+    waste_filter = params.get("type")
     if waste_filter:
         reports = reports.filter(type=waste_filter)
 
-    # Contexte envoyé au template
-    context = {
-        "reports": reports,
+    # Page suivante (after) ou précédente (before) à partir d'un curseur.
+    # Le filtre large sur created_at sert de condition d'index, le Q()
+    # départage les signalements créés au même instant.
+    after = _decode_cursor(params.get("after"))
+    before = None if after else _decode_cursor(params.get("before"))
+    if after:
+        created_at, pk = after
+        reports = reports.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(pk__lt=pk)
+        )
+    elif before:
+        created_at, pk = before
+        reports = reports.filter(created_at__gte=created_at).filter(
+            Q(created_at__gt=created_at) | Q(pk__gt=pk)
+        )
+
+    if before:
+        reports = reports.order_by("created_at", "pk")
+    else:
+        reports = reports.order_by("-created_at", "-pk")
+    state = {
+        "status": status_filter,
+        "waste": waste_filter,
+        "after": after,
+        "before": before,
+    }
+    return reports[: _PAGE_SIZE + 1], state
+
+
+def _list_context(page, state):
+    """Contexte du template de report_list à partir des lignes lues."""
+    has_more = len(page) > _PAGE_SIZE
+    if state["before"]:
+        page = page[:_PAGE_SIZE][::-1]
+        has_previous, has_next = has_more, True
+    else:
+        page = page[:_PAGE_SIZE]
+        has_previous, has_next = state["after"] is not None, has_more
+
+    status_filter, waste_filter = state["status"], state["waste"]
+    total_count = sum(
+        n
+        for (status, waste_type), n in stats.counts_by_status_and_type().items()
+        if (not status_filter or status == status_filter)
+        and (not waste_filter or waste_type == waste_filter)
+    )
+
+    return {
+        "reports": page,
+        "total_count": total_count,
+        "next_cursor": _encode_cursor(page[-1]) if page and has_next else None,
+        "previous_cursor": _encode_cursor(page[0]) if page and has_previous else None,
         "status_choices": Report.Status.choices,
         "waste_choices": Report.WasteType.choices,
         "current_status": status_filter,
         "current_waste": waste_filter,
     }
 
+
+@staff_member_required  # Accessible uniquement aux utilisateurs staff (admin et certaines permissions)
+def report_list(request):
+    """
+    Affiche la liste des signalements dans un tableau, page par page.
+
+    Pagination par curseur (keyset) sur (created_at, id) : chaque page est
+    une lecture d'index de _PAGE_SIZE lignes, quel que soit son rang.
+    Paramètres GET : status, type, after / before (curseurs).
+
+    Accessible uniquement aux admins (is_staff=True).
+    URL : /reports/
+    """
+    reports, state = _list_query(request.GET)
+    context = _list_context(list(reports), state)
     return render(request, "reports/report_list.html", context)
 
 
+@staff_member_required
+@require_safe
+def dashboard(request):
+    """
+    Tableau de bord staff : signalements par statut, catégorie, semaine et
+    secteur. Lu dans la table précalculée ReportStat (voir stats.py) : coût
+    borné par le nombre de clés (semaines × secteurs), pas par le nombre de
+    signalements.
+    Paramètres GET : status, type.
+
+    URL : /reports/tableau-de-bord/
+    """
+    status_filter = request.GET.get("status") or None
+    waste_filter = request.GET.get("type") or None
+    data = stats.dashboard(status=status_filter, waste_type=waste_filter)
+
+    def rows(counts, choices):
+        top = max(counts.values(), default=0)
+        return [
+            (value, label, counts.get(value, 0), _percent(counts.get(value, 0), top))
+            for value, label in choices
+        ]
+
+    top_week = max((n for _, n in data["by_week"]), default=0)
+    top_sector = max((n for _, n in data["by_sector"]), default=0)
+    context = {
+        "total": data["total"],
+        "by_status": rows(data["by_status"], Report.Status.choices),
+        "by_type": rows(data["by_type"], Report.WasteType.choices),
+        "by_week": [(week, n, _percent(n, top_week)) for week, n in data["by_week"]],
+        "by_sector": [
+            (sector, n, _percent(n, top_sector)) for sector, n in data["by_sector"]
+        ],
+        "status_choices": Report.Status.choices,
+        "waste_choices": Report.WasteType.choices,
+        "current_status": status_filter,
+        "current_waste": waste_filter,
+    }
+    return render(request, "reports/dashboard.html", context)
+
+
+def _percent(value, top):
+    """Largeur d'une barre du tableau de bord, en % de la plus grande."""
+    return round(100 * value / top) if top else 0
+
+
 @require_http_methods(["GET", "POST"])
 @login_required  # Accessible uniquement aux utilisateurs connectés
 def create_report(request):
@@ -101,7 +231,9 @@ def create_report(request):
             else:
                 report = form.save(commit=False)
                 report.location = Point(lon_f, lat_f, srid=4326)
-                report.save()  # déclenche le clustering via signals.py
+                # Signalement et clustering (ou tâche différée) validés ensemble
+                with transaction.atomic():
+                    report.save()  # déclenche le clustering via signals.py
                 return redirect("reports:success")
 
     return render(request, "reports/report_form.html", {"form": form, "error": error})